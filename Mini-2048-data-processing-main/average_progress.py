@@ -4,20 +4,15 @@ import sys
 import statistics
 import glob
 from collections import defaultdict
+from pathlib import Path
+
+from graph.common import get_gameover_table
 
 def read_progress_from_file(file_path):
-    """ファイルからprogressの値を読み取る"""
-    progress_values = []
-    if os.path.isfile(file_path):
-        with open(file_path, "r") as file:
-            for line in file:
-                match = re.search(
-                    r"gameover_turn: \d+; game: \d+; progress: (\d+); score: \d+",
-                    line,
-                )
-                if match:
-                    progress_values.append(int(match.group(1)))
-    return progress_values
+    """ディレクトリのgameover表からprogressの値を読み取る"""
+    if not os.path.isfile(file_path):
+        return []
+    return get_gameover_table(Path(file_path).parent).progress.tolist()
 
 def get_base_dirname(path):
     """seedの数字を除いたディレクトリ名を返す"""
@@ -4,19 +4,15 @@ import sys
 import statistics
 import glob
 from collections import defaultdict
+from pathlib import Path
+
+from graph.common import get_gameover_table
 
 def read_scores_from_file(file_path):
-    scores = []
-    if os.path.isfile(file_path):
-        with open(file_path, "r") as file:
-            for line in file:
-                match = re.search(
-                    r"gameover_turn: \d+; game: \d+; progress: \d+; score: (\d+)",
-                    line,
-                )
-                if match:
-                    scores.append(int(match.group(1)))
-    return scores
+    """ディレクトリのgameover表からscoreの値を読み取る"""
+    if not os.path.isfile(file_path):
+        return []
+    return get_gameover_table(Path(file_path).parent).score.tolist()
 
 def get_base_dirname(path):
     """seedの数字を除いたディレクトリ名を返す"""
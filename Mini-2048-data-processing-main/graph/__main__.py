@@ -1,50 +1,102 @@
 import argparse
-import contextlib
+import importlib
 import json
+import os
 import re
+import sys
+import time
+import uuid
 from pathlib import Path
 
-import matplotlib.pyplot as plt
-
-from . import (
-    accuracy,
-    boxplot,
-    error_abs,
-    error_rel,
-    histgram,
-    scatter,
-    survival,
-    survival_diff,
-    acc_diff,
-    scatter_v2,
-    scatter_symdiff,
-    evals,
-    progress_eval_accuracy,
-)
-from .common import PlayerData, board_dir, BASE_DIR, make_safe_name
+# グラフごとのモジュールと matplotlib は、選ばれたグラフ・描画する場合だけ import する
+from . import cache, curve_store, parallel
+from .common import (
+    PlayerData,
+    board_dir,
+    BASE_DIR,
+    as_int,
+    make_safe_name,
+    normalize_sym,
+    save_plot_data,
+)
 __version__ = "1.5.0"
 
-try:
-    import fcntl  # type: ignore
-except ImportError:  # pragma: no cover - non-POSIX
-    fcntl = None
+# グラフタイプ -> 計算・描画を行うモジュール
+GRAPH_MODULES = {
+    "acc": "accuracy",
+    "acc-mean": "accuracy",
+    "acc-mean-symdiff": "multi",
+    "acc-diff": "acc_diff",
+    "err-rel": "error_rel",
+    "err-rel-mean": "error_rel",
+    "err-rel-mean-symdiff": "multi",
+    "err-abs": "error_abs",
+    "err-abs-mean": "error_abs",
+    "err-abs-mean-symdiff": "multi",
+    "surv": "survival",
+    "surv-symdiff": "multi",
+    "surv-mean": "survival",
+    "surv-mean-symdiff": "multi",
+    "surv-diff": "survival_diff",
+    "surv-diff-mean": "survival_diff",
+    "histgram": "histgram",
+    "scatter": "scatter",
+    "scatter_v2": "scatter_v2",
+    "scatter-symdiff": "scatter_symdiff",
+    "evals": "evals",
+    "evals-mean": "evals",
+    "evals-mean-symdiff": "multi",
+    "boxplot-eval": "boxplot",
+    "pea": "progress_eval_accuracy",
+    "multi": "multi",
+}
+
+ANALYSIS_OUTPUTS = Path("/HDD/momiyama2/data/study/analysis_outputs")
+
+# 保存済みの曲線（curve_store）だけで描画できるグラフ
+REPLOT_GRAPHS = (
+    "acc",
+    "acc-mean",
+    "acc-mean-symdiff",
+    "acc-diff",
+    "err-rel",
+    "err-rel-mean",
+    "err-rel-mean-symdiff",
+    "err-abs",
+    "err-abs-mean",
+    "err-abs-mean-symdiff",
+    "surv",
+    "surv-symdiff",
+    "surv-mean",
+    "surv-mean-symdiff",
+    "surv-diff",
+    "surv-diff-mean",
+    "evals-mean",
+    "evals-mean-symdiff",
+    "multi",
+)
 
+# --data-only で曲線をファイルに書き出せるグラフ
+DATA_GRAPHS = REPLOT_GRAPHS
+
+# sym - notsym の差（paired.py）を描くグラフ。y=0 の線を引き、有意な点に印を付ける
+SYMDIFF_GRAPHS = (
+    "acc-mean-symdiff",
+    "err-rel-mean-symdiff",
+    "err-abs-mean-symdiff",
+    "surv-symdiff",
+    "surv-mean-symdiff",
+    "evals-mean-symdiff",
+)
 
-@contextlib.contextmanager
-def config_lock(path: Path):
-    if fcntl is None:
-        yield
-        return
-    lock_path = path.parent / f"{path.name}.lock"
-    with open(lock_path, "w", encoding="utf-8") as lock_fp:
-        fcntl.flock(lock_fp, fcntl.LOCK_EX)
-        try:
-            yield
-        finally:
-            fcntl.flock(lock_fp, fcntl.LOCK_UN)
+config_path = BASE_DIR / "config.json"
+# 自動で追加したスタイルの置き場所。プロセスごとに別ファイルに書き、読むときに config.json と合わせる
+config_shard_dir = BASE_DIR / "config.d"
 
 
 def read_config(path: Path) -> dict:
+    if not path.exists():
+        return {}
     return json.loads(path.read_text("utf-8"))
 
 
@@ -52,6 +104,35 @@ def write_config(path: Path, config: dict) -> None:
     path.write_text(json.dumps(config, indent=4, ensure_ascii=False), "utf-8")
 
 
+def read_merged_config() -> dict:
+    """
+    config.json と config.d 以下の全ての *.json を合わせた設定を返す。ロックは取らない。
+    同じキーは config.json、次に config.d の古いファイル（名前順）が優先。
+    """
+    config = read_config(config_path)
+    if config_shard_dir.exists():
+        for shard in sorted(config_shard_dir.rglob("*.json")):
+            for key, value in read_config(shard).items():
+                config.setdefault(key, value)
+    return config
+
+
+def write_config_shard(entries: dict, run_name: str | None = None) -> Path:
+    """
+    entries を config.d（run_name を指定した場合は config.d/<run_name>）の新しいファイルに書く。
+    ファイル名はプロセスごとに一意で、既存のファイルは書き換えないので並列に動く graph 同士で消し合わない。
+    一時ファイルに書いてから rename するので、読む側が書きかけのファイルを見ることはない。
+    """
+    directory = config_shard_dir / run_name if run_name else config_shard_dir
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    tmp = directory / f".{name}.tmp"
+    write_config(tmp, entries)
+    path = directory / f"{name}.json"
+    os.replace(tmp, path)
+    return path
+
+
 def discover_data_dirs(root: Path, recursive: bool) -> list[Path]:
     if not root.exists():
         return []
@@ -62,16 +143,43 @@ def discover_data_dirs(root: Path, recursive: bool) -> list[Path]:
     return [d for d in root.iterdir() if d.is_dir()]
 
 
-def label_from_meta(data_dir: Path) -> str | None:
-    meta_path = data_dir / "meta.json"
-    if not meta_path.exists():
-        if data_dir.name == "PP":
-            return "PP"
-        return None
+def discover_from_catalog(args: argparse.Namespace) -> dict[Path, dict | None]:
+    """
+    カタログを更新し、--seed/--stage/--tuple/--sym/--intersection に合うデータディレクトリを
+    {パス: meta.jsonの内容} で返す。
+    """
+    from .catalog import Catalog, default_catalog_path
+
+    if args.catalog:
+        path = Path(args.catalog)
+    else:
+        path = default_catalog_path(ANALYSIS_OUTPUTS if args.run_name else None)
+    catalog = Catalog(path)
     try:
-        meta = json.loads(meta_path.read_text("utf-8"))
-    except json.JSONDecodeError:
-        return None
+        if not args.no_catalog_refresh:
+            catalog.refresh()
+        return catalog.query(
+            seeds=args.seed,
+            stages=args.stage,
+            tuples=args.tuple,
+            sym=args.sym,
+            intersection="|".join(args.intersection) or None,
+        )
+    finally:
+        catalog.close()
+
+
+def label_from_meta(data_dir: Path, meta: dict | None = None) -> str | None:
+    if meta is None:
+        meta_path = data_dir / "meta.json"
+        if not meta_path.exists():
+            if data_dir.name == "PP":
+                return "PP"
+            return None
+        try:
+            meta = json.loads(meta_path.read_text("utf-8"))
+        except json.JSONDecodeError:
+            return None
 
     tuple_v = meta.get("tuple")
     sym = meta.get("sym")
@@ -86,68 +194,76 @@ def label_from_meta(data_dir: Path) -> str | None:
     return label
 
 
-def get_config(board_data_dirs: list[Path]):
-    with config_lock(config_path):
-        if config_path.exists():
-            config = read_config(config_path)
-            for d in board_data_dirs:
-                rel = d.relative_to(board_dir)
-                key = make_safe_name(rel)
-                meta_label = label_from_meta(d)
-                default_label = meta_label if meta_label else str(rel)
-                if key not in config:
-                    config[key] = {
-                        "label": default_label,
-                        "color": None,
-                        "linestyle": "solid",
-                        "order": 0,
-                    }
-                else:
-                    if meta_label:
-                        current_label = config[key].get("label")
-                        if current_label in (str(rel), key, None, ""):
-                            config[key]["label"] = meta_label
-            # orderを追記したのでorder keyが存在しない場合
-            for d in config.values():
-                if "order" not in d:
-                    d["order"] = 0
-        else:
-            config = {
-                make_safe_name(d.relative_to(board_dir)): {
-                    "label": (label_from_meta(d) or str(d.relative_to(board_dir))),
-                    "color": None,
-                    "linestyle": "solid",
-                }
-                for d in board_data_dirs
+def add_default_styles(
+    config: dict,
+    board_data_dirs: list[Path],
+    data_metas: dict[Path, dict | None],
+) -> bool:
+    """
+    config に無いディレクトリのスタイルを追加し、meta.json から作ったラベルに更新する。
+    変更があれば True を返す。
+    """
+    changed = False
+    for d in board_data_dirs:
+        rel = d.relative_to(board_dir)
+        key = make_safe_name(rel)
+        meta_label = label_from_meta(d, data_metas.get(d))
+        default_label = meta_label if meta_label else str(rel)
+        if key not in config:
+            config[key] = {
+                "label": default_label,
+                "color": None,
+                "linestyle": "solid",
+                "order": 0,
             }
-
-        write_config(config_path, config)
+            changed = True
+        elif meta_label:
+            current_label = config[key].get("label")
+            if current_label in (str(rel), key, None, "") and current_label != meta_label:
+                config[key]["label"] = meta_label
+                changed = True
+    # orderを追記したのでorder keyが存在しない場合
+    for d in config.values():
+        if "order" not in d:
+            d["order"] = 0
+            changed = True
+    return changed
+
+
+def get_config(
+    board_data_dirs: list[Path],
+    data_metas: dict[Path, dict | None],
+    shard: bool = False,
+):
+    """
+    スタイル設定を返す。新しいディレクトリがあれば既定のスタイルを config.d の新しいファイルに書く
+    （新しいディレクトリがなければ書き込まない）。shard=True の場合は config.d/<run_name>/ に run_name ごとに書く。
+    meta.json から作ったラベルへの更新は読み込んだ設定にだけ適用する（毎回同じ結果になるので書かない）。
+    """
+    config = read_merged_config()
+    known = set(config)
+    add_default_styles(config, board_data_dirs, data_metas)
+    new_keys = {make_safe_name(d.relative_to(board_dir)): d for d in board_data_dirs}
+    new_keys = {key: d for key, d in new_keys.items() if key not in known}
+    if not new_keys:
+        return config
+
+    groups: dict[str | None, dict] = {}
+    for key, d in new_keys.items():
+        run_name = d.relative_to(board_dir).parts[0] if shard else None
+        groups.setdefault(run_name, {})[key] = config[key]
+    for run_name, entries in groups.items():
+        write_config_shard(entries, run_name)
     return config
 
 
-def normalize_sym(value):
-    if isinstance(value, bool):
-        return "sym" if value else "notsym"
-    if isinstance(value, str):
-        return value.lower()
-    return None
-
-
-def matches_meta(pd: PlayerData) -> bool:
+def matches_meta(pd: PlayerData, args: argparse.Namespace) -> bool:
     if not (args.seed or args.stage or args.tuple or args.sym):
         return True
     meta = pd.meta
     if not meta:
         return False
 
-    def as_int(value):
-        if value is None:
-            return None
-        try:
-            return int(value)
-        except (TypeError, ValueError):
-            return None
-
     if args.seed and as_int(meta.get("seed")) not in args.seed:
         return False
     if args.stage and as_int(meta.get("stage")) not in args.stage:
@@ -159,7 +275,14 @@ def matches_meta(pd: PlayerData) -> bool:
     return True
 
 
-def get_files(config: dict, board_data_dirs: list[Path]) -> list[PlayerData]:
+def get_files(
+    config: dict,
+    board_data_dirs: list[Path],
+    args: argparse.Namespace,
+    data_metas: dict[Path, dict | None],
+) -> list[PlayerData]:
+    exclude_match = re.compile("|".join(args.exclude + ["sample"]))
+    intersection_match = re.compile("|".join(args.intersection))
     is_include_PP = args.graph in (
         "surv",
         "surv-diff",
@@ -179,7 +302,10 @@ def get_files(config: dict, board_data_dirs: list[Path]) -> list[PlayerData]:
         if not is_include_PP and rel.parts and rel.parts[0] == "PP":
             continue
         pd = PlayerData(d, config)
-        if not matches_meta(pd):
+        pd.max_games = args.max_games
+        if d in data_metas:
+            pd.preload_meta(data_metas[d])
+        if not matches_meta(pd, args):
             continue
         data.append(pd)
     print(f"対象のディレクトリ数: {len(data)}")
@@ -221,9 +347,16 @@ arg_parser.add_argument(
         "evals",
         "boxplot-eval",
         "pea",
+        "multi",
     ],
     help="実行するグラフを指定する。",
 )
+arg_parser.add_argument(
+    "--graphs",
+    nargs="+",
+    default=[],
+    help="multi で描画するグラフを複数指定する（各データは1回だけ読み込む）。対応するグラフはREADME.mdを参照。",
+)
 arg_parser.add_argument(
     "--output",
     "-o",
@@ -248,6 +381,12 @@ arg_parser.add_argument(
     type=str,
     help="設定ファイルのパスを指定する。現在は未使用。",
 )
+arg_parser.add_argument(
+    "--config-shard",
+    action="store_true",
+    default=os.environ.get("GRAPH_CONFIG_SHARD", "0") != "0",
+    help="新しいディレクトリのスタイルを config.d/<run_name>/ に run_name ごとに書く（環境変数 GRAPH_CONFIG_SHARD=1 でも可）。",
+)
 arg_parser.add_argument(
     "--is-show",
     action="store_true",
@@ -317,6 +456,103 @@ boxplot_group.add_argument(
     default=10,
     help="箱ひげ図のビン幅を指定する（boxplot系のみ）。",
 )
+arg_parser.add_argument(
+    "--bootstrap",
+    type=int,
+    default=1000,
+    help="surv-mean / surv-diff-mean / *-mean-symdiff 系の95%%信頼区間を seed の bootstrap で求める回数（0で描かない）。",
+)
+arg_parser.add_argument(
+    "--sample-size",
+    type=int,
+    help="散布図の点数を指定する（scatter系のみ、デフォルト: scatter 1000、scatter_v2・scatter-symdiff 1500）。",
+)
+arg_parser.add_argument(
+    "--sample-seed",
+    type=int,
+    default=0,
+    help="散布図の点を選ぶ乱数のseed（scatter系のみ、同じseedなら同じ点になる）。",
+)
+arg_parser.add_argument(
+    "--max-games",
+    type=int,
+    help="各プレイヤの先頭からこの数のゲームだけを使う（ゲームごとの索引で必要な部分だけ読む）。",
+)
+arg_parser.add_argument(
+    "--preview",
+    type=int,
+    nargs="?",
+    const=200,
+    help="ランダムに選んだこの数のゲーム（値を省略すると200）で先に描き、ゲームを倍々に足して描き直す"
+    "（acc / err-rel / err-abs とその -mean、evals-mean のみ、帯は標準誤差の±1.96倍）。",
+)
+arg_parser.add_argument(
+    "--target-se",
+    type=float,
+    help="--preview で、曲線の標準誤差の最大値がこの値を下回ったら残りのゲームを読まずに終わる。",
+)
+arg_parser.add_argument(
+    "--stratify-bin",
+    type=int,
+    help="progressをこの幅で区切り、区間ごとに均等に点を選ぶ（scatter系のみ）。",
+)
+arg_parser.add_argument(
+    "--density",
+    action="store_true",
+    help="標本ではなく全ての手の密度（2次元ヒストグラム）を描く（scatter系のみ、scatter-symdiff は seed をまとめる）。",
+)
+arg_parser.add_argument(
+    "--cache-dir",
+    type=str,
+    help="解析済みデータのキャッシュ先を指定する（デフォルト: .cache/graph、環境変数 GRAPH_CACHE_DIR）。",
+)
+arg_parser.add_argument(
+    "--no-cache",
+    action="store_true",
+    help="解析済みデータのキャッシュを使わない。",
+)
+arg_parser.add_argument(
+    "--data-only",
+    action="store_true",
+    help="描画せずに曲線を CSV（--output の拡張子が .npz なら npz）に書き出す。matplotlib を import しない。",
+)
+arg_parser.add_argument(
+    "--curve-store",
+    type=str,
+    help="計算した曲線の保存先（デフォルト: analysis_outputs/<run_name>/curves、--run-name がなければ出力先の curves）。",
+)
+arg_parser.add_argument(
+    "--no-curve-store",
+    action="store_true",
+    help="計算した曲線を保存・再利用しない。",
+)
+arg_parser.add_argument(
+    "--replot",
+    action="store_true",
+    help="board_data を読まず、保存済みの曲線だけで描画する（config.json の変更の反映用）。",
+)
+arg_parser.add_argument(
+    "--jobs",
+    "-j",
+    type=int,
+    help="プレイヤごとの読み込み・曲線計算を並列に行うプロセス数（0でCPU数、環境変数 GRAPH_JOBS）。",
+)
+arg_parser.add_argument(
+    "--catalog",
+    type=str,
+    help="--recursive で使うカタログ(SQLite)のパスを指定する（デフォルト: --run-name があれば analysis_outputs/catalog.sqlite、"
+    "なければ output/catalog.sqlite、環境変数 GRAPH_CATALOG）。",
+)
+arg_parser.add_argument(
+    "--no-catalog",
+    action="store_true",
+    help="--recursive でカタログを使わず、board_data配下を毎回探索する。",
+)
+arg_parser.add_argument(
+    "--no-catalog-refresh",
+    action="store_true",
+    help="カタログを更新せずにそのまま使う（graph batch が内部で使用）。",
+)
 arg_parser.add_argument(
     "--version",
     "-v",
@@ -326,21 +562,6 @@ arg_parser.add_argument(
 """,
 )
 
-args = arg_parser.parse_args()
-exclude_match = re.compile("|".join(args.exclude + ["sample"]))
-intersection_match = re.compile("|".join(args.intersection))
-board_data_dirs = discover_data_dirs(board_dir, args.recursive)
-output_dir = BASE_DIR.parent / "output"
-if args.output_dir:
-    output_dir = Path(args.output_dir)
-elif args.run_name:
-    output_dir = Path("/HDD/momiyama2/data/study/analysis_outputs") / args.run_name
-output_dir.mkdir(parents=True, exist_ok=True)
-
-config_path = BASE_DIR / "config.json"
-config = get_config(board_data_dirs)
-player_data_list = get_files(config, board_data_dirs)
-
 def infer_scatter_output_name(player_data_list: list[PlayerData]) -> str | None:
     """Infer output name from board_data layout when a single target is used."""
     if not player_data_list:
@@ -374,227 +595,60 @@ def infer_scatter_output_name(player_data_list: list[PlayerData]) -> str | None:
     return None
 
 
-if args.graph == "acc":
-    output_name = args.output if args.output else "accuracy.pdf"
-
-    result = accuracy.calc_accuracy_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "acc-mean":
-    output_name = args.output if args.output else "accuracy_mean.pdf"
-
-    result = accuracy.calc_accuracy_mean_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "acc-mean-symdiff":
-    output_name = args.output if args.output else "accuracy_mean_symdiff.pdf"
-
-    result = accuracy.calc_accuracy_mean_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "acc-diff":
-    output_name = args.output if args.output else "acc-diff.pdf"
-
-    result = acc_diff.acc_diff_plot(
-        player_data_list=player_data_list,
-        order=args.acc_diff_order,
-    )
-elif args.graph == "err-rel":
-    output_name = args.output if args.output else "error_rel.pdf"
-
-    result = error_rel.calc_rel_error_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "err-rel-mean":
-    output_name = args.output if args.output else "error_rel_mean.pdf"
-
-    result = error_rel.calc_rel_error_mean_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "err-rel-mean-symdiff":
-    output_name = args.output if args.output else "error_rel_mean_symdiff.pdf"
-
-    result = error_rel.calc_rel_error_mean_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "err-abs":
-    output_name = args.output if args.output else "error_abs.pdf"
-
-    result = error_abs.calc_abs_error_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "err-abs-mean":
-    output_name = args.output if args.output else "error_abs_mean.pdf"
-
-    result = error_abs.calc_abs_error_mean_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "err-abs-mean-symdiff":
-    output_name = args.output if args.output else "error_abs_mean_symdiff.pdf"
-
-    result = error_abs.calc_abs_error_mean_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "surv":
-    output_name = args.output if args.output else "survival.pdf"
-
-    result = survival.calc_survival_rate_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "surv-symdiff":
-    output_name = args.output if args.output else "survival_symdiff.pdf"
-
-    result = survival.calc_survival_rate_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "surv-mean":
-    output_name = args.output if args.output else "survival_mean.pdf"
+def plot_result(
+    graph: str,
+    result,
+    output: Path,
+    config: dict,
+    is_show: bool = False,
+) -> None:
+    import matplotlib.pyplot as plt
 
-    result = survival.calc_survival_mean_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "surv-mean-symdiff":
-    output_name = args.output if args.output else "survival_mean_symdiff.pdf"
-
-    result = survival.calc_survival_mean_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "surv-diff":
-    output_name = args.output if args.output else "survival-diff.pdf"
+    from .paired import SIGNIFICANCE_LEVEL
 
-    result = survival_diff.calc_survival_diff_rate_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "surv-diff-mean":
-    output_name = args.output if args.output else "survival-diff-mean.pdf"
-
-    result = survival_diff.calc_survival_diff_mean_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "histgram":
-    output_name = args.output if args.output else "histgram.pdf"
-
-    result = histgram.plot_histgram(
-        player_data_list=player_data_list,
-        output=output_dir / output_name,
-        is_show=args.is_show,
-    )
-elif args.graph == "scatter":
-    if args.output:
-        output_name = args.output
-    else:
-        inferred = infer_scatter_output_name(player_data_list)
-        output_name = inferred if inferred else "scatter.pdf"
-
-    result = scatter.plot_scatter(
-        player_data_list=player_data_list,
-        output=output_dir / output_name,
-        is_show=args.is_show,
-    )
-elif args.graph == "scatter_v2":
-    if args.output:
-        output_name = args.output
-    else:
-        inferred = infer_scatter_output_name(player_data_list)
-        output_name = inferred if inferred else "scatter.pdf"
-
-    result = scatter_v2.plot_scatter(
-        player_data_list=player_data_list,
-        output=output_dir / output_name,
-        is_show=args.is_show,
-    )
-elif args.graph == "scatter-symdiff":
-    output_name = args.output if args.output else "scatter_symdiff.pdf"
-
-    result = scatter_symdiff.plot_scatter_symdiff(
-        player_data_list=player_data_list,
-        output=output_dir / output_name,
-        is_show=args.is_show,
-    )
-elif args.graph == "evals":
-    output_name = args.output if args.output else "evals.pdf"
-
-    result = evals.calc_eval_data(
-        player_data_list=player_data_list,
-        output=output_dir / output_name,
-        is_show=args.is_show,
-    )
-elif args.graph == "evals-mean":
-    output_name = args.output if args.output else "evals_mean.pdf"
-
-    result = evals.calc_eval_mean_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "evals-mean-symdiff":
-    output_name = args.output if args.output else "evals_mean_symdiff.pdf"
-
-    result = evals.calc_eval_mean_data(
-        player_data_list=player_data_list,
-    )
-elif args.graph == "boxplot-eval":
-    output_name = args.output if args.output else "boxplot_eval.pdf"
-
-    result = boxplot.plot_boxplot_eval_ratios(
-        player_data_list=player_data_list,
-        output=output_dir / output_name,
-        is_show=args.is_show,
-        min_progress=args.min_progress,
-        max_progress=args.max_progress,
-        bin_width=args.bin_width,
-    )
-elif args.graph == "pea":
-    output_name = args.output if args.output else "boxplot_pea.pdf"
-
-    result = progress_eval_accuracy.create_progress_eval_accuracy_plot(
-        player_data_list=player_data_list,
-        pp_eval_file=board_dir / "PP" / "eval.txt",
-        output=output_dir / output_name,
-        is_show=args.is_show,
-        min_progress=args.min_progress,
-        max_progress=args.max_progress,
-        bin_width=args.bin_width,
-    )
-
-if result:
-    if args.graph in (
-        "acc-mean-symdiff",
-        "err-abs-mean-symdiff",
-        "err-rel-mean-symdiff",
-    ):
+    if graph in SYMDIFF_GRAPHS:
         plt.axhline(0, color="gray", linestyle="dashed", linewidth=1)
         plt.grid(True, linestyle=":", linewidth=0.5)
-    elif args.graph in (
+    elif graph in (
         "err-abs-mean",
         "err-rel-mean",
-        "surv-mean-symdiff",
         "surv",
-        "surv-symdiff",
         "surv-diff",
         "surv-diff-mean",
         "surv-mean",
-        "evals-mean-symdiff",
     ):
         plt.grid(True, linestyle=":", linewidth=0.5)
     for k, v in result.data.items():
-        k_config = config.get(k, {})
-        if "order" in k_config:
-            del k_config["order"]
-        if args.graph in (
+        k_config = dict(config.get(k, {}))
+        k_config.pop("order", None)
+        if graph in (
             "acc-mean",
             "acc-mean-symdiff",
             "err-abs-mean-symdiff",
             "err-abs-mean",
             "err-rel-mean",
             "err-rel-mean-symdiff",
+            "surv-symdiff",
             "surv-mean-symdiff",
             "surv-mean",
             "surv-diff-mean",
             "evals-mean",
             "evals-mean-symdiff",
         ) and "label" not in k_config:
-            k_config = dict(k_config)
             k_config["label"] = k
-        plt.plot(v.x, v.y, **k_config)
+        (line,) = plt.plot(v.x, v.y, **k_config)
+        if v.lower is not None and v.upper is not None:
+            plt.fill_between(
+                v.x, v.lower, v.upper, color=line.get_color(), alpha=0.2, linewidth=0
+            )
+        if v.pvalue is not None:
+            # 並べ替え検定で有意（p < SIGNIFICANCE_LEVEL）な点
+            significant = [
+                (x, y) for x, y, p in zip(v.x, v.y, v.pvalue) if p < SIGNIFICANCE_LEVEL
+            ]
+            if significant:
+                xs, ys = zip(*significant)
+                plt.scatter(xs, ys, color=line.get_color(), s=8, zorder=3)
     handles, labels = plt.gca().get_legend_handles_labels()
     sorted_pairs = sorted(zip(labels, handles), key=lambda x: x[0])
     labels, handles = zip(*sorted_pairs)
@@ -603,6 +657,335 @@ if result:
     plt.ylabel(result.y_label)
     plt.legend(handles, labels)  # ソート後の順番で凡例を設定
     plt.tight_layout()  # 追加：はみ出しを防ぐ
-    plt.savefig(output_dir / output_name)
-    if args.is_show:
+    plt.savefig(output)
+    if is_show:
         plt.show()
+    plt.close()
+
+
+def run(args: argparse.Namespace) -> None:
+    """
+    解析済みの引数に従ってグラフを1つ（multi では複数）作成する。
+    """
+    cache.configure(
+        directory=Path(args.cache_dir) if args.cache_dir else None,
+        is_enabled=False if args.no_cache else None,
+    )
+    parallel.configure(args.jobs)
+    output_dir = BASE_DIR.parent / "output"
+    if args.output_dir:
+        output_dir = Path(args.output_dir)
+    elif args.run_name:
+        output_dir = ANALYSIS_OUTPUTS / args.run_name
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    curve_dir = None
+    if not args.no_curve_store:
+        if args.curve_store:
+            curve_dir = Path(args.curve_store)
+        elif args.run_name:
+            curve_dir = ANALYSIS_OUTPUTS / args.run_name / "curves"
+        else:
+            curve_dir = output_dir / "curves"
+    curve_store.configure(curve_dir, is_replot=args.replot)
+
+    # カタログ（--replot では保存済みの曲線）から得たmeta.jsonの内容（どちらも使わない場合は空）
+    data_metas: dict[Path, dict | None] = {}
+    if args.replot:
+        if args.graph not in REPLOT_GRAPHS:
+            arg_parser.error(f"--replot で描画できるグラフ: {', '.join(REPLOT_GRAPHS)}")
+        if curve_dir is None:
+            arg_parser.error("--replot と --no-curve-store は同時に指定できません。")
+        data_metas = curve_store.stored_players()
+        board_data_dirs = list(data_metas)
+    elif args.recursive and not args.no_catalog:
+        data_metas = discover_from_catalog(args)
+        board_data_dirs = list(data_metas)
+    else:
+        board_data_dirs = discover_data_dirs(board_dir, args.recursive)
+
+    config = get_config(board_data_dirs, data_metas, shard=args.config_shard)
+    player_data_list = get_files(config, board_data_dirs, args, data_metas)
+
+    if args.data_only and args.graph not in DATA_GRAPHS:
+        arg_parser.error(f"--data-only で出力できるグラフ: {', '.join(DATA_GRAPHS)}")
+    graph_module = importlib.import_module(f".{GRAPH_MODULES[args.graph]}", __package__)
+    # scatter系の点の取り方（--sample-size 未指定ならグラフごとのデフォルト）
+    sample_kwargs = {
+        "seed": args.sample_seed,
+        "stratify_bin": args.stratify_bin,
+        "density": args.density,
+    }
+    if args.sample_size is not None:
+        sample_kwargs["sample_size"] = args.sample_size
+
+    if args.preview is not None:
+        from . import multi, preview
+
+        if args.graph not in preview.PREVIEW_GRAPHS:
+            arg_parser.error(f"--preview で描画できるグラフ: {', '.join(preview.PREVIEW_GRAPHS)}")
+        output_name = args.output if args.output else multi.OUTPUT_NAMES[args.graph]
+        results = preview.iter_preview_data(
+            player_data_list,
+            args.graph,
+            first_games=args.preview,
+            target_se=args.target_se,
+            seed=args.sample_seed,
+        )
+        # 1回ごとに同じファイルへ描き直す（表示は最後の1回だけ）
+        result = None
+        for result in results:
+            if args.data_only:
+                saved = save_plot_data(result, output_dir / output_name)
+                print(f"{saved} saved.")
+            else:
+                plot_result(args.graph, result, output_dir / output_name, config)
+                print(f"{output_dir / output_name} saved.")
+        if result is not None and args.is_show and not args.data_only:
+            plot_result(args.graph, result, output_dir / output_name, config, True)
+        return
+
+    result = None
+    if args.graph == "acc":
+        output_name = args.output if args.output else "accuracy.pdf"
+
+        result = graph_module.calc_accuracy_data(
+            player_data_list=player_data_list,
+        )
+    elif args.graph == "acc-mean":
+        output_name = args.output if args.output else "accuracy_mean.pdf"
+
+        result = graph_module.calc_accuracy_mean_data(
+            player_data_list=player_data_list,
+        )
+    elif args.graph == "acc-mean-symdiff":
+        output_name = args.output if args.output else "accuracy_mean_symdiff.pdf"
+
+        result = graph_module.calc_multi_data(
+            player_data_list=player_data_list,
+            graphs=[args.graph],
+            n_boot=args.bootstrap,
+        )[args.graph]
+    elif args.graph == "acc-diff":
+        output_name = args.output if args.output else "acc-diff.pdf"
+
+        result = graph_module.calc_acc_diff_data(
+            player_data_list=player_data_list,
+            order=args.acc_diff_order,
+        )
+        if not args.data_only:
+            graph_module.plot_acc_diff(result, output_dir / output_name, args.is_show)
+            result = None
+    elif args.graph == "err-rel":
+        output_name = args.output if args.output else "error_rel.pdf"
+
+        result = graph_module.calc_rel_error_data(
+            player_data_list=player_data_list,
+        )
+    elif args.graph == "err-rel-mean":
+        output_name = args.output if args.output else "error_rel_mean.pdf"
+
+        result = graph_module.calc_rel_error_mean_data(
+            player_data_list=player_data_list,
+        )
+    elif args.graph == "err-rel-mean-symdiff":
+        output_name = args.output if args.output else "error_rel_mean_symdiff.pdf"
+
+        result = graph_module.calc_multi_data(
+            player_data_list=player_data_list,
+            graphs=[args.graph],
+            n_boot=args.bootstrap,
+        )[args.graph]
+    elif args.graph == "err-abs":
+        output_name = args.output if args.output else "error_abs.pdf"
+
+        result = graph_module.calc_abs_error_data(
+            player_data_list=player_data_list,
+        )
+    elif args.graph == "err-abs-mean":
+        output_name = args.output if args.output else "error_abs_mean.pdf"
+
+        result = graph_module.calc_abs_error_mean_data(
+            player_data_list=player_data_list,
+        )
+    elif args.graph == "err-abs-mean-symdiff":
+        output_name = args.output if args.output else "error_abs_mean_symdiff.pdf"
+
+        result = graph_module.calc_multi_data(
+            player_data_list=player_data_list,
+            graphs=[args.graph],
+            n_boot=args.bootstrap,
+        )[args.graph]
+    elif args.graph == "surv":
+        output_name = args.output if args.output else "survival.pdf"
+
+        result = graph_module.calc_survival_rate_data(
+            player_data_list=player_data_list,
+        )
+    elif args.graph == "surv-symdiff":
+        output_name = args.output if args.output else "survival_symdiff.pdf"
+
+        result = graph_module.calc_multi_data(
+            player_data_list=player_data_list,
+            graphs=[args.graph],
+            n_boot=args.bootstrap,
+        )[args.graph]
+    elif args.graph == "surv-mean":
+        output_name = args.output if args.output else "survival_mean.pdf"
+
+        result = graph_module.calc_survival_mean_data(
+            player_data_list=player_data_list,
+            n_boot=args.bootstrap,
+        )
+    elif args.graph == "surv-mean-symdiff":
+        output_name = args.output if args.output else "survival_mean_symdiff.pdf"
+
+        result = graph_module.calc_multi_data(
+            player_data_list=player_data_list,
+            graphs=[args.graph],
+            n_boot=args.bootstrap,
+        )[args.graph]
+    elif args.graph == "surv-diff":
+        output_name = args.output if args.output else "survival-diff.pdf"
+
+        result = graph_module.calc_survival_diff_rate_data(
+            player_data_list=player_data_list,
+        )
+    elif args.graph == "surv-diff-mean":
+        output_name = args.output if args.output else "survival-diff-mean.pdf"
+
+        result = graph_module.calc_survival_diff_mean_data(
+            player_data_list=player_data_list,
+            n_boot=args.bootstrap,
+        )
+    elif args.graph == "histgram":
+        output_name = args.output if args.output else "histgram.pdf"
+
+        result = graph_module.plot_histgram(
+            player_data_list=player_data_list,
+            output=output_dir / output_name,
+            is_show=args.is_show,
+        )
+    elif args.graph == "scatter":
+        if args.output:
+            output_name = args.output
+        else:
+            inferred = infer_scatter_output_name(player_data_list)
+            output_name = inferred if inferred else "scatter.pdf"
+
+        result = graph_module.plot_scatter(
+            player_data_list=player_data_list,
+            output=output_dir / output_name,
+            is_show=args.is_show,
+            **sample_kwargs,
+        )
+    elif args.graph == "scatter_v2":
+        if args.output:
+            output_name = args.output
+        else:
+            inferred = infer_scatter_output_name(player_data_list)
+            output_name = inferred if inferred else "scatter.pdf"
+
+        result = graph_module.plot_scatter(
+            player_data_list=player_data_list,
+            output=output_dir / output_name,
+            is_show=args.is_show,
+            **sample_kwargs,
+        )
+    elif args.graph == "scatter-symdiff":
+        output_name = args.output if args.output else "scatter_symdiff.pdf"
+
+        result = graph_module.plot_scatter_symdiff(
+            player_data_list=player_data_list,
+            output=output_dir / output_name,
+            is_show=args.is_show,
+            **sample_kwargs,
+        )
+    elif args.graph == "evals":
+        output_name = args.output if args.output else "evals.pdf"
+
+        result = graph_module.calc_eval_data(
+            player_data_list=player_data_list,
+            output=output_dir / output_name,
+            is_show=args.is_show,
+        )
+    elif args.graph == "evals-mean":
+        output_name = args.output if args.output else "evals_mean.pdf"
+
+        result = graph_module.calc_eval_mean_data(
+            player_data_list=player_data_list,
+        )
+    elif args.graph == "evals-mean-symdiff":
+        output_name = args.output if args.output else "evals_mean_symdiff.pdf"
+
+        result = graph_module.calc_multi_data(
+            player_data_list=player_data_list,
+            graphs=[args.graph],
+            n_boot=args.bootstrap,
+        )[args.graph]
+    elif args.graph == "boxplot-eval":
+        output_name = args.output if args.output else "boxplot_eval.pdf"
+
+        result = graph_module.plot_boxplot_eval_ratios(
+            player_data_list=player_data_list,
+            output=output_dir / output_name,
+            is_show=args.is_show,
+            min_progress=args.min_progress,
+            max_progress=args.max_progress,
+            bin_width=args.bin_width,
+        )
+    elif args.graph == "pea":
+        output_name = args.output if args.output else "boxplot_pea.pdf"
+
+        result = graph_module.create_progress_eval_accuracy_plot(
+            player_data_list=player_data_list,
+            pp_eval_file=board_dir / "PP" / "eval.txt",
+            output=output_dir / output_name,
+            is_show=args.is_show,
+            min_progress=args.min_progress,
+            max_progress=args.max_progress,
+            bin_width=args.bin_width,
+        )
+
+    if args.graph == "multi":
+        if not args.graphs:
+            arg_parser.error("multi には --graphs を指定してください。")
+        # --output は "{graph}" を含むテンプレートとして扱う（例: "{graph}_seed5-14.png"）。
+        # 含まない場合はファイル名の末尾にグラフタイプを付ける。
+        try:
+            multi_results = graph_module.calc_multi_data(
+                player_data_list=player_data_list,
+                graphs=args.graphs,
+                n_boot=args.bootstrap,
+            )
+        except ValueError as e:
+            arg_parser.error(str(e))
+        for graph, graph_result in multi_results.items():
+            if args.output and "{graph}" in args.output:
+                graph_output = args.output.format(graph=graph)
+            elif args.output:
+                output_path = Path(args.output)
+                graph_output = f"{output_path.stem}_{graph}{output_path.suffix}"
+            else:
+                graph_output = graph_module.OUTPUT_NAMES[graph]
+            if not graph_result.data:
+                continue
+            if args.data_only:
+                saved = save_plot_data(graph_result, output_dir / graph_output)
+                print(f"{saved} saved.")
+            else:
+                plot_result(graph, graph_result, output_dir / graph_output, config, args.is_show)
+                print(f"{output_dir / graph_output} saved.")
+    elif result and args.data_only:
+        saved = save_plot_data(result, output_dir / output_name)
+        print(f"{saved} saved.")
+    elif result:
+        plot_result(args.graph, result, output_dir / output_name, config, args.is_show)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["batch"]:
+        from . import batch
+
+        sys.exit(batch.main(sys.argv[2:], run, arg_parser))
+    run(arg_parser.parse_args())
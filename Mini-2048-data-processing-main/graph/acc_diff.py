@@ -1,197 +1,156 @@
-import matplotlib.pyplot as plt
-from matplotlib.lines import Line2D
-from collections import defaultdict
 from pathlib import Path
-import numpy as np
 
+from .accuracy import _calc_accuracy_curve
 from .common import (
-    EvalAndHandProgress,
-    GraphData,
     PlotData,
-    get_eval_and_hand_progress,
-    moving_average,
     PlayerData,
 )
+from .paired import Pair, diff_curve, pair_info, pair_players
+from .parallel import map_players
+
+ACC_DIFF_LABEL = "accuracy difference"
+
+
+def _order_sym_notsym(
+    players: list[PlayerData],
+    prefer_first: str,
+) -> list[PlayerData]:
+    first_match = None
+    second_match = None
+    rest = []
+    for pd in players:
+        sym_value = pair_info(pd)[2]
+        if sym_value is None:
+            name = pd.name.lower()
+            if "notsym" in name:
+                sym_value = "notsym"
+            elif "sym" in name:
+                sym_value = "sym"
+        if sym_value == prefer_first and first_match is None:
+            first_match = pd
+        elif sym_value and sym_value != prefer_first and second_match is None:
+            second_match = pd
+        else:
+            rest.append(pd)
+    if first_match and second_match:
+        return [first_match, second_match] + rest
+    return players
 
 
-def calc_accuracy(
-    pp_ehp: EvalAndHandProgress,
-    pr_ehp: EvalAndHandProgress,
-):
-    count = 0
-    for pp_eval in pp_ehp.idx:
-        for pr_eval in pr_ehp.idx:
-            if pp_eval == pr_eval:
-                count += 1
-    return count / len(pr_ehp.idx)
+def _ordered_pair(
+    pair: Pair,
+    order: str,
+    player_data_list: list[PlayerData],
+) -> list[PlayerData]:
+    """
+    組の2人を order に従って (引かれる側, 引く側) の順に並べる。input では入力順。
+    """
+    if order == "notsym-sym":
+        return [pair.notsym, pair.sym]
+    if order == "input":
+        index = {pd.name: i for i, pd in enumerate(player_data_list)}
+        return sorted([pair.sym, pair.notsym], key=lambda pd: index[pd.name])
+    return [pair.sym, pair.notsym]
 
 
-def acc_diff_plot(
+def calc_acc_diff_data(
     player_data_list: list[PlayerData],
     order: str = "input",
 ) -> PlotData:
     """
-    最善手率の差分を計算し、プロットする。
+    最善手率の差分を計算する。
+    meta.json から sym / notsym の組（run・seed・tuple・stage が同じ）が作れる場合は組ごとに差を取る
+    （paired.py と同じ組み方）。作れない場合は先頭の2つの差を取る。差は両方にある progress だけ。
     """
-    result = PlotData(
-        x_label="progress",
-        y_label="accuracy",
-        data={},
-    )
-
-    for player_data in player_data_list:
-        pp_eval_and_hand_progress = get_eval_and_hand_progress(
-            player_data.pp_eval_state
-        )
-        pr_eval_and_hand_progress = get_eval_and_hand_progress(player_data.eval_file)
-
-        assert len(pp_eval_and_hand_progress) == len(
-            pr_eval_and_hand_progress
-        ), f"データ数が異なります。{len(pp_eval_and_hand_progress)=}, {len(pr_eval_and_hand_progress)=}"
-
-        acc_dict = defaultdict(list)
-
-        for pp_eval, pr_eval in zip(
-            pp_eval_and_hand_progress, pr_eval_and_hand_progress
-        ):
-            acc_dict[pp_eval.prg].append(calc_accuracy(pp_eval, pr_eval))
-
-        # 平均を取る
-        acc = {
-            prg: np.mean(err_list)
-            for prg, err_list in sorted(acc_dict.items(), key=lambda x: x[0])
-        }
-
-        result.data[player_data.name] = GraphData(
-            x=moving_average(list(acc.keys()), 10).tolist(),  # スムージング
-            y=moving_average(list(acc.values()), 10).tolist(),
-        )
-
-    # 差分を計算
-
     if len(player_data_list) < 2:
         raise ValueError("少なくとも2つの player_data_list が必要です。")
 
-    def order_sym_notsym(
-        players: list[PlayerData],
-        prefer_first: str,
-    ) -> list[PlayerData]:
-        first_match = None
-        second_match = None
-        rest = []
-        for pd in players:
-            sym_value = None
-            meta = pd.meta
-            if isinstance(meta, dict):
-                sym_value = meta.get("sym")
-            if sym_value is None:
-                name = pd.name.lower()
-                if "notsym" in name:
-                    sym_value = "notsym"
-                elif "sym" in name:
-                    sym_value = "sym"
-            if sym_value == prefer_first and first_match is None:
-                first_match = pd
-            elif sym_value and sym_value != prefer_first and second_match is None:
-                second_match = pd
-            else:
-                rest.append(pd)
-        if first_match and second_match:
-            return [first_match, second_match] + rest
-        return players
-
-    ordered = player_data_list
-    if order == "sym-notsym":
-        ordered = order_sym_notsym(player_data_list, "sym")
-    elif order == "notsym-sym":
-        ordered = order_sym_notsym(player_data_list, "notsym")
-
-    first = ordered[0]
-    second = ordered[1]
-
-    result2 = PlotData(
-        x_label="progress",
-        y_label="accuracy difference",
-        data={first.name + "-" + second.name: GraphData(x=[], y=[])},
+    pairs = pair_players(player_data_list)
+    if pairs:
+        targets = [_ordered_pair(pair, order, player_data_list) for pair in pairs]
+    else:
+        ordered = player_data_list
+        if order == "sym-notsym":
+            ordered = _order_sym_notsym(player_data_list, "sym")
+        elif order == "notsym-sym":
+            ordered = _order_sym_notsym(player_data_list, "notsym")
+        targets = [ordered[:2]]
+
+    players = list({pd.name: pd for target in targets for pd in target}.values())
+    curves = dict(
+        zip([pd.name for pd in players], map_players(_calc_accuracy_curve, players))
     )
 
-    x_values_first = result.data[first.name].x
-    x_values_second = result.data[second.name].x
-    y_values_first = result.data[first.name].y
-    y_values_second = result.data[second.name].y
-
-    diff_x = []
-    diff_y = []
-
-    # x 値を統一しながら処理
-    for x1, y1 in zip(x_values_first, y_values_first):
-        if x1 in x_values_second:
-            index2 = x_values_second.index(x1)
-            y2 = y_values_second[index2]
-        else:
-            y2 = 0  # 存在しない場合は0
-
-        diff_x.append(x1)
-        diff_y.append(y1 - y2)
-
-    for x2, y2 in zip(x_values_second, y_values_second):
-        if x2 not in x_values_first:
-            y1 = 0  # 存在しない場合は0
-            diff_x.append(x2)
-            diff_y.append(y1 - y2)
+    if pairs:
+        # input の順では組ごとに向きが違うことがあるので、全ての組で同じときだけ向きを付ける
+        directions = {(pair_info(a)[2], pair_info(b)[2]) for a, b in targets}
+    else:
+        first, second = targets[0]
+        directions = {(first.config.get("label"), second.config.get("label"))}
+    y_label = ACC_DIFF_LABEL
+    if len(directions) == 1:
+        names = directions.pop()
+        y_label += f" ({names[0]} - {names[1]})"
+    result = PlotData(x_label="progress", y_label=y_label, data={})
+    for first, second in targets:
+        result.data[first.name + "-" + second.name] = diff_curve(
+            curves[first.name], curves[second.name]
+        )
+    return result
 
-    # 結果を保存
-    result2.data[first.name + "-" + second.name] = GraphData(
-        x=diff_x,
-        y=diff_y,
-    )
 
-    # y=0 を基準に色分け
-    colors = ["blue" if y > 0 else "red" for y in diff_y]
+def plot_acc_diff(
+    result: PlotData,
+    output: Path,
+    is_show: bool = False,
+) -> None:
+    """
+    差分を y=0 を基準に色分けした散布図で描く（組が複数ある場合は1つの図に重ねる）。
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.lines import Line2D
 
-    # プロットを作成
     plt.figure()
     plt.axhline(y=0, color="black", linestyle="--", linewidth=1.0)  # y=0 の基準線
-    plt.scatter(
-        diff_x,
-        diff_y,
-        c=colors,
-        s=10,
-        label=f"{first.config.get('label')} - {second.config.get('label')}",
-    )
+    for graph_data in result.data.values():
+        colors = ["blue" if y > 0 else "red" for y in graph_data.y]
+        plt.scatter(graph_data.x, graph_data.y, c=colors, s=10)
+        plt.plot(graph_data.x, graph_data.y, linestyle="-", alpha=0.5)
     legend_elements = [
         Line2D(
             [0],
             [0],
             marker="o",
             color="w",
-            markerfacecolor="blue",
-            markersize=8,
-            label=f"{first.config.get('label')} > {second.config.get('label')}",
-        ),
-        Line2D(
-            [0],
-            [0],
-            marker="o",
-            color="w",
-            markerfacecolor="red",
+            markerfacecolor=color,
             markersize=8,
-            label=f"{second.config.get('label')} > {first.config.get('label')}",
-        ),
+            label=label,
+        )
+        for color, label in (("blue", "> 0"), ("red", "< 0"))
     ]
     plt.legend(handles=legend_elements)
-    plt.plot(diff_x, diff_y, linestyle="-", alpha=0.5)
 
     plt.xlabel("Progress")
-    plt.ylabel("Accuracy Difference")
+    plt.ylabel(result.y_label)
     plt.title("Accuracy Difference Plot (Colored by Sign)")
-    # plt.legend()
     plt.grid()
-    plt.savefig("output/acc_diff_plot.pdf")
-    # plt.show()
+    plt.tight_layout()
+    plt.savefig(output)
+    print(f"{output} saved.")
+    if is_show:
+        plt.show()
+    plt.close()
 
-    # 出力を確認
-    # print(f"result2.x: {result2.data[first_key + '-' + second_key].x}")
-    # print(f"result2.y: {result2.data[first_key + '-' + second_key].y}")
 
-    return None
+def acc_diff_plot(
+    player_data_list: list[PlayerData],
+    order: str = "input",
+    output: Path = Path("output/acc_diff_plot.pdf"),
+    is_show: bool = False,
+) -> PlotData:
+    """
+    最善手率の差分を計算し、プロットする。
+    """
+    result = calc_acc_diff_data(player_data_list, order)
+    plot_acc_diff(result, output, is_show)
+    return result
@@ -3,55 +3,52 @@ from pathlib import Path
 
 import numpy as np
 
+from . import curve_store
 from .common import (
-    EvalAndHandProgress,
+    EvalTable,
     GraphData,
     PlotData,
-    get_eval_and_hand_progress,
+    calc_mean_data,
+    get_pp_and_player_tables,
+    groupby_progress,
     moving_average,
+    moving_sum,
     PlayerData,
     tuple_sym_stage,
 )
+from .parallel import map_players
 
+# progressごとの平均にかける移動平均の窓幅
+SMOOTHING_WINDOW = 10
 
-def calc_accuracy(
-    pp_ehp: EvalAndHandProgress,
-    pr_ehp: EvalAndHandProgress,
-):
-    pp_best_moves = set(pp_ehp.idx)
-    pr_best_moves = set(pr_ehp.idx)
 
+def calc_accuracy(
+    pp_table: EvalTable,
+    pr_table: EvalTable,
+) -> np.ndarray:
     # playerの最善手のうち、perfect playerの最善手と一致するものの数
-    common_moves = pp_best_moves.intersection(pr_best_moves)
+    common_moves = (pp_table.best_mask & pr_table.best_mask).sum(axis=1)
 
     # プレイヤーの最善手総数で割る
-    return len(common_moves) / len(pr_ehp.idx)
+    return common_moves / pr_table.best_count
 
 
-def _calc_accuracy_curve(player_data: PlayerData) -> GraphData:
-    pp_eval_and_hand_progress = get_eval_and_hand_progress(
-        player_data.pp_eval_state
+def calc_accuracy_curve(pp_table: EvalTable, pr_table: EvalTable) -> GraphData:
+    stats = groupby_progress(pp_table.prg, calc_accuracy(pp_table, pr_table))
+    return GraphData(
+        x=moving_average(stats.prg, SMOOTHING_WINDOW).tolist(),
+        y=moving_average(stats.mean, SMOOTHING_WINDOW).tolist(),
+        count=moving_sum(stats.count, SMOOTHING_WINDOW).tolist(),
     )
-    pr_eval_and_hand_progress = get_eval_and_hand_progress(player_data.eval_file)
 
-    assert len(pp_eval_and_hand_progress) == len(
-        pr_eval_and_hand_progress
-    ), f"データ数が異なります。{len(pp_eval_and_hand_progress)=}, {len(pr_eval_and_hand_progress)=}"
 
-    acc_dict = defaultdict(list)
-
-    for pp_eval, pr_eval in zip(
-        pp_eval_and_hand_progress, pr_eval_and_hand_progress
-    ):
-        acc_dict[pp_eval.prg].append(calc_accuracy(pp_eval, pr_eval))
-    # 平均を取る
-    acc = {
-        prg: np.mean(err_list)
-        for prg, err_list in sorted(acc_dict.items(), key=lambda x: x[0])
-    }
-    return GraphData(
-        x=moving_average(list(acc.keys()), 10).tolist(),
-        y=moving_average(list(acc.values()), 10).tolist(),
+def _calc_accuracy_curve(player_data: PlayerData) -> GraphData:
+    return curve_store.load_or_compute(
+        player_data,
+        "acc",
+        inputs=lambda: [player_data.eval_file, player_data.pp_eval_state],
+        compute=lambda: calc_accuracy_curve(*get_pp_and_player_tables(player_data)),
+        window=SMOOTHING_WINDOW,
     )
 
 
@@ -66,8 +63,9 @@ def calc_accuracy_data(
         y_label="accuracy",
         data={pd.name: None for pd in player_data_list},
     )
-    for player_data in player_data_list:
-        result.data[player_data.name] = _calc_accuracy_curve(player_data)
+    curves = map_players(_calc_accuracy_curve, player_data_list)
+    for player_data, curve in zip(player_data_list, curves):
+        result.data[player_data.name] = curve
     return result
 
 
@@ -78,28 +76,14 @@ def calc_accuracy_mean_data(
     seedごとの平均曲線をさらに平均してプロットする。
     """
     grouped: dict[tuple[int, str, int | None], list[GraphData]] = defaultdict(list)
+    targets = []
     for player_data in player_data_list:
         info = tuple_sym_stage(player_data)
         if info is None:
             continue
-        grouped[info].append(_calc_accuracy_curve(player_data))
+        targets.append((info, player_data))
+    curves = map_players(_calc_accuracy_curve, [player_data for _, player_data in targets])
+    for (info, _), curve in zip(targets, curves):
+        grouped[info].append(curve)
 
-    result = PlotData(
-        x_label="progress",
-        y_label="accuracy_mean",
-        data={},
-    )
-
-    for (tuple_v, sym, stage), curves in grouped.items():
-        if not curves:
-            continue
-        min_len = min(len(c.x) for c in curves)
-        if min_len == 0:
-            continue
-        xs = [np.mean([c.x[i] for c in curves]) for i in range(min_len)]
-        ys = [np.mean([c.y[i] for c in curves]) for i in range(min_len)]
-        label = f"NT{tuple_v}_{sym}_mean"
-        if stage is not None:
-            label += f"_st{stage}"
-        result.data[label] = GraphData(x=xs, y=ys)
-    return result
+    return calc_mean_data(grouped, y_label="accuracy_mean")
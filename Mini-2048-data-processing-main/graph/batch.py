@@ -0,0 +1,296 @@
+"""
+graph × tuple × sym × seed範囲 × stage の組み合わせ（ジョブ）をまとめて実行する。
+
+run_graph_for_run_name.sh のように組み合わせごとに `uv run -m graph` を起動すると、
+起動・import・board_data の探索を毎回やり直すことになる。ここではジョブの一覧を作ってから
+1つのプロセスプールで実行し、カタログの更新は最初の1回だけにする。
+解析済みデータのキャッシュ（.cache/graph）も全ジョブで共有される。
+"""
+
+import argparse
+import json
+import re
+import tomllib
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Callable
+
+from . import cache
+from .catalog import Catalog, default_catalog_path
+from .parallel import mp_context
+
+OUTPUT_BASE = Path("/HDD/momiyama2/data/study/analysis_outputs")
+
+# sym / notsym を1枚に描くため、symで分けないグラフ
+SYMDIFF_GRAPHS = {
+    "acc-mean-symdiff",
+    "err-abs-mean-symdiff",
+    "err-rel-mean-symdiff",
+    "surv-mean-symdiff",
+    "surv-symdiff",
+    "evals-mean-symdiff",
+    "scatter-symdiff",
+}
+
+
+@dataclass
+class BatchSpec:
+    """
+    ジョブの組み合わせの指定。JSON / TOML のキーもこのフィールド名と同じ。
+    """
+
+    run_name: str
+    graphs: list[str]
+    tuples: list[int] = field(default_factory=lambda: [4, 6])
+    syms: list[str] = field(default_factory=lambda: ["sym", "notsym"])
+    # (開始seed, 終了seed) の組（終了seedを含む）。空ならseedで絞り込まない
+    seed_ranges: list[tuple[int, int]] = field(default_factory=list)
+    stage: int | None = None
+    # -mean 系以外でもseed範囲を1枚にまとめる
+    combine_seeds: bool = False
+    # 出力ファイル名（拡張子なし）。"{graph}" を含められる。デフォルトはグラフタイプ
+    output_name: str | None = None
+    ext: str = "png"
+    output_base: Path = OUTPUT_BASE
+    workers: int | None = None
+
+
+@dataclass
+class Job:
+    graph: str
+    argv: list[str]  # python -m graph に渡す引数
+    output: Path
+
+
+def parse_seed_range(value) -> tuple[int, int]:
+    """
+    "5-14" / "5" / [5, 14] を (5, 14) にする。
+    """
+    if isinstance(value, (list, tuple)):
+        start, end = value
+        return int(start), int(end)
+    start, _, end = str(value).partition("-")
+    return int(start), int(end or start)
+
+
+def load_spec(path: Path) -> dict:
+    """
+    JSON / TOML のジョブ指定を読み込む（拡張子で判定）。
+    """
+    if path.suffix == ".toml":
+        with path.open("rb") as f:
+            return tomllib.load(f)
+    return json.loads(path.read_text("utf-8"))
+
+
+def build_spec(values: dict) -> BatchSpec:
+    names = {f.name for f in fields(BatchSpec)}
+    unknown = set(values) - names
+    if unknown:
+        raise ValueError(f"不明なキーがあります: {sorted(unknown)}")
+    values = dict(values)
+    if isinstance(values.get("graphs"), str):
+        values["graphs"] = [values["graphs"]]
+    if "seed_ranges" in values:
+        values["seed_ranges"] = [parse_seed_range(v) for v in values["seed_ranges"]]
+    if "output_base" in values:
+        values["output_base"] = Path(values["output_base"])
+    if "ext" in values:
+        values["ext"] = values["ext"].lstrip(".")
+    return BatchSpec(**values)
+
+
+def is_mean_graph(graph: str) -> bool:
+    return "-mean" in graph
+
+
+def plan_jobs(spec: BatchSpec) -> list[Job]:
+    """
+    指定の組み合わせをジョブの一覧にする。出力先は run_graph_for_run_name.sh と同じ
+    <output_base>/<run_name>/NT<tuple>/<graph>[/<sym>]/<output_name>[_seed<範囲>].<ext>。
+    """
+    run_name_regex = "^" + re.escape(spec.run_name) + "(/|$)"
+    jobs = []
+    for graph in spec.graphs:
+        combine = spec.combine_seeds or is_mean_graph(graph)
+        syms = [None] if graph in SYMDIFF_GRAPHS else spec.syms
+
+        seed_groups: list[tuple[str, list[int] | None]] = []
+        for start, end in spec.seed_ranges:
+            if combine:
+                seed_groups.append((f"seed{start}-{end}", list(range(start, end + 1))))
+            else:
+                seed_groups.extend((f"seed{s}", [s]) for s in range(start, end + 1))
+        if not seed_groups:
+            seed_groups.append(("", None))
+
+        name = spec.output_name or graph
+        if "{graph}" in name:
+            name = name.format(graph=graph)
+        elif spec.output_name and len(spec.graphs) > 1:
+            name = f"{name}_{graph}"
+
+        for seed_tag, seeds in seed_groups:
+            for tuple_v in spec.tuples:
+                for sym in syms:
+                    out_dir = spec.output_base / spec.run_name / f"NT{tuple_v}" / graph
+                    if sym:
+                        out_dir = out_dir / sym
+                    output_file = f"{name}_{seed_tag}.{spec.ext}" if seed_tag else f"{name}.{spec.ext}"
+                    argv = [
+                        graph,
+                        "--recursive",
+                        "--intersection",
+                        run_name_regex,
+                        "--output",
+                        output_file,
+                        "--output-dir",
+                        str(out_dir),
+                        "--tuple",
+                        str(tuple_v),
+                        "--curve-store",
+                        str(spec.output_base / spec.run_name / "curves"),
+                    ]
+                    if sym:
+                        argv += ["--sym", sym]
+                    if spec.stage is not None:
+                        argv += ["--stage", str(spec.stage)]
+                    if seeds:
+                        argv += ["--seed", *map(str, seeds)]
+                    jobs.append(Job(graph=graph, argv=argv, output=out_dir / output_file))
+    return jobs
+
+
+def _run_job(run: Callable[[argparse.Namespace], None], args: argparse.Namespace) -> None:
+    run(args)
+
+
+def run_jobs(
+    jobs: list[Job],
+    run: Callable[[argparse.Namespace], None],
+    graph_parser: argparse.ArgumentParser,
+    workers: int | None = None,
+    output_base: Path = OUTPUT_BASE,
+) -> int:
+    """
+    ジョブをプロセスプールで実行し、失敗したジョブの数を返す。
+    カタログは output_base の下のものを1回だけ更新し、全てのジョブで使う。
+    """
+    catalog_file = default_catalog_path(output_base)
+    # ジョブ側ではカタログを更新しない・プレイヤ単位の並列化もしない（ジョブ単位で並列化する）
+    job_args = [
+        graph_parser.parse_args(
+            job.argv + ["--catalog", str(catalog_file), "--no-catalog-refresh", "--jobs", "1"]
+        )
+        for job in jobs
+    ]
+    catalog = Catalog(catalog_file)
+    try:
+        catalog.refresh()
+    finally:
+        catalog.close()
+
+    failed = 0
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp_context(),
+        initializer=cache.configure,
+        initargs=(cache.cache_dir, cache.max_bytes, cache.enabled),
+    ) as executor:
+        futures = {
+            executor.submit(_run_job, run, args): job for job, args in zip(jobs, job_args)
+        }
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                future.result()
+            except BaseException:
+                failed += 1
+                print(f"失敗: {' '.join(job.argv)}")
+                traceback.print_exc()
+            else:
+                print(f"Saved: {job.output}")
+    return failed
+
+
+arg_parser = argparse.ArgumentParser(
+    prog="graph batch",
+    usage="uv run python -m graph batch [options]",
+    description="graph × tuple × sym × seed範囲 × stage の組み合わせをまとめて実行する。",
+)
+arg_parser.add_argument(
+    "--spec",
+    type=str,
+    help="ジョブの組み合わせを書いた JSON / TOML ファイル（コマンドラインの指定が優先）。",
+)
+arg_parser.add_argument("--run-name", type=str, help="board_data 直下の run_name。")
+arg_parser.add_argument("--graphs", nargs="+", help="実行するグラフタイプ。")
+arg_parser.add_argument("--tuples", nargs="+", type=int, help="tuple の一覧（デフォルト: 4 6）。")
+arg_parser.add_argument(
+    "--syms", nargs="+", choices=["sym", "notsym"], help="sym の一覧（デフォルト: sym notsym）。"
+)
+arg_parser.add_argument(
+    "--seed-ranges", nargs="+", help="seed の範囲（例: 5-14 15-24）。終了seedを含む。"
+)
+arg_parser.add_argument("--stage", type=int, help="stage で絞り込む。")
+arg_parser.add_argument(
+    "--combine-seeds",
+    action="store_true",
+    default=None,
+    help="seed範囲を1枚にまとめる（-mean 系は常にまとめる）。",
+)
+arg_parser.add_argument(
+    "--output-name", type=str, help="出力ファイル名（拡張子なし、デフォルト: グラフタイプ）。"
+)
+arg_parser.add_argument("--ext", type=str, help="出力の拡張子（デフォルト: png）。")
+arg_parser.add_argument(
+    "--output-base", type=str, help=f"出力先のルート（デフォルト: {OUTPUT_BASE}）。"
+)
+arg_parser.add_argument("--workers", type=int, help="並列に実行するジョブ数（デフォルト: CPU数）。")
+arg_parser.add_argument(
+    "--dry-run", action="store_true", help="実行するジョブを表示するだけで実行しない。"
+)
+
+
+def main(
+    argv: list[str],
+    run: Callable[[argparse.Namespace], None],
+    graph_parser: argparse.ArgumentParser,
+) -> int:
+    args = arg_parser.parse_args(argv)
+    values = load_spec(Path(args.spec)) if args.spec else {}
+    for key in (
+        "run_name",
+        "graphs",
+        "tuples",
+        "syms",
+        "seed_ranges",
+        "stage",
+        "combine_seeds",
+        "output_name",
+        "ext",
+        "output_base",
+        "workers",
+    ):
+        value = getattr(args, key)
+        if value is not None:
+            values[key] = value
+    if not values.get("run_name") or not values.get("graphs"):
+        arg_parser.error("--run-name と --graphs（または --spec）を指定してください。")
+    try:
+        spec = build_spec(values)
+    except ValueError as e:
+        arg_parser.error(str(e))
+
+    jobs = plan_jobs(spec)
+    print(f"ジョブ数: {len(jobs)}")
+    if args.dry_run:
+        for job in jobs:
+            print("python -m graph " + " ".join(job.argv))
+        return 0
+    failed = run_jobs(jobs, run, graph_parser, spec.workers, spec.output_base)
+    if failed:
+        print(f"{failed}/{len(jobs)} 件のジョブが失敗しました。")
+    return 1 if failed else 0
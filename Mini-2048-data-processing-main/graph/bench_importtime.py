@@ -0,0 +1,95 @@
+"""
+`python -X importtime -m graph ...` の import 時間を計測する。
+
+    uv run -m graph.bench_importtime                      # 起動のみ（--help）
+    uv run -m graph.bench_importtime -- acc-mean --recursive --data-only --tuple 4
+    uv run -m graph.bench_importtime --max-ms 300 --forbid matplotlib -- acc-mean --data-only
+
+--max-ms を超えた場合や --forbid のモジュールが import された場合は終了コード1を返す
+（import 時間の悪化の検出用）。
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(graph_args: list[str]) -> list[tuple[str, int, int, int]]:
+    """
+    (モジュール名, self[us], cumulative[us], 階層) の一覧を返す。
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "graph", *graph_args],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "MPLBACKEND": "Agg"},
+    )
+    records = []
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME_LINE.match(line)
+        if m:
+            self_us, cumulative_us, indent, name = m.groups()
+            records.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    if proc.returncode != 0 and not records:
+        print(proc.stderr, file=sys.stderr)
+        raise SystemExit(proc.returncode)
+    return records
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="graph.bench_importtime",
+        description="python -m graph の import 時間を -X importtime で計測する。",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="計測回数（中央値を表示）。")
+    parser.add_argument("--top", type=int, default=15, help="表示する上位モジュール数。")
+    parser.add_argument("--max-ms", type=float, help="合計 import 時間の上限[ms]。")
+    parser.add_argument(
+        "--forbid",
+        nargs="+",
+        default=[],
+        help="import されてはいけないモジュール（例: matplotlib）。",
+    )
+    parser.add_argument(
+        "graph_args",
+        nargs="*",
+        default=["--help"],
+        help="python -m graph に渡す引数（-- の後に書く）。",
+    )
+    args = parser.parse_args()
+
+    totals = []
+    last = []
+    for _ in range(args.repeat):
+        last = measure(args.graph_args)
+        totals.append(sum(self_us for _, self_us, _, _ in last))
+    total_ms = statistics.median(totals) / 1000
+
+    print(f"python -m graph {' '.join(args.graph_args)}")
+    print(f"import 時間（中央値, {args.repeat}回）: {total_ms:.1f} ms, モジュール数: {len(last)}")
+    top_level = sorted(
+        (r for r in last if r[3] == 0), key=lambda r: r[2], reverse=True
+    )
+    for name, _, cumulative_us, _ in top_level[: args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    imported = {name for name, _, _, _ in last}
+    for name in args.forbid:
+        found = sorted(m for m in imported if m == name or m.startswith(f"{name}."))
+        if found:
+            print(f"NG: {name} が import されています（{len(found)} モジュール）")
+            failed = True
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"NG: {total_ms:.1f} ms > {args.max_ms} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+eval.txt の読み込みを、従来のテキスト処理（read_text + re.sub + splitlines + float()）と
+mmap で読むバイト列のパーサ（common.read_numeric_rows）で比べる。
+
+    uv run -m graph.bench_parse board_data/<run_name>/seed5/NT4_sym/eval.txt
+    uv run -m graph.bench_parse eval.txt --chunk-mib 4 --repeat 5
+
+時間は中央値、メモリは tracemalloc のピーク（NumPy の配列も含む）。
+"""
+
+import argparse
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from .common import (
+    PARSE_CHUNK_BYTES,
+    EvalAndHandProgress,
+    get_eval_and_hand_progress,
+    read_numeric_rows,
+)
+
+
+def legacy_eval_and_hand_progress(eval_file: Path) -> list[EvalAndHandProgress]:
+    """
+    read_numeric_rows 以前の get_eval_and_hand_progress（比較用）。
+    """
+    eval_txt = eval_file.read_text("utf-8")
+    subed_eval_txt = re.sub(r"game.*\n?", "", eval_txt)
+    eval_lines = subed_eval_txt.splitlines()
+    return [
+        EvalAndHandProgress(
+            evals=list(map(float, line.split()[:4])),
+            prg=int(float(line.split()[4])),
+        )
+        for line in eval_lines
+    ]
+
+
+def measure(func, repeat: int) -> tuple[float, float]:
+    """
+    (時間の中央値[s], メモリのピーク[MiB]) を返す。ピークは最後の1回だけ tracemalloc で測る。
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak / 2**20
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="graph.bench_parse",
+        description="eval.txt の読み込み時間とメモリを従来の方法と比べる。",
+    )
+    parser.add_argument("eval_file", type=Path, help="計測に使う eval.txt。")
+    parser.add_argument("--repeat", type=int, default=3, help="計測回数（中央値を表示）。")
+    parser.add_argument(
+        "--chunk-mib",
+        type=float,
+        default=PARSE_CHUNK_BYTES / 2**20,
+        help="read_numeric_rows のチャンクの大きさ[MiB]。",
+    )
+    args = parser.parse_args()
+    chunk_bytes = max(1, int(args.chunk_mib * 2**20))
+
+    # 結果が従来の方法と一致することを先に確かめる
+    legacy = legacy_eval_and_hand_progress(args.eval_file)
+    values, _ = read_numeric_rows(args.eval_file, 5, chunk_bytes)
+    assert len(legacy) == len(values), "行数が一致しません。"
+    assert np.array_equal(np.array([e.evals for e in legacy]).reshape(-1, 4), values[:, :4])
+    assert np.array_equal(np.array([e.prg for e in legacy]), values[:, 4].astype(np.int64))
+
+    size_mib = args.eval_file.stat().st_size / 2**20
+    print(f"{args.eval_file}: {size_mib:.1f} MiB, {len(values)} 行")
+    cases = [
+        ("legacy get_eval_and_hand_progress", lambda: legacy_eval_and_hand_progress(args.eval_file)),
+        ("get_eval_and_hand_progress", lambda: get_eval_and_hand_progress(args.eval_file)),
+        ("read_numeric_rows", lambda: read_numeric_rows(args.eval_file, 5, chunk_bytes)),
+    ]
+    base = None
+    for name, func in cases:
+        seconds, peak_mib = measure(func, args.repeat)
+        base = base or seconds
+        print(
+            f"  {name:34s} {seconds * 1000:9.1f} ms  x{base / seconds:5.1f}"
+            f"  peak {peak_mib:8.1f} MiB"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
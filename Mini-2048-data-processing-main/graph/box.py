@@ -1,13 +1,17 @@
 from pathlib import Path
-from collections import defaultdict, Counter
 from dataclasses import dataclass
 import numpy as np
-import re
+import sys
 import matplotlib.pyplot as plt
-from typing import Dict, List, Tuple, Literal
+from typing import Literal
+
+from .common import EvalTable, get_eval_table, read_numeric_rows
+from .sketch import QuantileSketch, sketches_by_bin
 
 BASE_DIR = Path(__file__).resolve().parent
 
+ILLEGAL_EVAL = -10000000000  # 非合法手の評価値
+
 
 @dataclass
 class AnalysisConfig:
@@ -55,6 +59,70 @@ class AnalysisConfig:
         return f"{self.model_name}_{self.min_progress}-{self.max_progress}_bin{self.bin_width}_{ratio_suffix}{norm_suffix}"
 
 
+def calc_valid_eval_stats(
+    evals: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (N, 4) の評価値配列から、合法手のマスク、有効な評価値の最大値・最小値、
+    重複を除いた2番目に大きい値（全て同じ値なら最大値）を返す。
+    """
+    evals = np.asarray(evals, dtype=np.float64)
+    legal = evals > ILLEGAL_EVAL
+    masked = np.where(legal, evals, -np.inf)
+    max_val = masked.max(axis=1)
+    min_val = np.where(legal, evals, np.inf).min(axis=1)
+    second_max = np.where(masked < max_val[:, None], masked, -np.inf).max(axis=1)
+    second_max = np.where(np.isneginf(second_max), max_val, second_max)
+    return legal, max_val, min_val, second_max
+
+
+def calc_eval_ratios(
+    evals: np.ndarray,
+    ratio_type: str = "2nd_max_div_max",
+    normalization: str = "none",
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (N, 4) の評価値配列から、行ごとの評価値比率（EvalAndHandProgress.get_eval_ratio と同じ値）、
+    有効な評価値の最大値、有効な行（有効な評価値が2つ以上）のマスクをまとめて計算する。
+    有効でない行の比率は nan。
+    """
+    legal, max_val, min_val, second_max = calc_valid_eval_stats(evals)
+    valid = legal.sum(axis=1) >= 2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if ratio_type == "2nd_max_div_max":
+            raw = np.where(
+                max_val == 0,
+                np.where(second_max == 0, 0.0, -np.inf),
+                second_max / max_val,
+            )
+        else:  # "min_div_max"
+            raw = np.where(
+                max_val == 0,
+                np.where(min_val == 0, 0.0, -np.inf),
+                np.where((min_val < 0) | (max_val < 0), 0.0, min_val / max_val),
+            )
+
+        if normalization in ("min_max", "relative_position"):
+            if ratio_type == "2nd_max_div_max":
+                normalized = np.where(
+                    max_val == min_val,
+                    1.0,
+                    (second_max - min_val) / (max_val - min_val),
+                )
+            elif normalization == "min_max":
+                # min_div_maxの場合、比率自体を[0,1]にクリップ
+                normalized = np.clip(raw, 0.0, 1.0)
+            else:
+                normalized = np.zeros_like(raw)  # 最小値は常に最下位
+        elif normalization == "sigmoid":
+            normalized = 1.0 / (1.0 + np.exp(-raw))
+        else:
+            normalized = raw
+    ratios = np.where(np.isfinite(raw), normalized, raw)
+    return np.where(valid, ratios, np.nan), max_val, valid
+
+
 @dataclass
 class EvalAndHandProgress:
     evals: list[float]  # 長さ4のリスト
@@ -97,59 +165,9 @@ class EvalAndHandProgress:
     def get_eval_ratio(
         self, ratio_type: str = "2nd_max_div_max", normalization: str = "none"
     ) -> float:
-        """指定されたタイプの評価値比率を返す"""
-        sorted_evals = self.valid_evals_sorted
-        if len(sorted_evals) < 2:
-            return float("nan")
-
-        max_val = sorted_evals[0]
-        min_val = sorted_evals[-1]
-
-        # 基本的な比率を計算
-        if ratio_type == "2nd_max_div_max":
-            second_max_val = self.second_max_value
-            if max_val == 0:
-                raw_ratio = 0.0 if second_max_val == 0 else float("-inf")
-            elif second_max_val == float("-inf"):
-                raw_ratio = 1.0
-            else:
-                raw_ratio = second_max_val / max_val
-        else:  # "min_div_max"
-            if max_val == 0:
-                raw_ratio = 0.0 if min_val == 0 else float("-inf")
-            elif min_val < 0 or max_val < 0:
-                raw_ratio = 0
-            else:
-                raw_ratio = min_val / max_val
-
-        # 正規化を適用
-        if normalization == "none" or not np.isfinite(raw_ratio):
-            return raw_ratio
-        elif normalization == "min_max":
-            # Min-Max正規化: (value - min) / (max - min)
-            if ratio_type == "2nd_max_div_max":
-                if max_val == min_val:
-                    return 1.0
-                second_max_val = self.second_max_value
-                return (second_max_val - min_val) / (max_val - min_val)
-            else:  # min_div_max
-                # min_div_maxの場合、最小値は常に0になるので意味がない
-                # 代わりに、比率自体を[0,1]にクリップ
-                return max(0.0, min(1.0, raw_ratio))
-        elif normalization == "relative_position":
-            # 相対位置正規化: より直感的な0-1スケール
-            if ratio_type == "2nd_max_div_max":
-                if max_val == min_val:
-                    return 1.0
-                second_max_val = self.second_max_value
-                return (second_max_val - min_val) / (max_val - min_val)
-            else:  # min_div_max
-                return 0.0  # 最小値は常に最下位
-        elif normalization == "sigmoid":
-            # シグモイド正規化: 外れ値に対してロバスト
-            return 1.0 / (1.0 + np.exp(-raw_ratio))
-
-        return raw_ratio
+        """指定されたタイプの評価値比率を返す（計算は calc_eval_ratios と共通）"""
+        ratios, _, _ = calc_eval_ratios([self.evals], ratio_type, normalization)
+        return float(ratios[0])
 
     @property
     def is_valid(self) -> bool:
@@ -162,65 +180,50 @@ def get_eval_and_hand_progress(eval_file: Path):
     ファイルから
     評価値、選択した手、progressを取得する。
     """
-    eval_txt = eval_file.read_text("utf-8")
-    subed_eval_txt = re.sub(r"game.*\n?", "", eval_txt)
-    eval_lines = subed_eval_txt.splitlines()
+    values, _ = read_numeric_rows(eval_file, 5)
     eval_and_hand_progress = [
         EvalAndHandProgress(
-            evals=list(map(float, line.split()[:4])),
-            prg=int(
-                float(line.split()[4])
-            ),  # progress を double(float)で受け取ってから int に変換
+            evals=row[:4],
+            prg=int(row[4]),  # progress を double(float)で受け取ってから int に変換
         )
-        for line in eval_lines
+        for row in values.tolist()
     ]
     return eval_and_hand_progress
 
 
-def create_boxplot_by_progress_range(
-    eval_and_hand_progress: List[EvalAndHandProgress], config: AnalysisConfig
-):
+def create_boxplot_by_progress_range(table: EvalTable, config: AnalysisConfig):
     """
-    設定に基づいてprogressの範囲でビンに分けて、評価値比率の箱ひげ図を作成する
+    設定に基づいてprogressの範囲でビンに分けて、評価値比率の箱ひげ図を作成する。
+    ビンごとに値を全て持たず、分位点スケッチから箱ひげ図の統計量を求める（外れ値は描かない）。
     """
-    # progressごとにデータを整理（指定範囲内のみ）
-    progress_data = defaultdict(list)
-
-    for eval_data in eval_and_hand_progress:
-        # 有効なデータで、かつ指定範囲内のもののみを使用
-        if (
-            eval_data.is_valid
-            and config.min_progress <= eval_data.prg <= config.max_progress
-        ):
-            ratio = eval_data.get_eval_ratio(config.ratio_type, config.normalization)
-            if np.isfinite(ratio):
-                progress_data[eval_data.prg].append(ratio)
+    ratios, _, valid = calc_eval_ratios(table.evals, config.ratio_type, config.normalization)
+    # 有効なデータで、かつ指定範囲内のもののみを使用
+    mask = (
+        valid
+        & np.isfinite(ratios)
+        & (config.min_progress <= table.prg)
+        & (table.prg <= config.max_progress)
+    )
 
-    # ビンに分ける
-    if not progress_data:
+    if not mask.any():
         print(
             f"Progress範囲 {config.min_progress}-{config.max_progress} に有効なデータがありません"
         )
         return
 
-    bins = []
-    bin_labels = []
-    bin_data = []
+    # ビンに分ける
+    starts = list(range(config.min_progress, config.max_progress + 1, config.bin_width))
+    sketches = sketches_by_bin(
+        table.prg[mask], ratios[mask], starts + [config.max_progress + 1]
+    )
 
-    for bin_start in range(
-        config.min_progress, config.max_progress + 1, config.bin_width
-    ):
+    bins = []
+    bin_data: list[QuantileSketch] = []
+    for bin_start, sketch in zip(starts, sketches):
         bin_end = min(bin_start + config.bin_width - 1, config.max_progress)
-        bin_ratios = []
-
-        for progress in range(bin_start, bin_end + 1):
-            if progress in progress_data:
-                bin_ratios.extend(progress_data[progress])
-
-        if bin_ratios:  # 空でないビンのみ追加
+        if len(sketch):  # 空でないビンのみ追加
             bins.append((bin_start, bin_end))
-            bin_labels.append(f"{bin_start}-{bin_end}")
-            bin_data.append(bin_ratios)
+            bin_data.append(sketch)
 
     if not bin_data:
         print("ビンに有効なデータがありません")
@@ -232,7 +235,9 @@ def create_boxplot_by_progress_range(
 
     # 箱ひげ図を作成
     plt.figure(figsize=(16, 8))
-    plt.boxplot(bin_data, tick_labels=bin_labels)
+    plt.gca().bxp(
+        [sketch.box_stats(f"{start}-{end}") for (start, end), sketch in zip(bins, bin_data)]
+    )
     plt.xlabel("Progress Range")
     plt.ylabel(f"Evaluation Ratio ({config.ratio_description})")
     # plt.title(title)
@@ -247,17 +252,14 @@ def create_boxplot_by_progress_range(
         f"Progress範囲: {config.min_progress}-{config.max_progress}, ビン幅: {config.bin_width}"
     )
     print(f"ビン数: {len(bin_data)}")
-    for i, (bin_range, data) in enumerate(zip(bins, bin_data)):
-        mean_ratio = np.mean(data)
-        std_ratio = np.std(data)
-        median_ratio = np.median(data)
+    for i, (bin_range, sketch) in enumerate(zip(bins, bin_data)):
         print(
-            f"ビン {bin_range[0]}-{bin_range[1]}: {len(data)} データポイント, 平均: {mean_ratio:.4f}, 中央値: {median_ratio:.4f}, 標準偏差: {std_ratio:.4f}"
+            f"ビン {bin_range[0]}-{bin_range[1]}: {len(sketch)} データポイント, 平均: {sketch.mean:.4f}, 中央値: {sketch.quantile(0.5):.4f}, 標準偏差: {sketch.std:.4f}"
         )
 
 
 def create_boxplot_by_max_eval(
-    eval_and_hand_progress: List[EvalAndHandProgress],
+    table: EvalTable,
     config: AnalysisConfig,
     num_bins: int = 250,
 ):
@@ -268,42 +270,25 @@ def create_boxplot_by_max_eval(
     # fontsize
     plt.rcParams["font.size"] = 15
     # 有効なデータを抽出
-    valid_data = []
-    for eval_data in eval_and_hand_progress:
-        if eval_data.is_valid:
-            ratio = eval_data.get_eval_ratio(config.ratio_type, config.normalization)
-            if np.isfinite(ratio):
-                valid_data.append((eval_data.valid_evals_sorted[0], ratio))
-
-    if not valid_data:
+    ratios, max_values, valid = calc_eval_ratios(
+        table.evals, config.ratio_type, config.normalization
+    )
+    mask = valid & np.isfinite(ratios)
+
+    if not mask.any():
         print("有効なデータがありません")
         return
 
-    # 最大評価値でソート
-    valid_data.sort(key=lambda x: x[0])
-    max_values = [x[0] for x in valid_data]
-    ratios = [x[1] for x in valid_data]
-
-    min_val = min(max_values)
-    max_val = max(max_values)
     # bin_edges = np.linspace(0, 5500, 50)
     bin_edges = list(range(0, 5600, 100))
+    sketches = sketches_by_bin(max_values[mask], ratios[mask], bin_edges)
 
-    bin_data = []
+    bin_data: list[QuantileSketch] = []
     bin_labels = []
 
-    for i in range(56 - 1):
-        bin_start = bin_edges[i]
-        bin_end = bin_edges[i + 1]
-
-        # このビンに含まれるデータを抽出
-        bin_ratios = []
-        for max_val, ratio in valid_data:
-            if bin_start <= max_val <= bin_end:
-                bin_ratios.append(ratio)
-
-        if bin_ratios:  # 空でないビンのみ追加
-            bin_data.append(bin_ratios)
+    for bin_end, sketch in zip(bin_edges[1:], sketches):
+        if len(sketch):  # 空でないビンのみ追加
+            bin_data.append(sketch)
             if bin_end % 1000 == 0:
                 bin_labels.append(f"-{bin_end:.0f}")
             else:
@@ -322,8 +307,8 @@ def create_boxplot_by_max_eval(
     for suffix, data_half, labels_half, positions_half, offset in halves:
         plt.figure(figsize=(8, 3))
         positions = [i - 0.5 for i in range(1, len(data_half) + 1)]
-        box_plot = plt.boxplot(
-            data_half,
+        box_plot = plt.gca().bxp(
+            [sketch.box_stats() for sketch in data_half],
             positions=positions,
             showfliers=False,
             widths=0.8,
@@ -345,11 +330,9 @@ def create_boxplot_by_max_eval(
 
         print(f"箱ひげ図 ({suffix}) を {output_path} に保存しました")
         print(f"ビン数: {len(data_half)}")
-        for i, (label, data) in enumerate(zip(labels_half, data_half)):
-            mean_ratio = np.mean(data)
-            std_ratio = np.std(data)
+        for i, (label, sketch) in enumerate(zip(labels_half, data_half)):
             print(
-                f"[{suffix}] ビン {label or i}: {len(data)} データポイント, 平均比率: {mean_ratio:.4f}, 標準偏差: {std_ratio:.4f}"
+                f"[{suffix}] ビン {label or i}: {len(sketch)} データポイント, 平均比率: {sketch.mean:.4f}, 標準偏差: {sketch.std:.4f}"
             )
 
 
@@ -357,7 +340,7 @@ if __name__ == "__main__":
 
     # CNN_DEEPモデルの分析
     config = AnalysisConfig(
-        data_file=Path("cp_board_data/PP/eval.txt"),
+        data_file=Path(sys.argv[1]) if len(sys.argv) > 1 else Path("cp_board_data/PP/eval.txt"),
         # data_file=Path("board_data/[learning-toggle.py][model-DEEP][seed-1][symmetry-True][type-toggle]/eval.txt"),
         # data_file=Path("board_data/[learning-buffer.py][model-DEEP][seed-1][symmetry-True][freq-50]/eval.txt"),
         # data_file=Path(
@@ -376,62 +359,44 @@ if __name__ == "__main__":
         exit(1)
 
     print(f"データを読み込み中... ({config.model_name})")
-    eval_and_hand_progress = get_eval_and_hand_progress(config.data_file)
-    print(f"読み込んだデータ数: {len(eval_and_hand_progress)}")
+    table = get_eval_table(config.data_file)
+    print(f"読み込んだデータ数: {len(table)}")
 
     # 基本統計情報を表示
-    valid_data = []
-    invalid_count = 0
-
-    for eval_data in eval_and_hand_progress:
-        if eval_data.is_valid:
-            ratio = eval_data.get_eval_ratio(config.ratio_type, config.normalization)
-            if np.isfinite(ratio):
-                valid_data.append(
-                    {
-                        "ratio": ratio,
-                        "progress": eval_data.prg,
-                        "valid_moves": len(eval_data.valid_evals_sorted),
-                    }
-                )
-        else:
-            invalid_count += 1
+    ratios, max_val, valid = calc_eval_ratios(
+        table.evals, config.ratio_type, config.normalization
+    )
+    legal, _, _, second_max = calc_valid_eval_stats(table.evals)
+    finite = valid & np.isfinite(ratios)
+    invalid_count = int((~valid).sum())
 
     print(f"\n基本統計情報 ({config.model_name}):")
-    print(f"有効なデータ数: {len(valid_data)}")
+    print(f"有効なデータ数: {int(finite.sum())}")
     print(f"無効なデータ数: {invalid_count}")
     print(f"比率計算方法: {config.ratio_description}")
     print(f"正規化手法: {config.normalization}")
 
-    if valid_data:
-        ratios = [d["ratio"] for d in valid_data]
-        progress_values = [d["progress"] for d in valid_data]
-        valid_moves_counts = [d["valid_moves"] for d in valid_data]
+    if finite.any():
+        ratios = ratios[finite]
+        progress_values = table.prg[finite]
+        valid_moves_counts = legal[finite].sum(axis=1)
 
         # 各統計値を動的に計算
-        max_eval_values = [
-            eval_data.valid_evals_sorted[0]
-            for eval_data in eval_and_hand_progress
-            if eval_data.is_valid
-        ]
-        second_max_eval_values = [
-            eval_data.second_max_value
-            for eval_data in eval_and_hand_progress
-            if eval_data.is_valid
-        ]
+        max_eval_values = max_val[valid]
+        second_max_eval_values = second_max[valid]
 
         print(
             f"評価値比率（{config.ratio_description}） - 平均: {np.mean(ratios):.4f}, 標準偏差: {np.std(ratios):.4f}"
         )
         print(f"評価値比率 - 最小: {np.min(ratios):.4f}, 最大: {np.max(ratios):.4f}")
         print(f"評価値比率 - 中央値: {np.median(ratios):.4f}")
-        print(f"Progress範囲: {min(progress_values)} - {max(progress_values)}")
+        print(f"Progress範囲: {progress_values.min()} - {progress_values.max()}")
         print(
-            f"最大評価値範囲: {min(max_eval_values):.4f} - {max(max_eval_values):.4f}"
+            f"最大評価値範囲: {max_eval_values.min():.4f} - {max_eval_values.max():.4f}"
         )
         if config.ratio_type == "2nd_max_div_max":
             print(
-                f"2番目最大評価値範囲: {min(second_max_eval_values):.4f} - {max(second_max_eval_values):.4f}"
+                f"2番目最大評価値範囲: {second_max_eval_values.min():.4f} - {second_max_eval_values.max():.4f}"
             )
         print(f"有効な手の数 - 平均: {np.mean(valid_moves_counts):.2f}")
 
@@ -446,13 +411,11 @@ if __name__ == "__main__":
         print(
             f"\n1. Progress基準での箱ひげ図を作成中... ({config.min_progress}-{config.max_progress}, {config.bin_width}刻み)"
         )
-        create_boxplot_by_progress_range(eval_and_hand_progress, config)
+        create_boxplot_by_progress_range(table, config)
 
         # 最大評価値基準での箱ひげ図を作成
         print("\n2. 最大評価値基準での箱ひげ図を作成中...")
-        create_boxplot_by_max_eval(
-            eval_and_hand_progress, config
-        )  # configから直接bin_widthを使用
+        create_boxplot_by_max_eval(table, config)  # configから直接bin_widthを使用
 
         print("\n全ての箱ひげ図の作成が完了しました！")
         print(f"出力ファイル接頭辞: {config.output_suffix}")
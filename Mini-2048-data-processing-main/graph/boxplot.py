@@ -1,15 +1,26 @@
 import matplotlib.pyplot as plt
 import numpy as np
 from pathlib import Path
-from collections import defaultdict
 
 from .common import (
-    EvalAndHandProgress,
+    EvalTable,
     GraphData,
     PlotData,
     PlayerData,
-    get_eval_and_hand_progress,
 )
+from .sketch import QuantileSketch, sketches_by_bin
+
+
+def calc_eval_range(table: EvalTable) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    有効な評価値（-10000000000以下を除外）の最大値、最大値と最小値の差、
+    および有効な行（有効な評価値が2つ以上かつ最大値が0でない）のマスクを返す。
+    """
+    valid = table.evals > -10000000000
+    max_val = np.where(valid, table.evals, -np.inf).max(axis=1)
+    min_val = np.where(valid, table.evals, np.inf).min(axis=1)
+    mask = (valid.sum(axis=1) >= 2) & (max_val != 0)
+    return max_val, max_val - min_val, mask
 
 
 def create_boxplot_by_progress_range(
@@ -21,52 +32,40 @@ def create_boxplot_by_progress_range(
     is_show: bool = False,
 ):
     """
-    progressの範囲でビンに分けて、評価値比率の箱ひげ図を作成する
+    progressの範囲でビンに分けて、評価値比率の箱ひげ図を作成する。
+    ビンごとに値を全て持たず、分位点スケッチから箱ひげ図の統計量を求める（外れ値は描かない）。
     """
     # ファイルから評価値データを読み込み
-    eval_and_hand_progress = get_eval_and_hand_progress(player_data.eval_file)
+    table = player_data.eval_table()
 
     # model_nameをconfigから取得（scatter.pyと同様）
     model_name = player_data.name
-    model_label = player_data.get("label", model_name)
-
-    # progressごとにデータを整理（指定範囲内のみ）
-    progress_data = defaultdict(list)
-
-    for eval_data in eval_and_hand_progress:
-        # 指定範囲内のもののみを使用
-        if min_progress <= eval_data.prg <= max_progress:
-            # 評価値が有効なもの（-10000000000以下を除外）
-            valid_evals = [eval for eval in eval_data.evals if eval > -10000000000]
-            if len(valid_evals) >= 2:
-                # 最大値と最小値の比率を計算
-                max_val = max(valid_evals)
-                min_val = min(valid_evals)
-                if max_val != 0:
-                    ratio = max_val - min_val
-                    progress_data[eval_data.prg].append(ratio)
+    model_label = player_data.config.get("label", model_name)
+
+    # 指定範囲内かつ有効なもののみを使用
+    _, ratios, mask = calc_eval_range(table)
+    mask &= (min_progress <= table.prg) & (table.prg <= max_progress)
+    prgs = table.prg[mask]
+    ratios = ratios[mask]
 
     # ビンに分ける
-    if not progress_data:
+    if len(ratios) == 0:
         print(f"Progress範囲 {min_progress}-{max_progress} に有効なデータがありません")
         return None
 
+    starts = list(range(min_progress, max_progress + 1, bin_width))
+    sketches = sketches_by_bin(prgs, ratios, starts + [max_progress + 1])
+
     bins = []
     bin_labels = []
-    bin_data = []
+    bin_data: list[QuantileSketch] = []
 
-    for bin_start in range(min_progress, max_progress + 1, bin_width):
+    for bin_start, sketch in zip(starts, sketches):
         bin_end = min(bin_start + bin_width - 1, max_progress)
-        bin_ratios = []
-
-        for progress in range(bin_start, bin_end + 1):
-            if progress in progress_data:
-                bin_ratios.extend(progress_data[progress])
-
-        if bin_ratios:  # 空でないビンのみ追加
+        if len(sketch):  # 空でないビンのみ追加
             bins.append((bin_start, bin_end))
             bin_labels.append(f"{bin_start}-{bin_end}")
-            bin_data.append(bin_ratios)
+            bin_data.append(sketch)
 
     if not bin_data:
         print("ビンに有効なデータがありません")
@@ -75,7 +74,7 @@ def create_boxplot_by_progress_range(
     output_file = output.with_stem(f"{output.stem}_{model_label}_progress")
     # 箱ひげ図を作成
     plt.figure(figsize=(16, 8))
-    plt.boxplot(bin_data, tick_labels=bin_labels)
+    plt.gca().bxp([sketch.box_stats(label) for label, sketch in zip(bin_labels, bin_data)])
     plt.xlabel("Progress Range")
     plt.ylabel("Evaluation Ratio (Min/Max)")
     plt.xticks(rotation=45)
@@ -91,12 +90,9 @@ def create_boxplot_by_progress_range(
     print(f"箱ひげ図を {output} に保存しました")
     print(f"Progress範囲: {min_progress}-{max_progress}, ビン幅: {bin_width}")
     print(f"ビン数: {len(bin_data)}")
-    for i, (bin_range, data) in enumerate(zip(bins, bin_data)):
-        mean_ratio = np.mean(data)
-        std_ratio = np.std(data)
-        median_ratio = np.median(data)
+    for i, (bin_range, sketch) in enumerate(zip(bins, bin_data)):
         print(
-            f"ビン {bin_range[0]}-{bin_range[1]}: {len(data)} データポイント, 平均: {mean_ratio:.4f}, 中央値: {median_ratio:.4f}, 標準偏差: {std_ratio:.4f}"
+            f"ビン {bin_range[0]}-{bin_range[1]}: {len(sketch)} データポイント, 平均: {sketch.mean:.4f}, 中央値: {sketch.quantile(0.5):.4f}, 標準偏差: {sketch.std:.4f}"
         )
 
     return None
@@ -112,54 +108,34 @@ def create_boxplot_by_max_eval(
     最大評価値を基準にビンに分けて、評価値比率の箱ひげ図を作成する
     """
     # ファイルから評価値データを読み込み
-    eval_and_hand_progress = get_eval_and_hand_progress(player_data.eval_file)
+    table = player_data.eval_table()
 
     # model_nameをconfigから取得
     model_name = player_data.name
-    model_label = player_data.get("label", model_name)
+    model_label = player_data.config.get("label", model_name)
 
     # 有効なデータを抽出
-    valid_data = []
-    for eval_data in eval_and_hand_progress:
-        # 評価値が有効なもの（-10000000000以下を除外）
-        valid_evals = [eval for eval in eval_data.evals if eval > -10000000000]
-        if len(valid_evals) >= 2:
-            # 最大値と最小値の比率を計算
-            max_val = max(valid_evals)
-            min_val = min(valid_evals)
-            if max_val != 0:
-                ratio = max_val - min_val
-                valid_data.append((max_val, ratio))
-
-    if not valid_data:
+    max_values, ratios, mask = calc_eval_range(table)
+    max_values = max_values[mask]
+    ratios = ratios[mask]
+
+    if len(ratios) == 0:
         print("有効なデータがありません")
         return None
 
-    # 最大評価値でソート
-    valid_data.sort(key=lambda x: x[0])
-    max_values = [x[0] for x in valid_data]
-    ratios = [x[1] for x in valid_data]
-
     # 等間隔でビンに分ける
-    min_val = min(max_values)
-    max_val_range = max(max_values)
+    min_val = max_values.min()
+    max_val_range = max_values.max()
     bin_edges = np.linspace(min_val, max_val_range, num_bins + 1)
 
-    bin_data = []
-    bin_labels = []
-
-    for i in range(num_bins):
-        bin_start = bin_edges[i]
-        bin_end = bin_edges[i + 1]
+    sketches = sketches_by_bin(max_values, ratios, bin_edges)
 
-        # このビンに含まれるデータを抽出
-        bin_ratios = []
-        for max_val, ratio in valid_data:
-            if bin_start <= max_val <= bin_end:
-                bin_ratios.append(ratio)
+    bin_data: list[QuantileSketch] = []
+    bin_labels = []
 
-        if bin_ratios:  # 空でないビンのみ追加
-            bin_data.append(bin_ratios)
+    for bin_start, bin_end, sketch in zip(bin_edges[:-1], bin_edges[1:], sketches):
+        if len(sketch):  # 空でないビンのみ追加
+            bin_data.append(sketch)
             bin_labels.append(f"{bin_start:.0f}-{bin_end:.0f}")
 
     if not bin_data:
@@ -169,7 +145,7 @@ def create_boxplot_by_max_eval(
     output_file = output.with_stem(f"{output.stem}_{model_label}_maxeval")
     # 箱ひげ図を作成
     plt.figure(figsize=(14, 8))
-    plt.boxplot(bin_data, tick_labels=bin_labels)
+    plt.gca().bxp([sketch.box_stats(label) for label, sketch in zip(bin_labels, bin_data)])
     plt.xlabel("Max Evaluation Value Range")
     plt.ylabel("Evaluation Ratio (Min/Max)")
     plt.xticks(rotation=45)
@@ -184,12 +160,9 @@ def create_boxplot_by_max_eval(
 
     print(f"最大評価値基準の箱ひげ図を {output} に保存しました")
     print(f"ビン数: {len(bin_data)}")
-    for i, (label, data) in enumerate(zip(bin_labels, bin_data)):
-        mean_ratio = np.mean(data)
-        std_ratio = np.std(data)
-        median_ratio = np.median(data)
+    for i, (label, sketch) in enumerate(zip(bin_labels, bin_data)):
         print(
-            f"ビン {label}: {len(data)} データポイント, 平均: {mean_ratio:.4f}, 中央値: {median_ratio:.4f}, 標準偏差: {std_ratio:.4f}"
+            f"ビン {label}: {len(sketch)} データポイント, 平均: {sketch.mean:.4f}, 中央値: {sketch.quantile(0.5):.4f}, 標準偏差: {sketch.std:.4f}"
         )
 
     return None
@@ -207,7 +180,7 @@ def plot_boxplot_eval_ratios(
     評価値比率の箱ひげ図をプロットする
     scatter.pyと同様に、各ファイルに対して個別の箱ひげ図を作成する
     """
-    for pd in sorted(player_data_list):
+    for pd in sorted(player_data_list, key=lambda pd: pd.name):
         create_boxplot_by_progress_range(
             player_data=pd,
             min_progress=min_progress,
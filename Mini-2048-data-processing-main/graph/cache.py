@@ -0,0 +1,180 @@
+"""
+board_data のテキストファイルを解析した結果を .npy としてキャッシュする。
+
+キャッシュのキーは (ファイルの絶対パス, サイズ, mtime, 種類) で、元ファイルが
+更新されると自動的に別キーになる。書き込みは一時ディレクトリに書いてから
+rename するため、並列に動く複数の graph プロセスで共有できる。
+各エントリには配列名の一覧（keys）を書き、そろっていないエントリは使わない。
+合計サイズが上限を超えた場合は、最後に使われた時刻が古いものから、
+一時的な名前に rename してから削除する（読み込み中のプロセスが中途半端な
+エントリを見ないようにするため）。
+"""
+
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# 解析結果の形式を変えたときは上げる（古いキャッシュは使われずにLRUで消える）
+CACHE_VERSION = 2
+
+KEYS_FILE = "keys"
+
+# この時間より古い一時ディレクトリは、途中で終了したプロセスの残骸とみなして削除する
+STALE_TMP_SECONDS = 3600
+
+cache_dir = Path(
+    os.environ.get("GRAPH_CACHE_DIR", BASE_DIR.parent / ".cache" / "graph")
+)
+max_bytes = int(os.environ.get("GRAPH_CACHE_MAX_BYTES", 20 * 1024**3))
+enabled = os.environ.get("GRAPH_CACHE", "1") != "0"
+
+
+def configure(
+    directory: Path | None = None,
+    max_size: int | None = None,
+    is_enabled: bool | None = None,
+) -> None:
+    """
+    キャッシュの保存先、サイズ上限、有効/無効を変更する。
+    """
+    global cache_dir, max_bytes, enabled
+    if directory is not None:
+        cache_dir = Path(directory)
+    if max_size is not None:
+        max_bytes = max_size
+    if is_enabled is not None:
+        enabled = is_enabled
+
+
+def cache_key(path: Path, kind: str) -> str:
+    """
+    元ファイルのパス・サイズ・mtimeと解析の種類からキャッシュキーを作る。
+    """
+    st = path.stat()
+    src = f"{path.resolve()}\0{st.st_size}\0{st.st_mtime_ns}\0{kind}\0{CACHE_VERSION}"
+    return hashlib.sha1(src.encode("utf-8")).hexdigest()
+
+
+def _load_entry(entry: Path) -> dict[str, np.ndarray] | None:
+    """
+    エントリを読み込む。keys に書かれた配列がそろっていなければ None を返す。
+    """
+    try:
+        keys = (entry / KEYS_FILE).read_text(encoding="utf-8").split()
+        arrays = {
+            key: np.load(entry / f"{key}.npy", mmap_mode="r", allow_pickle=False)
+            for key in keys
+        }
+    except (OSError, ValueError):
+        # 読み込み中に削除された、または壊れている
+        return None
+    try:
+        # LRU用に最終使用時刻を更新する（読み取り専用のキャッシュでは失敗してよい）
+        os.utime(entry)
+    except OSError:
+        pass
+    return arrays
+
+
+def _store_entry(entry: Path, arrays: dict[str, np.ndarray]) -> None:
+    tmp = entry.with_name(f"{entry.name}.tmp-{os.getpid()}-{uuid.uuid4().hex}")
+    tmp.mkdir(parents=True)
+    try:
+        for name, array in arrays.items():
+            np.save(tmp / f"{name}.npy", np.ascontiguousarray(array))
+        (tmp / KEYS_FILE).write_text("\n".join(arrays), encoding="utf-8")
+        try:
+            tmp.rename(entry)
+        except OSError:
+            # 他のプロセスが先に同じキーを書き込んだ
+            shutil.rmtree(tmp, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def _remove_entry(entry: Path) -> None:
+    """
+    エントリを一時的な名前に rename してから削除する。
+    rename は原子的なので、他のプロセスからは完全なエントリか、存在しないエントリにしか見えない。
+    """
+    trash = entry.with_name(f"{entry.name}.tmp-{os.getpid()}-{uuid.uuid4().hex}")
+    try:
+        entry.rename(trash)
+    except OSError:
+        # 他のプロセスが先に削除した
+        return
+    shutil.rmtree(trash, ignore_errors=True)
+
+
+def _entry_size(entry: Path) -> int:
+    size = 0
+    for f in entry.iterdir():
+        try:
+            size += f.stat().st_size
+        except FileNotFoundError:
+            pass
+    return size
+
+
+def evict(limit: int | None = None) -> None:
+    """
+    キャッシュの合計サイズが上限以下になるまで、使われていない順に削除する。
+    """
+    limit = max_bytes if limit is None else limit
+    if not cache_dir.exists():
+        return
+    entries = []
+    for entry in cache_dir.iterdir():
+        try:
+            if not entry.is_dir():
+                continue
+            mtime = entry.stat().st_mtime
+            if ".tmp-" in entry.name:
+                if time.time() - mtime > STALE_TMP_SECONDS:
+                    shutil.rmtree(entry, ignore_errors=True)
+                continue
+            entries.append((mtime, _entry_size(entry), entry))
+        except FileNotFoundError:
+            continue
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries, key=lambda e: e[0]):
+        if total <= limit:
+            break
+        _remove_entry(entry)
+        total -= size
+
+
+def cached_arrays(
+    path: Path,
+    kind: str,
+    parse: Callable[[Path], dict[str, np.ndarray]],
+) -> dict[str, np.ndarray]:
+    """
+    path を parse した結果（配列の辞書）を返す。
+    キャッシュがあれば読み取り専用のmemmapとして返し、なければ parse して保存する。
+    """
+    if not enabled:
+        return parse(path)
+    entry = cache_dir / cache_key(path, kind)
+    if entry.exists():
+        arrays = _load_entry(entry)
+        if arrays is not None:
+            return arrays
+        # そろっていないエントリは作り直す（残っていると rename で置き換えられない）
+        _remove_entry(entry)
+    arrays = parse(path)
+    try:
+        _store_entry(entry, arrays)
+        evict()
+    except OSError as e:
+        print(f"キャッシュの書き込みに失敗しました: {entry} ({e})")
+    return arrays
@@ -0,0 +1,299 @@
+"""
+board_data 配下のデータディレクトリを SQLite に記録するカタログ。
+
+ディレクトリごとに mtime と子ディレクトリの一覧を保存しておき、mtime が
+変わっていないディレクトリは一覧を取り直さない（ディレクトリ自身の stat だけで済ませる）。
+データディレクトリ（eval.txt を持つもの）については meta.json の値と
+PP の eval-state / eval-after-state の場所も記録し、
+--seed / --stage / --tuple / --sym / --intersection の絞り込みをインデックス付きの
+クエリで行う。meta.json は上書き保存（write_meta.py など）でディレクトリの mtime が
+変わらないため、サイズ・mtime を記録しておき、変わっていれば読み直す。
+
+カタログは出力先のルート（--run-name があれば analysis_outputs、なければ output/）の
+catalog.sqlite に置く。
+"""
+
+import json
+import os
+import re
+import sqlite3
+from pathlib import Path
+
+from .common import BASE_DIR, as_int, board_dir, make_safe_name, normalize_sym
+
+CATALOG_VERSION = 2
+CATALOG_NAME = "catalog.sqlite"
+
+# 環境変数で指定した場合は出力先のルートによらずそこを使う
+catalog_path = Path(os.environ["GRAPH_CATALOG"]) if os.environ.get("GRAPH_CATALOG") else None
+
+
+def default_catalog_path(output_root: Path | None = None) -> Path:
+    """
+    出力先のルートの下のカタログの場所（環境変数 GRAPH_CATALOG が優先）。
+    """
+    if catalog_path is not None:
+        return catalog_path
+    return (Path(output_root) if output_root else BASE_DIR.parent / "output") / CATALOG_NAME
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS info (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    rel_path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    children TEXT NOT NULL,
+    is_data INTEGER NOT NULL,
+    run_name TEXT,
+    tuple INTEGER,
+    sym TEXT,
+    seed INTEGER,
+    stage INTEGER,
+    meta TEXT,
+    meta_size INTEGER,
+    meta_mtime_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS dirs_tuple ON dirs (tuple);
+CREATE INDEX IF NOT EXISTS dirs_sym ON dirs (sym);
+CREATE INDEX IF NOT EXISTS dirs_seed ON dirs (seed);
+CREATE INDEX IF NOT EXISTS dirs_stage ON dirs (stage);
+CREATE TABLE IF NOT EXISTS files (
+    rel_path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (rel_path, name)
+);
+"""
+
+# files.name に使うPPの対応ファイルのキー
+PP_COMPANIONS = {
+    "pp:eval-state": ("eval-state.txt", "eval-state-{}.txt"),
+    "pp:eval-after-state": ("eval-after-state.txt", "eval-after-state-{}.txt"),
+}
+
+
+def _regexp(pattern: str, value: str) -> bool:
+    return re.search(pattern, value) is not None
+
+
+class Catalog:
+    def __init__(self, path: Path | None = None, root: Path | None = None):
+        self.path = Path(path) if path else default_catalog_path()
+        self.root = Path(root) if root else board_dir
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 並列に動く graph プロセスから同時に開かれる前提
+        self.conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.create_function("REGEXP", 2, _regexp, deterministic=True)
+        self.conn.executescript(SCHEMA)
+        self._check_version()
+
+    def _check_version(self) -> None:
+        expected = {"version": str(CATALOG_VERSION), "root": str(self.root.resolve())}
+        current = dict(self.conn.execute("SELECT key, value FROM info").fetchall())
+        if current == expected:
+            return
+        # 形式やboard_dirの場所が変わったら作り直す（列が変わることがあるので表ごと）
+        self.conn.execute("BEGIN IMMEDIATE")
+        for table in ("dirs", "files", "info"):
+            self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+        for statement in SCHEMA.split(";"):
+            if statement.strip():
+                self.conn.execute(statement)
+        self.conn.executemany(
+            "INSERT INTO info (key, value) VALUES (?, ?)", expected.items()
+        )
+        self.conn.execute("COMMIT")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def refresh(self) -> None:
+        """
+        board_data を走査してカタログを更新する。mtime が変わったディレクトリだけ一覧を取り直す。
+        mtime が変わっていないデータディレクトリは、meta.json のサイズ・mtime が変わっていれば
+        読み直し、PP ディレクトリの mtime が変わったときは PP の対応ファイルを確認し直す。
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            known = {
+                row[0]: row[1:]
+                for row in self.conn.execute(
+                    "SELECT rel_path, mtime_ns, children, is_data, meta_size, meta_mtime_ns FROM dirs"
+                )
+            }
+            try:
+                pp_mtime_ns = (self.root / "PP").stat().st_mtime_ns
+            except FileNotFoundError:
+                pp_mtime_ns = None
+            pp_changed = known.get("PP", (None,))[0] != pp_mtime_ns
+            seen = set()
+            stack = [""]
+            while stack:
+                rel = stack.pop()
+                path = self.root / rel if rel else self.root
+                try:
+                    mtime_ns = path.stat().st_mtime_ns
+                except FileNotFoundError:
+                    continue
+                seen.add(rel)
+                row = known.get(rel)
+                if row is not None and row[0] == mtime_ns:
+                    children = json.loads(row[1])
+                    if row[2] and (
+                        self._meta_stamp(rel) != (row[3], row[4])
+                        or (pp_changed and self._pp_companions_changed(rel))
+                    ):
+                        self._reindex_data_dir(rel)
+                else:
+                    children, names = self._list_dir(path)
+                    is_data = "eval.txt" in names
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO dirs (rel_path, mtime_ns, children, is_data)"
+                        " VALUES (?, ?, ?, ?)",
+                        (rel, mtime_ns, json.dumps(children), int(is_data)),
+                    )
+                    if is_data:
+                        self._index_data_dir(rel, names)
+                    else:
+                        self.conn.execute("DELETE FROM files WHERE rel_path = ?", (rel,))
+                stack.extend(f"{rel}/{c}" if rel else c for c in children)
+
+            for rel in set(known) - seen:
+                self.conn.execute("DELETE FROM dirs WHERE rel_path = ?", (rel,))
+                self.conn.execute("DELETE FROM files WHERE rel_path = ?", (rel,))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _list_dir(path: Path) -> tuple[list[str], list[str]]:
+        children = []
+        names = []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir():
+                    children.append(entry.name)
+                elif entry.is_file():
+                    names.append(entry.name)
+        return sorted(children), sorted(names)
+
+    def _pp_companions(self, rel: str) -> dict[str, Path]:
+        data_dir = self.root / rel
+        safe_name = make_safe_name(Path(rel))
+        companions = {}
+        for key, (local_name, pp_name) in PP_COMPANIONS.items():
+            local = data_dir / local_name
+            pp = self.root / "PP" / pp_name.format(safe_name)
+            if local.exists():
+                companions[key] = local
+            elif pp.exists():
+                companions[key] = pp
+        return companions
+
+    def _index_data_dir(self, rel: str, names: list[str]) -> None:
+        data_dir = self.root / rel
+        files = {name: data_dir / name for name in names}
+        files.update(self._pp_companions(rel))
+        self.conn.execute("DELETE FROM files WHERE rel_path = ?", (rel,))
+        self.conn.executemany(
+            "INSERT INTO files (rel_path, name, path) VALUES (?, ?, ?)",
+            [(rel, name, str(path)) for name, path in files.items()],
+        )
+        self._index_meta(rel)
+
+    def _meta_stamp(self, rel: str) -> tuple[int | None, int | None]:
+        """
+        meta.json の (サイズ, mtime_ns)。なければ (None, None)。
+        """
+        try:
+            st = (self.root / rel / "meta.json").stat()
+        except FileNotFoundError:
+            return None, None
+        return st.st_size, st.st_mtime_ns
+
+    def _index_meta(self, rel: str) -> None:
+        meta = None
+        meta_path = self.root / rel / "meta.json"
+        meta_size, meta_mtime_ns = self._meta_stamp(rel)
+        if meta_size is not None:
+            try:
+                meta = json.loads(meta_path.read_text("utf-8"))
+            except json.JSONDecodeError:
+                meta = None
+        meta = meta if isinstance(meta, dict) else None
+        m = meta or {}
+        self.conn.execute(
+            "UPDATE dirs SET run_name = ?, tuple = ?, sym = ?, seed = ?, stage = ?, meta = ?,"
+            " meta_size = ?, meta_mtime_ns = ? WHERE rel_path = ?",
+            (
+                Path(rel).parts[0],
+                as_int(m.get("tuple")),
+                normalize_sym(m.get("sym")),
+                as_int(m.get("seed")),
+                as_int(m.get("stage")),
+                json.dumps(meta, ensure_ascii=False) if meta is not None else None,
+                meta_size,
+                meta_mtime_ns,
+                rel,
+            ),
+        )
+
+    def _pp_companions_changed(self, rel: str) -> bool:
+        recorded = {
+            name: Path(path)
+            for name, path in self.conn.execute(
+                "SELECT name, path FROM files WHERE rel_path = ? AND name LIKE 'pp:%'", (rel,)
+            )
+        }
+        return recorded != self._pp_companions(rel)
+
+    def _reindex_data_dir(self, rel: str) -> None:
+        """
+        一覧は変わっていないデータディレクトリを、記録済みのファイル名で索引し直す。
+        """
+        names = [
+            name
+            for (name,) in self.conn.execute(
+                "SELECT name FROM files WHERE rel_path = ? AND name NOT LIKE 'pp:%'", (rel,)
+            )
+        ]
+        self._index_data_dir(rel, names)
+
+    def query(
+        self,
+        seeds: list[int] | None = None,
+        stages: list[int] | None = None,
+        tuples: list[int] | None = None,
+        sym: str | None = None,
+        intersection: str | None = None,
+    ) -> dict[Path, dict | None]:
+        """
+        条件に合うデータディレクトリを {パス: meta.jsonの内容} で返す（相対パス順）。
+        seed/stage/tuple/sym のいずれかを指定した場合、meta.jsonのないディレクトリは含まない。
+        """
+        where = ["is_data = 1"]
+        params: list = []
+        for column, values in (("seed", seeds), ("stage", stages), ("tuple", tuples)):
+            if values:
+                where.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        if sym:
+            where.append("sym = ?")
+            params.append(sym)
+        if intersection:
+            where.append("rel_path REGEXP ?")
+            params.append(intersection)
+        rows = self.conn.execute(
+            f"SELECT rel_path, meta FROM dirs WHERE {' AND '.join(where)} ORDER BY rel_path",
+            params,
+        ).fetchall()
+        return {
+            self.root / rel: (json.loads(meta) if meta is not None else None)
+            for rel, meta in rows
+        }
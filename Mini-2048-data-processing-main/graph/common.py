@@ -1,10 +1,15 @@
+import csv
 import json
+import mmap
 import re
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Iterator
 
 import numpy as np
 
+from . import cache
+
 BASE_DIR = Path(__file__).resolve().parent
 board_dir = BASE_DIR.parent / "board_data"
 
@@ -24,6 +29,9 @@ class PlayerData:
         self.config = config[self.name] if config and self.name in config else {}
         self._meta_loaded = False
         self._meta_cache = None
+        self._n_games: int | None = None
+        # 先頭から読むゲーム数（--max-games）。None なら全てのゲーム
+        self.max_games: int | None = None
 
     @property
     def state_file(self):
@@ -68,6 +76,78 @@ class PlayerData:
                 self._meta_cache = json.loads(meta_path.read_text("utf-8"))
         return self._meta_cache
 
+    def preload_meta(self, meta: dict | None) -> None:
+        """
+        カタログなどで読み込み済みの meta.json の内容を設定する（ファイルを読み直さない）。
+        """
+        self._meta_loaded = True
+        self._meta_cache = meta
+
+    @property
+    def n_games(self) -> int:
+        """
+        終了したゲーム（gameover行）の数。最初に読んだ値を使い回す。
+        """
+        if self._n_games is None:
+            self._n_games = len(get_gameover_table(self.target_dir))
+        return self._n_games
+
+    def first_games(self, k: int) -> np.ndarray:
+        """
+        先頭の k ゲームのゲーム番号（0始まり）を返す。
+        """
+        return np.arange(min(k, self.n_games))
+
+    def _games(self, games):
+        # games の指定がなければ max_games に従う（全て読む場合は None）
+        if games is not None:
+            return games
+        if self.max_games is not None and self.max_games < self.n_games:
+            return self.first_games(self.max_games)
+        return None
+
+    def eval_table(self, games=None) -> "EvalTable":
+        """
+        eval.txt の EvalTable を返す。games（ゲーム番号の配列）を指定した場合はそのゲームだけ、
+        指定しない場合は max_games があれば先頭の max_games ゲームだけを、ゲームごとの索引から読む。
+        """
+        return get_eval_table(self.eval_file, self._games(games))
+
+    def pp_eval_table(self, games=None) -> "EvalTable":
+        """
+        PP の eval-state の EvalTable を返す（games の扱いは eval_table と同じ）。
+        """
+        return get_eval_table(self.pp_eval_state, self._games(games))
+
+    def pp_after_state_evals(self, games=None) -> np.ndarray:
+        """
+        PP の eval-after-state の評価値を返す（games の扱いは eval_table と同じ）。
+        """
+        return get_after_state_evals(self.pp_eval_after_state, self._games(games))
+
+    def gameover_table(self, games=None) -> "GameoverTable":
+        """
+        gameover行の GameoverTable を返す（games の扱いは eval_table と同じ）。
+        """
+        return get_gameover_table(self.target_dir, self._games(games))
+
+
+def normalize_sym(value):
+    if isinstance(value, bool):
+        return "sym" if value else "notsym"
+    if isinstance(value, str):
+        return value.lower()
+    return None
+
+
+def as_int(value):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
 
 def tuple_sym_stage(player_data: PlayerData):
     meta = player_data.meta or {}
@@ -100,6 +180,79 @@ class EvalAndHandProgress:
         return [i for i, eval in enumerate(self.evals) if eval == max_eval]
 
 
+@dataclass
+class EvalTable:
+    """
+    評価値ファイルを列指向で保持するデータクラス。
+    行ごとのPythonオブジェクトを作らずにnumpy配列で扱う。
+    """
+
+    evals: np.ndarray  # (N, 4) float64
+    prg: np.ndarray  # (N,) int32
+    game: np.ndarray  # (N,) int32 0始まりのゲーム番号
+    best_mask: np.ndarray  # (N, 4) bool 最大値の位置
+
+    def __len__(self) -> int:
+        return len(self.prg)
+
+    @property
+    def best_idx(self) -> np.ndarray:
+        """
+        各行で最大値を持つ最初のindexを返す（EvalAndHandProgress.idx[0]相当）。
+        """
+        return self.best_mask.argmax(axis=1)
+
+    @property
+    def best_count(self) -> np.ndarray:
+        """
+        各行で最大値を持つindexの数を返す（len(EvalAndHandProgress.idx)相当）。
+        """
+        return self.best_mask.sum(axis=1)
+
+    @property
+    def best_eval(self) -> np.ndarray:
+        """
+        各行の評価値の最大値を返す。
+        """
+        return self.evals.max(axis=1)
+
+
+@dataclass
+class GameoverTable:
+    """
+    gameover行（1ゲーム1行）を列指向で保持するデータクラス。
+    """
+
+    turn: np.ndarray  # (G,) int64
+    game: np.ndarray  # (G,) int64
+    progress: np.ndarray  # (G,) int64
+    score: np.ndarray  # (G,) int64
+
+    def __len__(self) -> int:
+        return len(self.game)
+
+
+@dataclass
+class ProgressStats:
+    """
+    progressごとに集計した統計量。progressはデータが存在するものだけを昇順で持つ。
+    """
+
+    prg: np.ndarray  # (P,) int64
+    count: np.ndarray  # (P,) int64
+    sum: np.ndarray  # (P,) float64
+    mean: np.ndarray  # (P,) float64
+    var: np.ndarray  # (P,) float64 不偏分散（count < 2 のビンはnan）
+    quantiles: dict[float, np.ndarray] | None = None
+
+    @property
+    def se(self) -> np.ndarray:
+        """
+        平均の標準誤差を返す。
+        """
+        return np.sqrt(self.var / self.count)
+
+
 @dataclass
 class PlotData:
     x_label: str
@@ -111,6 +264,13 @@ class PlotData:
 class GraphData:
     x: list[float]
     y: list[float]
+    # 各点の元になったサンプル数（移動平均の場合は窓内の合計）。不明なら None
+    count: list[int] | None = None
+    # 信頼区間の下限・上限（seed の bootstrap など）。ない場合は None
+    lower: list[float] | None = None
+    upper: list[float] | None = None
+    # 各点の検定の p 値（sym - notsym の差の並べ替え検定など）。ない場合は None
+    pvalue: list[float] | None = None
 
 
 def get_eval_and_hand_progress(eval_file: Path):
@@ -118,20 +278,618 @@ def get_eval_and_hand_progress(eval_file: Path):
     ファイルから
     評価値、選択した手、progressを取得する。
     """
-    eval_txt = eval_file.read_text("utf-8")
-    subed_eval_txt = re.sub(r"game.*\n?", "", eval_txt)
-    eval_lines = subed_eval_txt.splitlines()
+    values, _ = read_numeric_rows(eval_file, 5)
     eval_and_hand_progress = [
         EvalAndHandProgress(
-            evals=list(map(float, line.split()[:4])),
-            prg=int(
-                float(line.split()[4])
-            ),  # progress を double(float)で受け取ってから int に変換
+            evals=row[:4],
+            prg=int(row[4]),  # progress を double(float)で受け取ってから int に変換
         )
-        for line in eval_lines
+        for row in values.tolist()
     ]
     return eval_and_hand_progress
 
 
+GAMEOVER_PATTERN = re.compile(
+    rb"gameover_turn: (\d+); game: (\d+); progress: (\d+); score: (\d+)"
+)
+# gameover表の抽出元の候補（どれも同じgameover行を持つ）
+GAMEOVER_SOURCES = ("state.txt", "after-state.txt", "eval.txt")
+
+
+# read_numeric_rows が1回に解析するバイト数（ピークメモリはほぼ出力の配列＋この数倍）
+PARSE_CHUNK_BYTES = 1 << 22
+
+_NEWLINE = ord("\n")
+_GAME_PREFIX = ord("g")
+_SPACE = ord(" ")
+
+
+def _line_chunks(
+    mm: mmap.mmap,
+    chunk_bytes: int,
+    start: int = 0,
+    stop: int | None = None,
+) -> Iterator[tuple[int, int]]:
+    """
+    [start, stop)（デフォルトはファイル全体）を、行の途中で切らないように chunk_bytes 程度ずつ区切った
+    (開始, 終了) を返す。start は行の先頭で、stop は行の終わり（改行の次）かファイルの終わりであること。
+    """
+    stop = len(mm) if stop is None else stop
+    while start < stop:
+        end = stop
+        if start + chunk_bytes < stop:
+            newline = mm.find(b"\n", start + chunk_bytes - 1, stop)
+            if newline >= 0:
+                end = newline + 1
+        yield start, end
+        start = end
+
+
+def _classify_lines(buf: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    行の先頭から始まるバイト列の各行について (長さ（改行を含む）, gameover行か, 数値行か) を返す。
+    gameover行は先頭のバイトが "g" の行、空行はどちらでもない。
+    """
+    newlines = np.flatnonzero(buf == _NEWLINE)
+    starts = np.r_[0, newlines + 1]
+    if starts[-1] == len(buf):
+        starts = starts[:-1]
+    lengths = np.diff(np.r_[starts, len(buf)])
+    first = buf[starts]
+    is_game = first == _GAME_PREFIX
+    is_data = ~is_game & (first != _NEWLINE)
+    return lengths, is_game, is_data
+
+
+def _parse_chunk(
+    chunk: bytes,
+    n_cols: int,
+    path: Path,
+) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    行の先頭から始まるバイト列を解析し、(数値行の値 (k, n_cols), 各数値行より前にあるgameover行の数,
+    gameover行の数) を返す。gameover行は空白で塗りつぶしてから np.fromstring で変換する。
+    """
+    buf = np.frombuffer(chunk, np.uint8).copy()
+    lengths, is_game, is_data = _classify_lines(buf)
+    k = int(np.count_nonzero(is_data))
+    games_before = np.cumsum(is_game, dtype=np.int32)
+    n_games = int(games_before[-1]) if len(games_before) else 0
+    if k == 0:
+        return np.zeros((0, n_cols), dtype=np.float64), games_before[:0], n_games
+
+    buf[np.repeat(is_game, lengths)] = _SPACE
+    parsed = np.fromstring(buf.tobytes(), dtype=np.float64, sep=" ")
+    if parsed.size != k * n_cols:
+        raise ValueError(
+            f"{path}: 数値の数が行数と列数に合いません（{k} 行 × {n_cols} 列, {parsed.size} 個）。"
+        )
+    return parsed.reshape(k, n_cols), games_before[is_data], n_games
+
+
+def read_numeric_rows(
+    path: Path,
+    n_cols: int,
+    chunk_bytes: int = PARSE_CHUNK_BYTES,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    gameover行を除いた数値行を (N, n_cols) の配列として読み込み、
+    各行のゲーム番号（それまでに現れたgameover行の数）と共に返す。
+
+    ファイルを mmap し、行の境界で区切った chunk_bytes 程度のチャンクごとに、
+    バイト列のまま gameover行を空白で塗りつぶして np.fromstring で数値に変換する。
+    1回目の走査で行数を数えて出力の配列を先に確保するため、全体のテキストや行のリストは持たない。
+    """
+    if path.stat().st_size == 0:
+        return np.zeros((0, n_cols), dtype=np.float64), np.zeros(0, dtype=np.int32)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        chunks = list(_line_chunks(mm, chunk_bytes))
+        n_rows = sum(
+            int(np.count_nonzero(_classify_lines(np.frombuffer(mm[s:e], np.uint8))[2]))
+            for s, e in chunks
+        )
+        values = np.empty((n_rows, n_cols), dtype=np.float64)
+        game = np.empty(n_rows, dtype=np.int32)
+
+        row = 0
+        n_games = 0
+        for s, e in chunks:
+            chunk_values, games_before, chunk_games = _parse_chunk(mm[s:e], n_cols, path)
+            k = len(chunk_values)
+            values[row : row + k] = chunk_values
+            game[row : row + k] = n_games + games_before
+            n_games += chunk_games
+            row += k
+    return values, game
+
+
+@dataclass
+class GameIndex:
+    """
+    ファイル内の各ゲーム（gameover行で終わる行のまとまり）の位置。最後の終わっていないゲームは含まない。
+    """
+
+    start: np.ndarray  # (G,) ゲームの最初の行のバイト位置
+    end: np.ndarray  # (G,) gameover行の次のバイト位置
+    row_start: np.ndarray  # (G,) 数値行の範囲 [row_start, row_end)（read_numeric_rows の行番号）
+    row_end: np.ndarray  # (G,)
+
+    def __len__(self) -> int:
+        return len(self.end)
+
+
+def _build_game_index(path: Path) -> dict[str, np.ndarray]:
+    ends, row_ends = [], []
+    if path.stat().st_size > 0:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            row = 0
+            for s, e in _line_chunks(mm, PARSE_CHUNK_BYTES):
+                lengths, is_game, is_data = _classify_lines(np.frombuffer(mm[s:e], np.uint8))
+                line_ends = s + np.cumsum(lengths)
+                rows_through = row + np.cumsum(is_data)
+                ends.append(line_ends[is_game])
+                row_ends.append(rows_through[is_game])
+                row += int(np.count_nonzero(is_data))
+    end = np.concatenate(ends).astype(np.int64) if ends else np.zeros(0, np.int64)
+    row_end = np.concatenate(row_ends).astype(np.int64) if row_ends else np.zeros(0, np.int64)
+    return {
+        "start": np.r_[0, end[:-1]].astype(np.int64)[: len(end)],
+        "end": end,
+        "row_start": np.r_[0, row_end[:-1]].astype(np.int64)[: len(row_end)],
+        "row_end": row_end,
+    }
+
+
+def get_game_index(path: Path) -> GameIndex:
+    """
+    ファイル内の各ゲームのバイト位置と数値行の範囲を返す。索引は解析済みデータのキャッシュ（cache.py）に保存する。
+    """
+    arrays = cache.cached_arrays(path, "game_index", _build_game_index)
+    return GameIndex(
+        start=arrays["start"],
+        end=arrays["end"],
+        row_start=arrays["row_start"],
+        row_end=arrays["row_end"],
+    )
+
+
+def read_game_rows(
+    path: Path,
+    n_cols: int,
+    games,
+    chunk_bytes: int = PARSE_CHUNK_BYTES,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    games（0始まりのゲーム番号）のゲームの数値行だけを、ゲームごとの索引から該当する範囲だけ読み込む。
+    戻り値は read_numeric_rows と同じ形式（ゲーム番号の昇順、重複は除く）。
+    """
+    index = get_game_index(path)
+    games = np.unique(np.asarray(games, dtype=np.int64))
+    if len(games) and (games[0] < 0 or games[-1] >= len(index)):
+        raise IndexError(f"{path}: ゲーム番号は 0〜{len(index) - 1} です。")
+    counts = index.row_end[games] - index.row_start[games]
+    values = np.empty((int(counts.sum()), n_cols), dtype=np.float64)
+    game = np.repeat(games, counts).astype(np.int32)
+    if len(games) == 0:
+        return values, game
+
+    # 番号が連続するゲームは1つの範囲にまとめて読む
+    breaks = np.flatnonzero(np.diff(games) != 1)
+    first = games[np.r_[0, breaks + 1]]
+    last = games[np.r_[breaks, len(games) - 1]]
+    row = 0
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for start, end in zip(index.start[first].tolist(), index.end[last].tolist()):
+            for s, e in _line_chunks(mm, chunk_bytes, start, end):
+                chunk_values, _, _ = _parse_chunk(mm[s:e], n_cols, path)
+                values[row : row + len(chunk_values)] = chunk_values
+                row += len(chunk_values)
+    return values, game
+
+
+def _eval_table_arrays(values: np.ndarray, game: np.ndarray) -> dict[str, np.ndarray]:
+    evals = np.ascontiguousarray(values[:, :4])
+    return {
+        "evals": evals,
+        # progress を double(float)で受け取ってから int に変換
+        "prg": values[:, 4].astype(np.int32),
+        "game": game,
+        "best_mask": evals == evals.max(axis=1, keepdims=True),
+    }
+
+
+def _parse_eval_table(eval_file: Path) -> dict[str, np.ndarray]:
+    return _eval_table_arrays(*read_numeric_rows(eval_file, 5))
+
+
+def _parse_after_state_evals(eval_file: Path) -> dict[str, np.ndarray]:
+    values, game = read_numeric_rows(eval_file, 1)
+    return {"evals": values[:, 0], "game": game}
+
+
+def get_eval_table(eval_file: Path, games=None) -> EvalTable:
+    """
+    ファイルから評価値とprogressを読み込み、EvalTableを返す。
+    解析結果はキャッシュされ、2回目以降はmemmapで読み込む。
+    games（0始まりのゲーム番号）を指定した場合は、ゲームごとの索引からそのゲームだけを読む（キャッシュしない）。
+    """
+    if games is None:
+        arrays = cache.cached_arrays(eval_file, "eval_table", _parse_eval_table)
+    else:
+        arrays = _eval_table_arrays(*read_game_rows(eval_file, 5, games))
+    return EvalTable(
+        evals=arrays["evals"],
+        prg=arrays["prg"],
+        game=arrays["game"],
+        best_mask=arrays["best_mask"],
+    )
+
+
+def get_after_state_evals(eval_file: Path, games=None) -> np.ndarray:
+    """
+    eval-after-stateファイル（1行1評価値）から評価値の配列を返す。
+    games を指定した場合はそのゲームだけを読む。
+    """
+    if games is not None:
+        return read_game_rows(eval_file, 1, games)[0][:, 0]
+    return cache.cached_arrays(
+        eval_file, "after_state_evals", _parse_after_state_evals
+    )["evals"]
+
+
+def extract_gameovers(path: Path) -> np.ndarray:
+    """
+    ファイルをmmapしてバイト列のままgameover行を探し、
+    (turn, game, progress, score) の (G, 4) 配列を返す。
+    """
+    if path.stat().st_size == 0:
+        return np.zeros((0, 4), dtype=np.int64)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        records = [m.groups() for m in GAMEOVER_PATTERN.finditer(mm)]
+    return np.array(records, dtype=np.int64).reshape(-1, 4)
+
+
+def _parse_gameovers(path: Path) -> dict[str, np.ndarray]:
+    records = extract_gameovers(path)
+    return {
+        "turn": records[:, 0],
+        "game": records[:, 1],
+        "progress": records[:, 2],
+        "score": records[:, 3],
+    }
+
+
+def gameover_source(data_dir: Path) -> Path:
+    """
+    gameover行を読み取る元ファイル（state.txt, after-state.txt, eval.txt の順で最初にあるもの）を返す。
+    """
+    for name in GAMEOVER_SOURCES:
+        if (data_dir / name).exists():
+            return data_dir / name
+    raise FileNotFoundError(f"{data_dir}に{'/'.join(GAMEOVER_SOURCES)}が存在しません。")
+
+
+def get_gameover_table(data_dir: Path, games=None) -> GameoverTable:
+    """
+    データディレクトリのgameover行を GameoverTable として返す。
+    state.txt（なければ after-state.txt, eval.txt）から抽出した結果はキャッシュされ、2回目以降はmemmapで読み込む。
+    games（0始まりのゲーム番号）を指定した場合はそのゲームの行だけを返す。
+    """
+    arrays = cache.cached_arrays(gameover_source(data_dir), "gameover_table", _parse_gameovers)
+    if games is not None:
+        games = np.unique(np.asarray(games, dtype=np.int64))
+        arrays = {k: v[games] for k, v in arrays.items()}
+    return GameoverTable(
+        turn=arrays["turn"],
+        game=arrays["game"],
+        progress=arrays["progress"],
+        score=arrays["score"],
+    )
+
+
+def get_pp_and_player_tables(player_data: PlayerData) -> tuple[EvalTable, EvalTable]:
+    """
+    PPのeval-stateとプレイヤのeval.txtを読み込み、(PP, プレイヤ)の順で返す。
+    """
+    pp_table = player_data.pp_eval_table()
+    pr_table = player_data.eval_table()
+    assert len(pp_table) == len(
+        pr_table
+    ), f"データ数が異なります。{len(pp_table)=}, {len(pr_table)=}"
+    return pp_table, pr_table
+
+
+def groupby_progress(
+    prg: np.ndarray,
+    values: np.ndarray,
+    quantiles: list[float] | None = None,
+) -> ProgressStats:
+    """
+    progressごとに values の個数・合計・平均・分散（必要なら分位点）を
+    np.bincount で一括に計算する。
+    """
+    prg = np.asarray(prg, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    if len(prg) == 0:
+        empty = np.zeros(0)
+        return ProgressStats(
+            prg=empty.astype(np.int64),
+            count=empty.astype(np.int64),
+            sum=empty,
+            mean=empty,
+            var=empty,
+            quantiles={q: empty for q in quantiles} if quantiles else None,
+        )
+    offset = prg.min()
+    bins = prg - offset
+    count = np.bincount(bins)
+    total = np.bincount(bins, weights=values, minlength=len(count))
+    present = count > 0
+    mean = np.zeros(len(count))
+    mean[present] = total[present] / count[present]
+    # 平均との差の二乗和から分散を計算する（sum of squares より桁落ちしにくい）
+    sq = np.bincount(bins, weights=(values - mean[bins]) ** 2, minlength=len(count))
+
+    count = count[present]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = np.where(count > 1, sq[present] / (count - 1), np.nan)
+
+    quantile_values = None
+    if quantiles:
+        # progress、値の順に並べ替え、各ビンの中で線形補間した分位点を取る
+        order = np.lexsort((values, bins))
+        sorted_values = values[order]
+        starts = np.cumsum(count) - count
+        quantile_values = {}
+        for q in quantiles:
+            pos = starts + q * (count - 1)
+            lo = np.floor(pos).astype(np.int64)
+            hi = np.ceil(pos).astype(np.int64)
+            frac = pos - lo
+            quantile_values[q] = (
+                sorted_values[lo] * (1 - frac) + sorted_values[hi] * frac
+            )
+
+    return ProgressStats(
+        prg=np.flatnonzero(present) + offset,
+        count=count,
+        sum=total[present],
+        mean=mean[present],
+        var=var,
+        quantiles=quantile_values,
+    )
+
+
+def merge_progress_stats(a: ProgressStats, b: ProgressStats) -> ProgressStats:
+    """
+    2つの ProgressStats を、元の値をまとめて groupby_progress したものと同じになるように足し合わせる
+    （分位点は持たない）。分散は平均との差の二乗和を2群の平均の差で補正して合わせる。
+    """
+    prg = np.union1d(a.prg, b.prg)
+
+    def spread(stats: ProgressStats) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        idx = np.searchsorted(prg, stats.prg)
+        count = np.zeros(len(prg), dtype=np.int64)
+        total = np.zeros(len(prg))
+        mean = np.zeros(len(prg))
+        m2 = np.zeros(len(prg))
+        count[idx] = stats.count
+        total[idx] = stats.sum
+        mean[idx] = stats.mean
+        m2[idx] = np.nan_to_num(stats.var * (stats.count - 1))
+        return count, total, mean, m2
+
+    count_a, total_a, mean_a, m2_a = spread(a)
+    count_b, total_b, mean_b, m2_b = spread(b)
+    count = count_a + count_b
+    mean = (count_a * mean_a + count_b * mean_b) / count
+    m2 = m2_a + m2_b + (mean_b - mean_a) ** 2 * count_a * count_b / count
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = np.where(count > 1, m2 / (count - 1), np.nan)
+    return ProgressStats(
+        prg=prg,
+        count=count,
+        sum=total_a + total_b,
+        mean=mean,
+        var=var,
+    )
+
+
+def bootstrap_band(
+    curves: np.ndarray,
+    n_boot: int = 1000,
+    level: float = 0.95,
+    seed: int = 0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (n_seeds, n_progress) の曲線から、seed を復元抽出した平均の信頼区間 (下限, 上限) を返す。
+    復元抽出は各 seed の選ばれた回数の行列 (n_boot, n_seeds) で表し、
+    (n_boot, n_progress) の平均をまとめて計算する（元データは読み直さない）。
+    """
+    n_seeds = len(curves)
+    rng = np.random.default_rng(seed)
+    weights = rng.multinomial(n_seeds, np.full(n_seeds, 1 / n_seeds), size=n_boot)
+    boot_means = weights @ curves / n_seeds
+    alpha = (1 - level) / 2
+    lower, upper = np.quantile(boot_means, [alpha, 1 - alpha], axis=0)
+    return lower, upper
+
+
+# seed ごとの曲線の x（progress）を共通の格子に揃えるときの丸め桁（移動平均の誤差を吸収する）
+GRID_DECIMALS = 6
+
+
+@dataclass
+class SeedAggregate:
+    """
+    共通の progress の格子上での seed ごとの曲線の集計。
+    """
+
+    x: np.ndarray  # 共通の格子（いずれかの seed にある x の和集合）
+    mean: np.ndarray
+    sd: np.ndarray  # 標本標準偏差（ddof=1）。seed が1つの点は nan
+    se: np.ndarray  # 標準誤差 sd / sqrt(count)
+    count: np.ndarray  # その x を持つ seed の数
+
+
+def progress_grid(curves: list[GraphData]) -> tuple[np.ndarray, list[np.ndarray]]:
+    """
+    全ての曲線の x の和集合を共通の格子とし、(格子, 曲線ごとの格子上の位置) を返す。
+    """
+    keys = [np.round(np.asarray(c.x, dtype=np.float64), GRID_DECIMALS) for c in curves]
+    grid = np.unique(np.concatenate(keys)) if keys else np.zeros(0)
+    return grid, [np.searchsorted(grid, k) for k in keys]
+
+
+def seed_matrix(curves: list[GraphData]) -> tuple[np.ndarray, np.ma.MaskedArray]:
+    """
+    曲線を共通の格子上の (n_seeds, n_progress) のマスク付き配列にする（x がない点はマスク）。
+    """
+    grid, positions = progress_grid(curves)
+    values = np.zeros((len(curves), len(grid)))
+    mask = np.ones((len(curves), len(grid)), dtype=bool)
+    for i, (curve, pos) in enumerate(zip(curves, positions)):
+        values[i, pos] = curve.y
+        mask[i, pos] = False
+    return grid, np.ma.MaskedArray(values, mask=mask)
+
+
+class SeedAccumulator:
+    """
+    seed の曲線を1本ずつ足していく Welford 法の集計（全ての曲線を保持しない）。
+    格子は足した曲線の x の和集合で、結果は SeedAggregate で返す。
+    """
+
+    def __init__(self):
+        self.x = np.zeros(0)
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)  # 平均との差の二乗和
+
+    def _extend_grid(self, keys: np.ndarray) -> None:
+        grid = np.union1d(self.x, keys)
+        if len(grid) == len(self.x):
+            return
+        pos = np.searchsorted(grid, self.x)
+        count, mean, m2 = np.zeros(len(grid), np.int64), np.zeros(len(grid)), np.zeros(len(grid))
+        count[pos], mean[pos], m2[pos] = self.count, self.mean, self.m2
+        self.x, self.count, self.mean, self.m2 = grid, count, mean, m2
+
+    def add(self, curve: GraphData) -> None:
+        keys = np.round(np.asarray(curve.x, dtype=np.float64), GRID_DECIMALS)
+        self._extend_grid(keys)
+        pos = np.searchsorted(self.x, keys)
+        y = np.asarray(curve.y, dtype=np.float64)
+        self.count[pos] += 1
+        delta = y - self.mean[pos]
+        self.mean[pos] += delta / self.count[pos]
+        self.m2[pos] += delta * (y - self.mean[pos])
+
+    def result(self) -> SeedAggregate:
+        count = self.count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            sd = np.where(count >= 2, np.sqrt(self.m2 / (count - 1)), np.nan)
+            se = sd / np.sqrt(count)
+        mean = np.where(count > 0, self.mean, np.nan)
+        return SeedAggregate(x=self.x.copy(), mean=mean, sd=sd, se=se, count=count.copy())
+
+
+def calc_mean_data(
+    grouped: dict[tuple[int, str, int | None], list[GraphData]],
+    y_label: str,
+    n_boot: int = 0,
+    min_seeds: int | None = None,
+) -> PlotData:
+    """
+    (tuple, sym, stage)ごとにまとめたseedごとの曲線を progress で揃えて平均したPlotDataを返す。
+    min_seeds 個以上の seed にある progress のみ残す（None なら全ての seed にある progress のみ）。
+    count はその progress を持つ seed の数。
+    n_boot > 0 かつ seed が2つ以上ある場合は、seed の bootstrap による95%信頼区間も付ける
+    （全ての seed にある progress のみ）。
+    """
+    result = PlotData(
+        x_label="progress",
+        y_label=y_label,
+        data={},
+    )
+    for (tuple_v, sym, stage), curves in grouped.items():
+        if not curves:
+            continue
+        acc = SeedAccumulator()
+        for curve in curves:
+            acc.add(curve)
+        agg = acc.result()
+        keep = agg.count >= (len(curves) if min_seeds is None else min_seeds)
+        if not keep.any():
+            continue
+        label = f"NT{tuple_v}_{sym}_mean"
+        if stage is not None:
+            label += f"_st{stage}"
+        graph_data = GraphData(
+            x=agg.x[keep].tolist(),
+            y=agg.mean[keep].tolist(),
+            count=agg.count[keep].tolist(),
+        )
+        if n_boot > 0 and len(curves) >= 2:
+            grid, matrix = seed_matrix(curves)
+            full = agg.count == len(curves)
+            lower = np.full(len(grid), np.nan)
+            upper = np.full(len(grid), np.nan)
+            lower[full], upper[full] = bootstrap_band(matrix[:, full].filled(np.nan), n_boot)
+            graph_data.lower = lower[keep].tolist()
+            graph_data.upper = upper[keep].tolist()
+        result.data[label] = graph_data
+    return result
+
+
+def save_plot_data(plot_data: PlotData, output: Path) -> Path:
+    """
+    PlotData を縦持ち（series, x, y, count, lower, upper, pvalue）で書き出す。
+    信頼区間・p 値がない点の lower / upper / pvalue は空（npz では nan）。
+    output の拡張子が .npz なら npz、それ以外は拡張子を .csv にして CSV で書き出し、書き出したパスを返す。
+    """
+    series, xs, ys, counts, lowers, uppers, pvalues = [], [], [], [], [], [], []
+    for name, graph_data in plot_data.data.items():
+        n = len(graph_data.x)
+        series.extend([name] * n)
+        xs.extend(graph_data.x)
+        ys.extend(graph_data.y)
+        counts.extend(graph_data.count if graph_data.count is not None else [-1] * n)
+        lowers.extend(graph_data.lower if graph_data.lower is not None else [None] * n)
+        uppers.extend(graph_data.upper if graph_data.upper is not None else [None] * n)
+        pvalues.extend(graph_data.pvalue if graph_data.pvalue is not None else [None] * n)
+
+    if output.suffix == ".npz":
+        np.savez(
+            output,
+            series=np.array(series, dtype=str),
+            x=np.array(xs, dtype=np.float64),
+            y=np.array(ys, dtype=np.float64),
+            count=np.array(counts, dtype=np.int64),
+            lower=np.array(lowers, dtype=np.float64),
+            upper=np.array(uppers, dtype=np.float64),
+            pvalue=np.array(pvalues, dtype=np.float64),
+            x_label=np.str_(plot_data.x_label),
+            y_label=np.str_(plot_data.y_label),
+        )
+        return output
+
+    output = output.with_suffix(".csv")
+    with output.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ["series", plot_data.x_label, plot_data.y_label, "count", "lower", "upper", "pvalue"]
+        )
+        writer.writerows(zip(series, xs, ys, counts, lowers, uppers, pvalues))
+    return output
+
+
 def moving_average(data, window_size):
     return np.convolve(data, np.ones(window_size) / window_size, mode="valid")
+
+
+def moving_sum(data, window_size):
+    """
+    moving_average と同じ位置での窓内の合計（サンプル数の集計用）。
+    """
+    return np.convolve(data, np.ones(window_size, dtype=np.int64), mode="valid")
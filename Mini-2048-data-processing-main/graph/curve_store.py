@@ -0,0 +1,180 @@
+"""
+プレイヤごとに計算した曲線（GraphData）を npz として保存する。
+
+保存先は analysis_outputs/<run_name>/curves/（--run-name がない場合は出力先の curves/）で、
+<プレイヤ名>/<指標>-<パラメータ>.npz に x, y, count と、プレイヤ・指標・パラメータ・
+meta.json の内容、入力ファイルのフィンガープリント（パス・サイズ・mtime）を書く。
+フィンガープリントが一致すれば board_data を読まずに保存済みの曲線を使う。
+フィンガープリントには METRIC_VERSIONS の指標ごとのバージョンも含めるので、
+指標の計算方法を変えたときはそのバージョンを上げれば古い曲線は作り直される。
+
+--replot では board_data に触れず、保存済みの曲線だけで図を作り直す
+（config.json のラベルや色を変えたときの再描画用）。
+"""
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from .common import GraphData, PlayerData, board_dir
+
+store_dir: Path | None = None
+replot = False
+
+# 指標ごとの計算方法のバージョン。計算を変えたら上げる（保存済みの曲線が無効になる）
+METRIC_VERSIONS = {
+    "acc": 1,
+    "err-rel": 1,
+    "err-abs": 1,
+    "evals": 1,
+    "surv": 1,
+    "surv-diff": 1,
+}
+
+
+def configure(directory: Path | None, is_replot: bool = False) -> None:
+    """
+    保存先（None で無効）と --replot かどうかを設定する。
+    """
+    global store_dir, replot
+    store_dir = Path(directory) if directory is not None else None
+    replot = is_replot
+
+
+def fingerprint(paths: list[Path], version: int = 0) -> str:
+    """
+    入力ファイルのパス・サイズ・mtimeと指標のバージョンからフィンガープリントを作る。
+    """
+    h = hashlib.sha1()
+    h.update(f"version\0{version}\0".encode("utf-8"))
+    for path in paths:
+        st = path.stat()
+        h.update(f"{path.resolve()}\0{st.st_size}\0{st.st_mtime_ns}\0".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _params_tag(params: dict) -> str:
+    if not params:
+        return "default"
+    return "_".join(f"{k}{v}" for k, v in sorted(params.items()))
+
+
+def entry_path(player_name: str, metric: str, params: dict) -> Path:
+    return store_dir / player_name / f"{metric}-{_params_tag(params)}.npz"
+
+
+def _read_entry(path: Path) -> dict:
+    with np.load(path, allow_pickle=False) as npz:
+        return {k: npz[k] for k in npz.files}
+
+
+def _entry_version(entry: dict) -> int:
+    # version を書く前に保存した曲線は 0 とみなす
+    return int(entry["version"]) if "version" in entry else 0
+
+
+def _to_graph_data(entry: dict) -> GraphData:
+    count = entry["count"]
+    return GraphData(
+        x=entry["x"].tolist(),
+        y=entry["y"].tolist(),
+        count=count.tolist() if len(count) == len(entry["x"]) else None,
+    )
+
+
+def _write_entry(
+    path: Path,
+    player_data: PlayerData,
+    metric: str,
+    params: dict,
+    fp: str,
+    curve: GraphData,
+) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}-{uuid.uuid4().hex}.npz")
+    np.savez(
+        tmp,
+        x=np.asarray(curve.x, dtype=np.float64),
+        y=np.asarray(curve.y, dtype=np.float64),
+        count=np.asarray(curve.count if curve.count is not None else [], dtype=np.int64),
+        player=np.str_(player_data.name),
+        rel_path=np.str_(player_data.rel_path.as_posix()),
+        metric=np.str_(metric),
+        params=np.str_(json.dumps(params, sort_keys=True)),
+        fingerprint=np.str_(fp),
+        version=np.int64(METRIC_VERSIONS[metric]),
+        meta=np.str_(json.dumps(player_data.meta, ensure_ascii=False)),
+        created=np.float64(time.time()),
+    )
+    os.replace(tmp, path)
+
+
+def load_or_compute(
+    player_data: PlayerData,
+    metric: str,
+    inputs: Callable[[], list[Path]],
+    compute: Callable[[], GraphData],
+    **params,
+) -> GraphData:
+    """
+    保存済みの曲線があり入力ファイルが変わっていなければそれを返し、なければ compute して保存する。
+    inputs は曲線の計算に使う入力ファイルの一覧を返す関数（--replot では呼ばない）。
+    """
+    if store_dir is None:
+        return compute()
+    version = METRIC_VERSIONS[metric]
+    if player_data.max_games is not None:
+        # 先頭の一部のゲームだけから計算した曲線は別に保存する
+        params = {**params, "max_games": player_data.max_games}
+    path = entry_path(player_data.name, metric, params)
+    if replot:
+        if not path.exists():
+            raise FileNotFoundError(
+                f"保存済みの曲線がありません: {path}（--replot なしで一度実行してください）"
+            )
+        entry = _read_entry(path)
+        if _entry_version(entry) != version:
+            raise FileNotFoundError(
+                f"保存済みの曲線は古い計算方法のものです: {path}（--replot なしで一度実行してください）"
+            )
+        return _to_graph_data(entry)
+
+    fp = fingerprint(inputs(), version)
+    if path.exists():
+        try:
+            entry = _read_entry(path)
+            if str(entry["fingerprint"]) == fp:
+                return _to_graph_data(entry)
+        except (OSError, ValueError, KeyError):
+            # 書き込み途中や壊れたファイルは作り直す
+            pass
+    curve = compute()
+    try:
+        _write_entry(path, player_data, metric, params, fp, curve)
+    except OSError as e:
+        print(f"曲線の保存に失敗しました: {path} ({e})")
+    return curve
+
+
+def stored_players() -> dict[Path, dict | None]:
+    """
+    保存済みの曲線があるプレイヤを {データディレクトリ: meta.jsonの内容} で返す（--replot 用）。
+    """
+    players = {}
+    if store_dir is None or not store_dir.exists():
+        return players
+    for player_dir in sorted(store_dir.iterdir()):
+        entries = sorted(player_dir.glob("*.npz")) if player_dir.is_dir() else []
+        entries = [e for e in entries if ".tmp-" not in e.name]
+        if not entries:
+            continue
+        entry = _read_entry(entries[0])
+        players[board_dir / str(entry["rel_path"])] = json.loads(str(entry["meta"]))
+    return players
+
@@ -0,0 +1,168 @@
+"""
+PPとプレイヤの評価値の散布図を、標本ではなく全ての手の2次元ヒストグラム（密度）として集計する。
+
+eval.txt と eval-after-state を一定行数ずつ読みながら np.histogram2d で固定の格子に足し込むので、
+メモリは格子の大きさで決まる。回帰直線も全ての手の Σx, Σy, Σxy, Σx² から求める。
+集計結果（EvalDensity）は足し算でまとめられるため、seed をまたいだ集計もそのまま足せばよい。
+プレイヤごとの集計結果は解析済みデータのキャッシュ（cache.py）に保存する。
+"""
+
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import numpy as np
+
+from . import cache
+from .sampling import CHUNK_ROWS, iter_eval_pair_chunks
+
+DENSITY_BINS = 200
+DENSITY_RANGE = (0.0, 6000.0)  # perfect / player の評価値の範囲（散布図の y=x と同じ）
+
+
+@dataclass
+class EvalDensity:
+    counts: np.ndarray  # (bins, bins)。counts[i, j] は perfect が i 番目、player が j 番目の区間
+    edges: np.ndarray  # 区間の境界（perfect / player 共通）
+    n: int  # 範囲外も含めた点数
+    sum_x: float
+    sum_y: float
+    sum_xy: float
+    sum_xx: float
+
+    def __add__(self, other: "EvalDensity") -> "EvalDensity":
+        assert np.array_equal(self.edges, other.edges), "格子が異なる集計は足せません。"
+        return replace(
+            self,
+            counts=self.counts + other.counts,
+            n=self.n + other.n,
+            sum_x=self.sum_x + other.sum_x,
+            sum_y=self.sum_y + other.sum_y,
+            sum_xy=self.sum_xy + other.sum_xy,
+            sum_xx=self.sum_xx + other.sum_xx,
+        )
+
+    def fit(self) -> tuple[float, float] | None:
+        """
+        最小二乗法の回帰直線 y = a x + b の (a, b) を返す。点が足りない場合は None。
+        """
+        denom = self.n * self.sum_xx - self.sum_x**2
+        if self.n < 2 or denom == 0:
+            return None
+        a = (self.n * self.sum_xy - self.sum_x * self.sum_y) / denom
+        b = (self.sum_y - a * self.sum_x) / self.n
+        return a, b
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        sums = [self.n, self.sum_x, self.sum_y, self.sum_xy, self.sum_xx]
+        return {"counts": self.counts, "edges": self.edges, "sums": np.array(sums, np.float64)}
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> "EvalDensity":
+        n, sum_x, sum_y, sum_xy, sum_xx = arrays["sums"].tolist()
+        return cls(
+            counts=np.array(arrays["counts"]),
+            edges=np.array(arrays["edges"]),
+            n=int(n),
+            sum_x=sum_x,
+            sum_y=sum_y,
+            sum_xy=sum_xy,
+            sum_xx=sum_xx,
+        )
+
+
+def empty_density(
+    bins: int = DENSITY_BINS,
+    value_range: tuple[float, float] = DENSITY_RANGE,
+) -> EvalDensity:
+    return EvalDensity(
+        counts=np.zeros((bins, bins), dtype=np.int64),
+        edges=np.linspace(value_range[0], value_range[1], bins + 1),
+        n=0,
+        sum_x=0.0,
+        sum_y=0.0,
+        sum_xy=0.0,
+        sum_xx=0.0,
+    )
+
+
+def accumulate_eval_density(
+    pp_after_state_file: Path,
+    eval_file: Path,
+    bins: int = DENSITY_BINS,
+    value_range: tuple[float, float] = DENSITY_RANGE,
+    chunk_rows: int = CHUNK_ROWS,
+    max_games: int | None = None,
+) -> EvalDensity:
+    """
+    (PPの after-state 評価値, プレイヤの最善手の評価値) の全ての手を2次元ヒストグラムに集計する。
+    max_games を指定した場合は先頭の max_games ゲームの手だけを集計する。
+    """
+    density = empty_density(bins, value_range)
+    for x, y, _ in iter_eval_pair_chunks(
+        pp_after_state_file, eval_file, chunk_rows, max_games
+    ):
+        counts, _, _ = np.histogram2d(x, y, bins=[density.edges, density.edges])
+        density.counts += counts.astype(np.int64)
+        density.n += len(x)
+        density.sum_x += float(x.sum())
+        density.sum_y += float(y.sum())
+        density.sum_xy += float(x @ y)
+        density.sum_xx += float(x @ x)
+    return density
+
+
+def get_eval_density(
+    pp_after_state_file: Path,
+    eval_file: Path,
+    bins: int = DENSITY_BINS,
+    value_range: tuple[float, float] = DENSITY_RANGE,
+    max_games: int | None = None,
+) -> EvalDensity:
+    """
+    accumulate_eval_density の結果をキャッシュ経由で返す。
+    キャッシュキーには eval-after-state 側のパス・サイズ・mtime と格子・ゲーム数の指定も含める。
+    """
+    kind = f"density-{bins}-{value_range[0]}-{value_range[1]}-{max_games}-"
+    kind += cache.cache_key(pp_after_state_file, "density-pp")
+    arrays = cache.cached_arrays(
+        eval_file,
+        kind,
+        lambda _: accumulate_eval_density(
+            pp_after_state_file, eval_file, bins, value_range, max_games=max_games
+        ).to_arrays(),
+    )
+    return EvalDensity.from_arrays(arrays)
+
+
+def player_eval_density(pd) -> EvalDensity:
+    """
+    PlayerData の eval.txt と PP の eval-after-state の密度（先頭の pd.max_games ゲームのみ）を返す。
+    """
+    return get_eval_density(pd.pp_eval_after_state, pd.eval_file, max_games=pd.max_games)
+
+
+def plot_density(ax, density: EvalDensity, cmap: str = "viridis", vmax: float | None = None):
+    """
+    密度をラスタ画像として描く（PDFでも点の数によらずサイズが一定になる）。
+    """
+    from matplotlib.colors import LogNorm
+
+    counts = np.ma.masked_equal(density.counts.T, 0)
+    lo, hi = density.edges[0], density.edges[-1]
+    return ax.imshow(
+        counts,
+        origin="lower",
+        extent=(lo, hi, lo, hi),
+        aspect="auto",
+        interpolation="nearest",
+        cmap=cmap,
+        norm=LogNorm(vmin=1, vmax=vmax),
+    )
+
+
+def plot_fit(ax, density: EvalDensity, color: str, label: str) -> None:
+    coeffs = density.fit()
+    if coeffs is None:
+        return
+    x_line = np.array([density.edges[0], density.edges[-1]])
+    ax.plot(x_line, coeffs[0] * x_line + coeffs[1], color=color, linestyle="solid", label=label)
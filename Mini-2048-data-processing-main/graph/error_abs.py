@@ -3,14 +3,34 @@ from pathlib import Path
 
 import numpy as np
 
+from . import curve_store
 from .common import (
     GraphData,
     PlotData,
-    get_eval_and_hand_progress,
+    calc_mean_data,
+    EvalTable,
+    get_pp_and_player_tables,
+    groupby_progress,
     moving_average,
+    moving_sum,
     PlayerData,
     tuple_sym_stage,
 )
+from .parallel import map_players
+
+# progressごとの平均にかける移動平均の窓幅
+SMOOTHING_WINDOW = 5
+
+
+def calc_abs_error(
+    pp_table: EvalTable,
+    pr_table: EvalTable,
+) -> np.ndarray:
+    """
+    プレイヤの選んだ手のPP評価値とPPの最善手の評価値の差を返す。
+    """
+    rows = np.arange(len(pp_table))
+    return pp_table.evals[rows, pr_table.best_idx] - pp_table.best_eval
 
 
 def calc_abs_error_data(
@@ -24,60 +44,28 @@ def calc_abs_error_data(
         y_label="abs error",
         data={pd.name: "" for pd in player_data_list},
     )
-    for player_data in player_data_list:
-        pp_eval_and_hand_progress = get_eval_and_hand_progress(
-            player_data.pp_eval_state
-        )
-        pr_eval_and_hand_progress = get_eval_and_hand_progress(player_data.eval_file)
-
-        assert len(pp_eval_and_hand_progress) == len(
-            pr_eval_and_hand_progress
-        ), f"データ数が異なります。{len(pp_eval_and_hand_progress)=}, {len(pr_eval_and_hand_progress)=}"
-
-        abs_err_dict = defaultdict(list)
-
-        for pp_eval, pr_eval in zip(
-            pp_eval_and_hand_progress, pr_eval_and_hand_progress
-        ):
-            abs_err_dict[pp_eval.prg].append(
-                pp_eval.evals[pr_eval.idx[0]] - pp_eval.evals[pp_eval.idx[0]]
-            )
-        # 平均を取る
-        abs_err = {
-            prg: np.mean(err_list)
-            for prg, err_list in sorted(abs_err_dict.items(), key=lambda x: x[0])
-        }
-        result.data[player_data.name] = GraphData(
-            x=moving_average(list(abs_err.keys()), 5).tolist(),
-            y=moving_average(list(abs_err.values()), 5).tolist(),
-        )
+    curves = map_players(_calc_abs_error_curve, player_data_list)
+    for player_data, curve in zip(player_data_list, curves):
+        result.data[player_data.name] = curve
     return result
 
 
-def _calc_abs_error_curve(player_data: PlayerData) -> GraphData:
-    pp_eval_and_hand_progress = get_eval_and_hand_progress(
-        player_data.pp_eval_state
+def calc_abs_error_curve(pp_table: EvalTable, pr_table: EvalTable) -> GraphData:
+    stats = groupby_progress(pp_table.prg, calc_abs_error(pp_table, pr_table))
+    return GraphData(
+        x=moving_average(stats.prg, SMOOTHING_WINDOW).tolist(),
+        y=moving_average(stats.mean, SMOOTHING_WINDOW).tolist(),
+        count=moving_sum(stats.count, SMOOTHING_WINDOW).tolist(),
     )
-    pr_eval_and_hand_progress = get_eval_and_hand_progress(player_data.eval_file)
 
-    assert len(pp_eval_and_hand_progress) == len(
-        pr_eval_and_hand_progress
-    ), f"データ数が異なります。{len(pp_eval_and_hand_progress)=}, {len(pr_eval_and_hand_progress)=}"
 
-    abs_err_dict = defaultdict(list)
-    for pp_eval, pr_eval in zip(
-        pp_eval_and_hand_progress, pr_eval_and_hand_progress
-    ):
-        abs_err_dict[pp_eval.prg].append(
-            pp_eval.evals[pr_eval.idx[0]] - pp_eval.evals[pp_eval.idx[0]]
-        )
-    abs_err = {
-        prg: np.mean(err_list)
-        for prg, err_list in sorted(abs_err_dict.items(), key=lambda x: x[0])
-    }
-    return GraphData(
-        x=moving_average(list(abs_err.keys()), 5).tolist(),
-        y=moving_average(list(abs_err.values()), 5).tolist(),
+def _calc_abs_error_curve(player_data: PlayerData) -> GraphData:
+    return curve_store.load_or_compute(
+        player_data,
+        "err-abs",
+        inputs=lambda: [player_data.eval_file, player_data.pp_eval_state],
+        compute=lambda: calc_abs_error_curve(*get_pp_and_player_tables(player_data)),
+        window=SMOOTHING_WINDOW,
     )
 
 
@@ -85,27 +73,14 @@ def calc_abs_error_mean_data(
     player_data_list: list[PlayerData],
 ) -> PlotData:
     grouped: dict[tuple[int, str, int | None], list[GraphData]] = defaultdict(list)
+    targets = []
     for player_data in player_data_list:
         info = tuple_sym_stage(player_data)
         if info is None:
             continue
-        grouped[info].append(_calc_abs_error_curve(player_data))
+        targets.append((info, player_data))
+    curves = map_players(_calc_abs_error_curve, [player_data for _, player_data in targets])
+    for (info, _), curve in zip(targets, curves):
+        grouped[info].append(curve)
 
-    result = PlotData(
-        x_label="progress",
-        y_label="abs error mean",
-        data={},
-    )
-    for (tuple_v, sym, stage), curves in grouped.items():
-        if not curves:
-            continue
-        min_len = min(len(c.x) for c in curves)
-        if min_len == 0:
-            continue
-        xs = [np.mean([c.x[i] for c in curves]) for i in range(min_len)]
-        ys = [np.mean([c.y[i] for c in curves]) for i in range(min_len)]
-        label = f"NT{tuple_v}_{sym}_mean"
-        if stage is not None:
-            label += f"_st{stage}"
-        result.data[label] = GraphData(x=xs, y=ys)
-    return result
+    return calc_mean_data(grouped, y_label="abs error mean")
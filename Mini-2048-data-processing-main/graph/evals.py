@@ -1,16 +1,22 @@
 from collections import defaultdict
 from pathlib import Path
-import matplotlib.pyplot as plt
 import random
-import numpy as np
+from . import curve_store
 from .common import (
-    get_eval_and_hand_progress,
+    EvalTable,
+    groupby_progress,
     PlayerData,
     GraphData,
     PlotData,
+    calc_mean_data,
     moving_average,
+    moving_sum,
     tuple_sym_stage,
 )
+from .parallel import map_players
+
+# progressごとの平均にかける移動平均の窓幅
+SMOOTHING_WINDOW = 5
 
 
 def calc_eval_data(
@@ -18,16 +24,20 @@ def calc_eval_data(
     output: Path,
     is_show: bool = True,
 ):
+    import matplotlib.pyplot as plt
+
     # 各プレイヤータイプに対して一度だけラベルを使用するために追跡する辞書
     used_labels = {}
 
     for i, pd in enumerate(player_data_list):
-        pr_eval_and_hand_progress = get_eval_and_hand_progress(pd.eval_file)
+        pr_table = pd.eval_table()
         abs_err_dict = defaultdict(list)
 
-        pr_eval_and_hand_progress = random.sample(pr_eval_and_hand_progress, 1000)
-        for pr_eval in pr_eval_and_hand_progress:
-            abs_err_dict[pr_eval.prg].append(pr_eval.evals[pr_eval.idx[0]])
+        sample_idx = random.sample(range(len(pr_table)), 1000)
+        for prg, best_eval in zip(
+            pr_table.prg[sample_idx].tolist(), pr_table.best_eval[sample_idx].tolist()
+        ):
+            abs_err_dict[prg].append(best_eval)
         for key, value in abs_err_dict.items():
             # 散布図の設定を作成
             scatter_params = pd.config.copy()
@@ -64,18 +74,22 @@ def calc_eval_data(
     return None
 
 
-def _calc_eval_curve(player_data: PlayerData) -> GraphData:
-    pr_eval_and_hand_progress = get_eval_and_hand_progress(player_data.eval_file)
-    eval_dict = defaultdict(list)
-    for pr_eval in pr_eval_and_hand_progress:
-        eval_dict[pr_eval.prg].append(pr_eval.evals[pr_eval.idx[0]])
-    eval_mean = {
-        prg: np.mean(vals)
-        for prg, vals in sorted(eval_dict.items(), key=lambda x: x[0])
-    }
+def calc_eval_curve(pr_table: EvalTable) -> GraphData:
+    stats = groupby_progress(pr_table.prg, pr_table.best_eval)
     return GraphData(
-        x=moving_average(list(eval_mean.keys()), 5).tolist(),
-        y=moving_average(list(eval_mean.values()), 5).tolist(),
+        x=moving_average(stats.prg, SMOOTHING_WINDOW).tolist(),
+        y=moving_average(stats.mean, SMOOTHING_WINDOW).tolist(),
+        count=moving_sum(stats.count, SMOOTHING_WINDOW).tolist(),
+    )
+
+
+def _calc_eval_curve(player_data: PlayerData) -> GraphData:
+    return curve_store.load_or_compute(
+        player_data,
+        "evals",
+        inputs=lambda: [player_data.eval_file],
+        compute=lambda: calc_eval_curve(player_data.eval_table()),
+        window=SMOOTHING_WINDOW,
     )
 
 
@@ -83,27 +97,14 @@ def calc_eval_mean_data(
     player_data_list: list[PlayerData],
 ) -> PlotData:
     grouped: dict[tuple[int, str, int | None], list[GraphData]] = defaultdict(list)
+    targets = []
     for player_data in player_data_list:
         info = tuple_sym_stage(player_data)
         if info is None:
             continue
-        grouped[info].append(_calc_eval_curve(player_data))
+        targets.append((info, player_data))
+    curves = map_players(_calc_eval_curve, [player_data for _, player_data in targets])
+    for (info, _), curve in zip(targets, curves):
+        grouped[info].append(curve)
 
-    result = PlotData(
-        x_label="progress",
-        y_label="eval mean",
-        data={},
-    )
-    for (tuple_v, sym, stage), curves in grouped.items():
-        if not curves:
-            continue
-        min_len = min(len(c.x) for c in curves)
-        if min_len == 0:
-            continue
-        xs = [np.mean([c.x[i] for c in curves]) for i in range(min_len)]
-        ys = [np.mean([c.y[i] for c in curves]) for i in range(min_len)]
-        label = f"NT{tuple_v}_{sym}_mean"
-        if stage is not None:
-            label += f"_st{stage}"
-        result.data[label] = GraphData(x=xs, y=ys)
-    return result
+    return calc_mean_data(grouped, y_label="eval mean")
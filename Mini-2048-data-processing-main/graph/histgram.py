@@ -1,4 +1,3 @@
-import re
 from pathlib import Path
 
 import matplotlib.pyplot as plt
@@ -16,9 +15,7 @@ def plot_histgram(
     得点分布をプロットする。
     """
     for pd in player_data_list:
-        text = pd.state_file.read_text()
-        score_txt = re.findall(r"score: (\d+)", text)
-        scores = [int(score) for score in score_txt]
+        scores = pd.gameover_table().score
 
         plt.hist(scores, bins=BINS)
         plt.xlabel("score")
@@ -0,0 +1,154 @@
+from collections import defaultdict
+from functools import partial
+
+from . import accuracy, curve_store, error_abs, error_rel, evals, survival
+from .common import (
+    EvalTable,
+    GraphData,
+    PlotData,
+    PlayerData,
+    calc_mean_data,
+    tuple_sym_stage,
+)
+from .paired import pair_players, paired_curves_data, paired_mean_data
+from .parallel import map_players
+
+# グラフタイプ -> (指標, y軸ラベル, 集計方法)
+# 集計方法: "player" はプレイヤごと、"mean" は seed 平均、
+# "symdiff" は sym - notsym の組ごとの差、"symdiff-mean" はその seed 平均（paired.py）
+GRAPHS = {
+    "acc": ("acc", "accuracy", "player"),
+    "acc-mean": ("acc", "accuracy_mean", "mean"),
+    "acc-mean-symdiff": ("acc", "accuracy difference (sym - notsym)", "symdiff-mean"),
+    "err-rel": ("err-rel", "rel error", "player"),
+    "err-rel-mean": ("err-rel", "rel error mean", "mean"),
+    "err-rel-mean-symdiff": ("err-rel", "rel error difference (sym - notsym)", "symdiff-mean"),
+    "err-abs": ("err-abs", "abs error", "player"),
+    "err-abs-mean": ("err-abs", "abs error mean", "mean"),
+    "err-abs-mean-symdiff": ("err-abs", "abs error difference (sym - notsym)", "symdiff-mean"),
+    "evals-mean": ("evals", "eval mean", "mean"),
+    "evals-mean-symdiff": ("evals", "eval difference (sym - notsym)", "symdiff-mean"),
+    "surv-symdiff": ("surv", "survival rate difference (sym - notsym)", "symdiff"),
+    "surv-mean-symdiff": ("surv", "survival rate difference (sym - notsym)", "symdiff-mean"),
+}
+
+# 単独実行時と同じデフォルトの出力ファイル名
+OUTPUT_NAMES = {
+    "acc": "accuracy.pdf",
+    "acc-mean": "accuracy_mean.pdf",
+    "acc-mean-symdiff": "accuracy_mean_symdiff.pdf",
+    "err-rel": "error_rel.pdf",
+    "err-rel-mean": "error_rel_mean.pdf",
+    "err-rel-mean-symdiff": "error_rel_mean_symdiff.pdf",
+    "err-abs": "error_abs.pdf",
+    "err-abs-mean": "error_abs_mean.pdf",
+    "err-abs-mean-symdiff": "error_abs_mean_symdiff.pdf",
+    "evals-mean": "evals_mean.pdf",
+    "evals-mean-symdiff": "evals_mean_symdiff.pdf",
+    "surv-symdiff": "survival_symdiff.pdf",
+    "surv-mean-symdiff": "survival_mean_symdiff.pdf",
+}
+
+
+def calc_curves(player_data: PlayerData, metrics: set[str]) -> dict[str, GraphData]:
+    """
+    eval.txt（必要ならPPのeval-stateも）を1回だけ読み込み、指定した指標の曲線をまとめて計算する。
+    保存済みの曲線（curve_store）がある指標は読み込まない。
+    """
+    tables: dict[str, EvalTable] = {}
+
+    def pr_table() -> EvalTable:
+        if "pr" not in tables:
+            tables["pr"] = player_data.eval_table()
+        return tables["pr"]
+
+    def pp_and_pr_tables() -> tuple[EvalTable, EvalTable]:
+        if "pp" not in tables:
+            tables["pp"] = player_data.pp_eval_table()
+            assert len(tables["pp"]) == len(
+                pr_table()
+            ), f"データ数が異なります。{len(tables['pp'])=}, {len(pr_table())=}"
+        return tables["pp"], pr_table()
+
+    curves = {}
+    if "acc" in metrics:
+        curves["acc"] = curve_store.load_or_compute(
+            player_data,
+            "acc",
+            inputs=lambda: [player_data.eval_file, player_data.pp_eval_state],
+            compute=lambda: accuracy.calc_accuracy_curve(*pp_and_pr_tables()),
+            window=accuracy.SMOOTHING_WINDOW,
+        )
+    if "err-rel" in metrics:
+        curves["err-rel"] = curve_store.load_or_compute(
+            player_data,
+            "err-rel",
+            inputs=lambda: [player_data.eval_file, player_data.pp_eval_state],
+            compute=lambda: error_rel.calc_rel_error_curve(*pp_and_pr_tables()),
+            window=error_rel.SMOOTHING_WINDOW,
+        )
+    if "err-abs" in metrics:
+        curves["err-abs"] = curve_store.load_or_compute(
+            player_data,
+            "err-abs",
+            inputs=lambda: [player_data.eval_file, player_data.pp_eval_state],
+            compute=lambda: error_abs.calc_abs_error_curve(*pp_and_pr_tables()),
+            window=error_abs.SMOOTHING_WINDOW,
+        )
+    if "evals" in metrics:
+        curves["evals"] = curve_store.load_or_compute(
+            player_data,
+            "evals",
+            inputs=lambda: [player_data.eval_file],
+            compute=lambda: evals.calc_eval_curve(pr_table()),
+            window=evals.SMOOTHING_WINDOW,
+        )
+    if "surv" in metrics:
+        curves["surv"] = survival._calc_survival_curve(player_data)
+    return curves
+
+
+def calc_multi_data(
+    player_data_list: list[PlayerData],
+    graphs: list[str],
+    n_boot: int = 1000,
+) -> dict[str, PlotData]:
+    """
+    複数のグラフタイプのPlotDataを、各プレイヤのデータを1回ずつ読むだけで計算する。
+    symdiff 系は同じ曲線から sym / notsym の組ごとの差を取る（n_boot は信頼区間の bootstrap 回数）。
+    """
+    unknown = [g for g in graphs if g not in GRAPHS]
+    if unknown:
+        raise ValueError(
+            f"multi で扱えないグラフです: {unknown}（対応: {', '.join(GRAPHS)}）"
+        )
+    metrics = {GRAPHS[g][0] for g in graphs}
+    curve_list = map_players(partial(calc_curves, metrics=metrics), player_data_list)
+    curves = {pd.name: c for pd, c in zip(player_data_list, curve_list)}
+    pairs = pair_players(player_data_list)
+
+    results = {}
+    for graph in graphs:
+        metric, y_label, mode = GRAPHS[graph]
+        metric_curves = {name: c[metric] for name, c in curves.items()}
+        if mode == "symdiff-mean":
+            results[graph] = paired_mean_data(pairs, metric_curves, y_label, n_boot=n_boot)
+        elif mode == "symdiff":
+            results[graph] = paired_curves_data(pairs, metric_curves, y_label)
+        elif mode == "mean":
+            grouped: dict[tuple[int, str, int | None], list[GraphData]] = defaultdict(
+                list
+            )
+            for pd in player_data_list:
+                info = tuple_sym_stage(pd)
+                if info is None:
+                    continue
+                grouped[info].append(metric_curves[pd.name])
+            results[graph] = calc_mean_data(grouped, y_label=y_label)
+        else:
+            results[graph] = PlotData(
+                x_label="progress",
+                y_label=y_label,
+                data={pd.name: metric_curves[pd.name] for pd in player_data_list},
+            )
+    return results
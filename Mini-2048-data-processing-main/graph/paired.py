@@ -0,0 +1,192 @@
+"""
+sym / notsym の対応のある比較。
+
+meta.json の (run_name, seed, tuple, stage) が同じ sym と notsym のプレイヤを組にし、
+指標ごとに progress で揃えた差（sym - notsym）の曲線を組ごとに求める。
+(tuple, stage) ごとに seed の組の差を (n_pairs, n_progress) の行列にまとめ、
+平均の差・bootstrap 信頼区間・符号反転による並べ替え検定の p 値を行列演算でまとめて計算する。
+曲線は呼び出し側（multi.calc_curves など）で1回だけ計算したものを全ての symdiff グラフで使い回す。
+"""
+
+import itertools
+import re
+from dataclasses import dataclass
+
+import numpy as np
+
+from .common import GraphData, PlotData, PlayerData, bootstrap_band, progress_grid
+
+# p 値がこれ未満の点を有意として印を付ける
+SIGNIFICANCE_LEVEL = 0.05
+N_PERMUTATIONS = 10000
+# ディレクトリ名からの推定（seed5, NT4_sym）。合わないディレクトリは組にしない
+SEED_DIR_PATTERN = re.compile(r"^seed(\d+)$")
+NT_DIR_PATTERN = re.compile(r"^NT(\d+)_(.+)$")
+
+
+def pair_info(pd: PlayerData) -> tuple[str | None, int | None, str | None, int | None, int | None]:
+    """
+    (run_name, tuple, sym, seed, stage) を meta.json（なければディレクトリ名）から取得する。
+    """
+    meta = pd.meta or {}
+    tuple_v = meta.get("tuple")
+    sym = meta.get("sym")
+    seed = meta.get("seed")
+    stage = meta.get("stage")
+    run_name = None
+
+    parts = pd.rel_path.parts
+    if parts:
+        run_name = parts[0]
+
+    if tuple_v is None or sym is None or seed is None:
+        if len(parts) >= 3:
+            seed_match = SEED_DIR_PATTERN.match(parts[1])
+            nt_match = NT_DIR_PATTERN.match(parts[2])
+            if seed is None and seed_match:
+                seed = int(seed_match.group(1))
+            if nt_match:
+                tuple_v = int(nt_match.group(1))
+                sym = nt_match.group(2)
+
+    return run_name, tuple_v, sym, seed, stage
+
+
+@dataclass
+class Pair:
+    run_name: str | None
+    seed: int
+    tuple_v: int
+    stage: int | None
+    sym: PlayerData
+    notsym: PlayerData
+
+    @property
+    def group(self) -> tuple[int, int | None]:
+        return self.tuple_v, self.stage
+
+    @property
+    def label(self) -> str:
+        label = f"{self.run_name}_seed{self.seed}_NT{self.tuple_v}"
+        if self.stage is not None:
+            label += f"_st{self.stage}"
+        return label + "_sym-notsym"
+
+
+def pair_players(player_data_list: list[PlayerData]) -> list[Pair]:
+    """
+    (run_name, seed, tuple, stage) が同じ sym / notsym のプレイヤを組にする（片方しかないものは除く）。
+    """
+    found: dict[tuple, dict[str, PlayerData]] = {}
+    for pd in player_data_list:
+        run_name, tuple_v, sym, seed, stage = pair_info(pd)
+        if tuple_v is None or seed is None or sym not in ("sym", "notsym"):
+            continue
+        found.setdefault((run_name, seed, tuple_v, stage), {})[sym] = pd
+    return [
+        Pair(run_name, seed, tuple_v, stage, items["sym"], items["notsym"])
+        for (run_name, seed, tuple_v, stage), items in found.items()
+        if "sym" in items and "notsym" in items
+    ]
+
+
+def diff_curve(a: GraphData, b: GraphData) -> GraphData:
+    """
+    a - b を、両方にある progress についてだけ返す。
+    """
+    grid, (pos_a, pos_b) = progress_grid([a, b])
+    ya = np.full(len(grid), np.nan)
+    yb = np.full(len(grid), np.nan)
+    ya[pos_a] = a.y
+    yb[pos_b] = b.y
+    both = ~np.isnan(ya) & ~np.isnan(yb)
+    return GraphData(x=grid[both].tolist(), y=(ya - yb)[both].tolist())
+
+
+def permutation_pvalues(
+    diffs: np.ndarray,
+    n_perm: int = N_PERMUTATIONS,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    (n_pairs, n_progress) の差について、平均が0かの両側 p 値を progress ごとに返す
+    （対応のある符号反転の並べ替え検定）。符号の組み合わせが n_perm 以下なら全て列挙する（正確検定）。
+    """
+    n_pairs = len(diffs)
+    observed = np.abs(diffs.mean(axis=0))
+    tolerance = 1e-12 * np.maximum(1.0, observed)
+    if 2**n_pairs <= n_perm:
+        signs = np.array(list(itertools.product((1.0, -1.0), repeat=n_pairs)))
+        permuted = np.abs(signs @ diffs / n_pairs)
+        return (permuted >= observed - tolerance).mean(axis=0)
+    rng = np.random.default_rng(seed)
+    signs = rng.choice((1.0, -1.0), size=(n_perm, n_pairs))
+    permuted = np.abs(signs @ diffs / n_pairs)
+    return (1 + (permuted >= observed - tolerance).sum(axis=0)) / (n_perm + 1)
+
+
+def pair_diff_curves(
+    pairs: list[Pair],
+    curves: dict[str, GraphData],
+) -> dict[str, GraphData]:
+    """
+    組ごとの差（sym - notsym）の曲線を {組のラベル: 曲線} で返す。curves はプレイヤ名 -> 曲線。
+    """
+    return {p.label: diff_curve(curves[p.sym.name], curves[p.notsym.name]) for p in pairs}
+
+
+def paired_mean_data(
+    pairs: list[Pair],
+    curves: dict[str, GraphData],
+    y_label: str,
+    n_boot: int = 1000,
+    n_perm: int = N_PERMUTATIONS,
+) -> PlotData:
+    """
+    (tuple, stage) ごとに、seed の組の差の平均曲線を返す。
+    全ての組にある progress だけを使い、組が2つ以上あれば bootstrap の95%信頼区間（lower / upper）と
+    並べ替え検定の p 値（pvalue）を付ける。count は組の数。
+    """
+    result = PlotData(x_label="progress", y_label=y_label, data={})
+    diffs = pair_diff_curves(pairs, curves)
+    grouped: dict[tuple[int, int | None], list[GraphData]] = {}
+    for pair in pairs:
+        grouped.setdefault(pair.group, []).append(diffs[pair.label])
+
+    for (tuple_v, stage), group in sorted(grouped.items(), key=lambda kv: str(kv[0])):
+        grid, positions = progress_grid(group)
+        matrix = np.full((len(group), len(grid)), np.nan)
+        for i, (curve, pos) in enumerate(zip(group, positions)):
+            matrix[i, pos] = curve.y
+        full = ~np.isnan(matrix).any(axis=0)
+        if not full.any():
+            continue
+        matrix = matrix[:, full]
+
+        label = f"NT{tuple_v}_sym-notsym_mean"
+        if stage is not None:
+            label += f"_st{stage}"
+        graph_data = GraphData(
+            x=grid[full].tolist(),
+            y=matrix.mean(axis=0).tolist(),
+            count=[len(group)] * int(full.sum()),
+        )
+        if len(group) >= 2:
+            if n_boot > 0:
+                lower, upper = bootstrap_band(matrix, n_boot)
+                graph_data.lower = lower.tolist()
+                graph_data.upper = upper.tolist()
+            graph_data.pvalue = permutation_pvalues(matrix, n_perm).tolist()
+        result.data[label] = graph_data
+    return result
+
+
+def paired_curves_data(
+    pairs: list[Pair],
+    curves: dict[str, GraphData],
+    y_label: str,
+) -> PlotData:
+    """
+    組ごとの差の曲線をそのまま並べた PlotData を返す（seed ごとの比較用）。
+    """
+    return PlotData(x_label="progress", y_label=y_label, data=pair_diff_curves(pairs, curves))
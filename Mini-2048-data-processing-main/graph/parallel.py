@@ -0,0 +1,96 @@
+"""
+PlayerData ごとの曲線計算（読み込み + 集計）をプロセスプールで並列に行う。
+
+子プロセスには PlayerData と計算関数だけを渡し、戻ってくるのは GraphData などの
+小さな結果だけにする。matplotlib での描画は親プロセスで行う。
+"""
+
+import contextlib
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, TypeVar
+
+from . import cache
+from .common import PlayerData
+
+T = TypeVar("T")
+
+jobs = 1
+
+
+def configure(n_jobs: int | None = None) -> None:
+    """
+    並列数を変更する。0以下を指定した場合はCPU数を使う。
+    """
+    global jobs
+    if n_jobs is not None:
+        jobs = n_jobs if n_jobs > 0 else (os.cpu_count() or 1)
+
+
+def _env_jobs() -> int | None:
+    # 環境変数 GRAPH_JOBS（-j と同じく0以下はCPU数）。整数でなければ無視する
+    value = os.environ.get("GRAPH_JOBS", "").strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        print(f"環境変数 GRAPH_JOBS が整数ではないため無視します: {value!r}")
+        return None
+
+
+configure(_env_jobs())
+
+
+def _init_worker(cache_dir, max_bytes, enabled) -> None:
+    # 親プロセスでの --cache-dir / --no-cache を子プロセスにも反映する
+    cache.configure(directory=cache_dir, max_size=max_bytes, is_enabled=enabled)
+
+
+def mp_context():
+    # python -m graph の __main__ を子プロセスで再実行しないよう fork を優先する
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+def map_players(
+    func: Callable[[PlayerData], T],
+    player_data_list: Iterable[PlayerData],
+) -> list[T]:
+    """
+    func を各 PlayerData に適用した結果を入力順に返す。並列数が1なら逐次実行する。
+    func はモジュールのトップレベル関数（または functools.partial）である必要がある。
+    """
+    player_data_list = list(player_data_list)
+    n_workers = min(jobs, len(player_data_list))
+    if n_workers <= 1:
+        return [func(pd) for pd in player_data_list]
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=mp_context(),
+        initializer=_init_worker,
+        initargs=(cache.cache_dir, cache.max_bytes, cache.enabled),
+    ) as executor:
+        return list(executor.map(func, player_data_list))
+
+
+@contextlib.contextmanager
+def player_pool() -> Iterator[Executor]:
+    """
+    map_players と同じ並列数で、submit した計算を呼び出し側の処理（描画など）と並行に進めるプール。
+    並列数が1ならスレッド1つ（fork しない）、それ以上ならプロセスプール。
+    submit はプールを作ったスレッドから行う。
+    """
+    if jobs <= 1:
+        executor = ThreadPoolExecutor(max_workers=1)
+    else:
+        executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=mp_context(),
+            initializer=_init_worker,
+            initargs=(cache.cache_dir, cache.max_bytes, cache.enabled),
+        )
+    with executor:
+        yield executor
@@ -0,0 +1,269 @@
+"""
+--preview: 各プレイヤのゲームの一部から曲線を先に描き、ゲームを足しながら描き直す。
+
+ゲームを読む順は seed で決まる乱数の並べ替えで、1回目は先頭の first_games ゲーム、以降は読んだゲーム数が
+倍になるように足していく。ゲームはゲームごとの索引（PlayerData.eval_table(games)）から必要な分だけ読み、
+progress ごとの統計量（ProgressStats）を merge_progress_stats で足し合わせる。次の回の読み込みは
+parallel.player_pool で、呼び出し側がその回の図を描いている間に進める。
+曲線は通常と同じ移動平均で、帯は progress ごとの標準誤差から求めた移動平均の標準誤差の ±1.96 倍。
+err-rel の標準誤差は、選んだ手が PP で非合法手の評価値（-10000000000）になっている行を除いて求める
+（曲線そのものは通常と同じく全ての行から）。標準誤差が求まらない点（サンプルが1つの progress を含む窓など）が
+あるうちは収束していないとみなし、曲線の標準誤差の最大値が target_se を下回るか、全てのゲームを読んだら終わる。
+"""
+
+from dataclasses import dataclass
+from typing import Iterator
+
+import numpy as np
+
+from . import accuracy, error_abs, error_rel, evals
+from .common import (
+    EvalTable,
+    GraphData,
+    PlotData,
+    PlayerData,
+    ProgressStats,
+    groupby_progress,
+    merge_progress_stats,
+    moving_average,
+    moving_sum,
+    progress_grid,
+    tuple_sym_stage,
+)
+from .multi import GRAPHS
+from .parallel import player_pool
+
+# 1回目に読むゲーム数（--preview の値を省略した場合）
+PREVIEW_GAMES = 200
+# 帯の幅（標準誤差の何倍か）
+BAND_Z = 1.96
+# これ以下の評価値は非合法手（error_rel.calc_rel_error の最悪手の判定と同じ閾値）
+ILLEGAL_EVAL_MAX = -1e5
+
+# --preview で描けるグラフ（プレイヤごとの曲線と、その seed 平均）
+PREVIEW_GRAPHS = tuple(g for g, (_, _, mode) in GRAPHS.items() if mode in ("player", "mean"))
+
+
+# 各関数は (progress, 1手ごとの値, 標準誤差に使う行のマスク（全ての行なら None）) を返す
+Values = tuple[np.ndarray, np.ndarray, np.ndarray | None]
+
+
+def _acc_values(pp: EvalTable, pr: EvalTable) -> Values:
+    return pp.prg, accuracy.calc_accuracy(pp, pr), None
+
+
+def _rel_error_values(pp: EvalTable, pr: EvalTable) -> Values:
+    # 選んだ手が非合法手の評価値の行は、値が非合法手の評価値に引きずられて分散が意味をなさない
+    chosen = pp.evals[np.arange(len(pp)), pr.best_idx]
+    return pp.prg, error_rel.calc_rel_error(pp, pr), chosen > ILLEGAL_EVAL_MAX
+
+
+def _abs_error_values(pp: EvalTable, pr: EvalTable) -> Values:
+    return pp.prg, error_abs.calc_abs_error(pp, pr), None
+
+
+def _eval_values(pp: EvalTable | None, pr: EvalTable) -> Values:
+    return pr.prg, pr.best_eval, None
+
+
+# 指標 -> (Values を返す関数, PPの評価値を使うか, 移動平均の窓幅)
+METRICS = {
+    "acc": (_acc_values, True, accuracy.SMOOTHING_WINDOW),
+    "err-rel": (_rel_error_values, True, error_rel.SMOOTHING_WINDOW),
+    "err-abs": (_abs_error_values, True, error_abs.SMOOTHING_WINDOW),
+    "evals": (_eval_values, False, evals.SMOOTHING_WINDOW),
+}
+
+
+@dataclass
+class PreviewCurve:
+    curve: GraphData
+    se: np.ndarray  # 曲線の各点の標準誤差（求まらない点は nan）
+
+    @property
+    def max_se(self) -> float:
+        # 標準誤差が求まらない点があるうちは収束していない
+        if len(self.se) == 0 or not np.isfinite(self.se).all():
+            return float("inf")
+        return float(self.se.max())
+
+    @property
+    def n_undefined(self) -> int:
+        """標準誤差が求まらない点の数。"""
+        return int((~np.isfinite(self.se)).sum())
+
+
+def _batch_stats(
+    player_data: PlayerData,
+    games: np.ndarray,
+    metric: str,
+) -> tuple[ProgressStats, ProgressStats | None]:
+    """
+    games のゲームだけを読み、progress ごとの (曲線の統計量, 標準誤差の統計量) を返す。
+    標準誤差を曲線と同じ行から求める指標では後者は None。
+    """
+    values_of, uses_pp, _ = METRICS[metric]
+    pr = player_data.eval_table(games)
+    pp = player_data.pp_eval_table(games) if uses_pp else None
+    prg, values, se_rows = values_of(pp, pr)
+    stats = groupby_progress(prg, values)
+    if se_rows is None:
+        return stats, None
+    return stats, groupby_progress(prg[se_rows], values[se_rows])
+
+
+def _var_of_mean(stats: ProgressStats, se_stats: ProgressStats) -> np.ndarray:
+    """
+    stats の各 progress の平均の分散（se_stats の 分散 / 件数、se_stats に無い progress は nan）。
+    """
+    pos = np.minimum(np.searchsorted(se_stats.prg, stats.prg), max(len(se_stats.prg) - 1, 0))
+    present = len(se_stats.prg) > 0
+    present = present & (se_stats.prg[pos] == stats.prg) if present else np.zeros(len(stats.prg), bool)
+    var = np.full(len(stats.prg), np.nan)
+    var[present] = se_stats.var[pos[present]] / se_stats.count[pos[present]]
+    return var
+
+
+def preview_curve(
+    stats: ProgressStats,
+    window: int,
+    se_stats: ProgressStats | None = None,
+) -> PreviewCurve:
+    """
+    progress ごとの統計量から、通常と同じ移動平均の曲線と ±BAND_Z 標準誤差の帯を作る。
+    se_stats を指定した場合は標準誤差をそちらから求める。
+    """
+    y = moving_average(stats.mean, window)
+    var = _var_of_mean(stats, se_stats if se_stats is not None else stats)
+    # 各 progress の平均は独立なので、移動平均の分散は分散の和 / 窓幅²
+    se = np.sqrt(moving_sum(var, window)) / window
+    curve = GraphData(
+        x=moving_average(stats.prg, window).tolist(),
+        y=y.tolist(),
+        count=moving_sum(stats.count, window).tolist(),
+        lower=(y - BAND_Z * se).tolist(),
+        upper=(y + BAND_Z * se).tolist(),
+    )
+    return PreviewCurve(curve, se)
+
+
+def _mean_curve(curves: list[PreviewCurve]) -> PreviewCurve:
+    """
+    seed ごとの曲線を全ての seed にある progress で平均する（標準誤差は seed の標準誤差の二乗和から）。
+    """
+    grid, positions = progress_grid([c.curve for c in curves])
+    y = np.full((len(curves), len(grid)), np.nan)
+    var = np.full((len(curves), len(grid)), np.nan)
+    for i, (c, pos) in enumerate(zip(curves, positions)):
+        y[i, pos] = c.curve.y
+        var[i, pos] = c.se**2
+    full = ~np.isnan(y).any(axis=0)
+    mean = y[:, full].mean(axis=0)
+    se = np.sqrt(var[:, full].sum(axis=0)) / len(curves)
+    curve = GraphData(
+        x=grid[full].tolist(),
+        y=mean.tolist(),
+        count=[len(curves)] * int(full.sum()),
+        lower=(mean - BAND_Z * se).tolist(),
+        upper=(mean + BAND_Z * se).tolist(),
+    )
+    return PreviewCurve(curve, se)
+
+
+def iter_preview_data(
+    player_data_list: list[PlayerData],
+    graph: str,
+    first_games: int = PREVIEW_GAMES,
+    target_se: float | None = None,
+    seed: int | None = 0,
+) -> Iterator[PlotData]:
+    """
+    読むゲームを増やしながら、その時点の PlotData を返す。
+    最後に返すものは target_se を満たしたか、全てのゲームを読んだもの。
+    """
+    metric, y_label, mode = GRAPHS[graph]
+    window = METRICS[metric][2]
+    rng = np.random.default_rng(seed)
+    orders = {}
+    for pd in player_data_list:
+        n_games = pd.n_games
+        if pd.max_games is not None:
+            n_games = min(n_games, pd.max_games)
+        orders[pd.name] = rng.permutation(n_games)
+    total_games = sum(len(order) for order in orders.values())
+
+    stats: dict[str, ProgressStats] = {}
+    # 標準誤差を別の行から求める指標（err-rel）だけ
+    se_stats: dict[str, ProgressStats] = {}
+    longest = max((len(order) for order in orders.values()), default=0)
+
+    def submit(executor, start: int, size: int) -> list:
+        # 1回分の読み込みをプールに投げる（結果は (PlayerData, future) の一覧）
+        return [
+            (pd, executor.submit(_batch_stats, pd, orders[pd.name][start : start + size], metric))
+            for pd in player_data_list
+            if len(orders[pd.name][start : start + size])
+        ]
+
+    with player_pool() as executor:
+        size = max(1, first_games)
+        used = 0
+        pending = submit(executor, used, size)
+        while pending:
+            for pd, future in pending:
+                s, se = future.result()
+                if pd.name in stats:
+                    stats[pd.name] = merge_progress_stats(stats[pd.name], s)
+                    if se is not None:
+                        se_stats[pd.name] = merge_progress_stats(se_stats[pd.name], se)
+                else:
+                    stats[pd.name] = s
+                    if se is not None:
+                        se_stats[pd.name] = se
+            used += size
+            result, max_se, n_undefined = _preview_result(
+                player_data_list, stats, se_stats, window, mode, y_label
+            )
+            read_games = sum(min(used, len(order)) for order in orders.values())
+            message = f"preview: {read_games}/{total_games} ゲーム, 曲線の標準誤差の最大値 {max_se:.4g}"
+            if n_undefined:
+                message += f"（標準誤差が求まらない点 {n_undefined} 個）"
+            print(message)
+            done = used >= longest or (target_se is not None and max_se < target_se)
+            # 次の回は呼び出し側がこの回の図を描いている間に読む
+            size = used
+            pending = [] if done else submit(executor, used, size)
+            yield result
+
+
+def _preview_result(
+    player_data_list: list[PlayerData],
+    stats: dict[str, ProgressStats],
+    se_stats: dict[str, ProgressStats],
+    window: int,
+    mode: str,
+    y_label: str,
+) -> tuple[PlotData, float, int]:
+    """
+    その時点の統計量から PlotData、曲線の標準誤差の最大値、標準誤差が求まらない点の数を作る。
+    """
+    curves = {
+        name: preview_curve(s, window, se_stats.get(name)) for name, s in stats.items()
+    }
+    result = PlotData(x_label="progress", y_label=y_label, data={})
+    if mode == "mean":
+        grouped: dict[tuple, list[PreviewCurve]] = {}
+        for pd in player_data_list:
+            info = tuple_sym_stage(pd)
+            if info is not None and pd.name in curves:
+                grouped.setdefault(info, []).append(curves[pd.name])
+        curves = {}
+        for (tuple_v, sym, stage), group in grouped.items():
+            label = f"NT{tuple_v}_{sym}_mean"
+            if stage is not None:
+                label += f"_st{stage}"
+            curves[label] = _mean_curve(group)
+    for name, c in curves.items():
+        result.data[name] = c.curve
+    max_se = max((c.max_se for c in curves.values()), default=float("inf"))
+    return result, max_se, sum(c.n_undefined for c in curves.values())
@@ -0,0 +1,150 @@
+"""
+散布図用に、eval.txt と PP の eval-after-state を先頭から同時に読みながら標本を取る。
+
+全ての手を配列に読み込まず、一定行数ずつ読んでは標本（リザーバ）だけを残すので、
+メモリは標本数＋1チャンク分で済む。各行に乱数のキーを割り当ててキーの小さいものを残す
+（一様な非復元抽出になる）ため、seed が同じなら毎回同じ点が選ばれる。
+stratify_bin を指定すると progress をその幅で区切った区間（層）ごとに標本を取り、
+最後に層ごとの点数がなるべく均等になるように sample_size 個にする。
+"""
+
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+CHUNK_ROWS = 65536
+
+
+@dataclass
+class ScatterSample:
+    pp_eval: np.ndarray  # PPの after-state 評価値
+    player_eval: np.ndarray  # プレイヤの最善手の評価値
+    prg: np.ndarray  # progress
+
+    def __len__(self) -> int:
+        return len(self.prg)
+
+
+def _data_rows(f, max_games: int | None) -> Iterator[bytes]:
+    games = 0
+    for line in f:
+        if line.startswith(b"game"):
+            games += 1
+            if max_games is not None and games >= max_games:
+                return
+        elif line.strip():
+            yield line
+
+
+def _data_row_chunks(
+    path: Path,
+    n_cols: int,
+    chunk_rows: int,
+    max_games: int | None = None,
+) -> Iterator[np.ndarray]:
+    """
+    gameover 行を除いたデータ行を chunk_rows 行ずつ (n, n_cols) の配列で返す。
+    max_games を指定した場合は先頭の max_games ゲームだけを読む。
+    """
+    with path.open("rb") as f:
+        rows = _data_rows(f, max_games)
+        while True:
+            lines = list(islice(rows, chunk_rows))
+            if not lines:
+                return
+            values = np.array(b" ".join(lines).split(), dtype=np.float64)
+            yield values.reshape(len(lines), n_cols)
+
+
+def iter_eval_pair_chunks(
+    pp_after_state_file: Path,
+    eval_file: Path,
+    chunk_rows: int = CHUNK_ROWS,
+    max_games: int | None = None,
+) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    2つのファイルを同時に読み、(PPの after-state 評価値, プレイヤの最善手の評価値, progress) を
+    chunk_rows 行ずつ返す（max_games を指定した場合は先頭の max_games ゲームだけ）。
+    """
+    pp_chunks = _data_row_chunks(pp_after_state_file, 1, chunk_rows, max_games)
+    pr_chunks = _data_row_chunks(eval_file, 5, chunk_rows, max_games)
+    try:
+        for pp_chunk, pr_chunk in zip(pp_chunks, pr_chunks, strict=True):
+            assert len(pp_chunk) == len(pr_chunk)
+            yield pp_chunk[:, 0], pr_chunk[:, :4].max(axis=1), pr_chunk[:, 4].astype(np.int64)
+    except (AssertionError, ValueError) as e:
+        raise AssertionError(
+            f"データ数が異なります。{pp_after_state_file}, {eval_file}"
+        ) from e
+
+
+def _ranks_within(keys: np.ndarray, strata: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (層・キーの順に並べたインデックス, その順での層内の順位) を返す。
+    """
+    order = np.lexsort((keys, strata))
+    sorted_strata = strata[order]
+    starts = np.flatnonzero(np.r_[True, sorted_strata[1:] != sorted_strata[:-1]])
+    sizes = np.diff(np.r_[starts, len(order)])
+    return order, np.arange(len(order)) - np.repeat(starts, sizes)
+
+
+def _keep_smallest(keys: np.ndarray, strata: np.ndarray | None, k: int) -> np.ndarray:
+    """
+    キーが小さい順に k 個（strata を指定した場合は層ごとに k 個）残すインデックスを返す。
+    """
+    if strata is None:
+        if len(keys) <= k:
+            return np.arange(len(keys))
+        return np.argpartition(keys, k)[:k]
+    order, rank = _ranks_within(keys, strata)
+    return order[rank < k]
+
+
+def sample_eval_pairs(
+    pp_after_state_file: Path,
+    eval_file: Path,
+    sample_size: int,
+    seed: int | None = 0,
+    stratify_bin: int | None = None,
+    chunk_rows: int = CHUNK_ROWS,
+    max_games: int | None = None,
+) -> ScatterSample:
+    """
+    (PPの after-state 評価値, プレイヤの最善手の評価値, progress) を sample_size 個取り出す。
+    データが sample_size 個以下なら全て返す。戻り値はファイル内の順に並ぶ。
+    max_games を指定した場合は先頭の max_games ゲームから取り出す。
+    """
+    rng = np.random.default_rng(seed)
+    keys = np.empty(0)
+    pos = np.empty(0, dtype=np.int64)
+    pp = np.empty(0)
+    player = np.empty(0)
+    prg = np.empty(0, dtype=np.int64)
+
+    n_rows = 0
+    for pp_chunk, player_chunk, prg_chunk in iter_eval_pair_chunks(
+        pp_after_state_file, eval_file, chunk_rows, max_games
+    ):
+        n = len(prg_chunk)
+        keys = np.concatenate([keys, rng.random(n)])
+        pos = np.concatenate([pos, np.arange(n_rows, n_rows + n)])
+        pp = np.concatenate([pp, pp_chunk])
+        player = np.concatenate([player, player_chunk])
+        prg = np.concatenate([prg, prg_chunk])
+        n_rows += n
+        strata = prg // stratify_bin if stratify_bin else None
+        keep = _keep_smallest(keys, strata, sample_size)
+        keys, pos, pp, player, prg = (a[keep] for a in (keys, pos, pp, player, prg))
+
+    if stratify_bin and len(keys) > sample_size:
+        # 層内の順位が小さいものから取ることで、層ごとの点数をなるべく均等にする
+        order, rank = _ranks_within(keys, prg // stratify_bin)
+        keep = order[np.lexsort((keys[order], rank))[:sample_size]]
+        pos, pp, player, prg = (a[keep] for a in (pos, pp, player, prg))
+
+    order = np.argsort(pos)
+    return ScatterSample(pp_eval=pp[order], player_eval=player[order], prg=prg[order])
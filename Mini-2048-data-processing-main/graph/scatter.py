@@ -1,60 +1,54 @@
-import random
-import re
 from pathlib import Path
 
 import matplotlib.pyplot as plt
 import numpy as np
 
-from .common import get_eval_and_hand_progress, PlayerData
+from .common import PlayerData
+from .density import plot_density, player_eval_density
+from .sampling import sample_eval_pairs
 
 PERFECT_AVG_EVAL = 5468.49  # パーフェクトプレイヤの平均評価値
 
 
-def get_evals(eval_file: Path):
-    eval_txt = eval_file.read_text("utf-8")
-    subed_eval_txt = re.sub(r"game.*\n?", "", eval_txt)
-    eval_lines = subed_eval_txt.splitlines()
-    return [float(line) for line in eval_lines]
-
-
 def plot_scatter(
     player_data_list: list[PlayerData],
     output: Path,
     is_show: bool = True,
+    sample_size: int = 1000,
+    seed: int | None = 0,
+    stratify_bin: int | None = None,
+    density: bool = False,
 ):
     """
     パーフェクトプレイヤとプレイヤーの評価値の散布図をプロットする。
+    density=True の場合は標本ではなく全ての手の密度（2次元ヒストグラム）を描く。
     """
     for i, pd in enumerate(player_data_list):
-        pp_evals = get_evals(pd.pp_eval_after_state)
-        pr_eval_and_hand_progress = get_eval_and_hand_progress(pd.eval_file)
-        eval_txt = pd.eval_file.read_text("utf-8")
-        # gameoverの行を全て抽出
-        gameover_lines = re.findall(r"game.*\n?", eval_txt)
-        # gameoverの行からscoreを抽出し、平均得点を算出
-        gameover_scores = [
-            float(re.search(r"score: (\d+)", line).group(1)) for line in gameover_lines
-        ]
-        avg_score = np.mean(gameover_scores) if gameover_scores else 0
+        # gameover表からscoreを取得し、平均得点を算出
+        gameover_scores = pd.gameover_table().score
+        avg_score = np.mean(gameover_scores) if len(gameover_scores) else 0
         print(f"{avg_score=}")
 
-        assert len(pp_evals) == len(
-            pr_eval_and_hand_progress
-        ), f"データ数が異なります。{len(pp_evals)=}, {len(pr_eval_and_hand_progress)=}"
+        if density:
+            image = plot_density(plt.gca(), player_eval_density(pd))
+            plt.colorbar(image, label="count")
+        else:
+            # sample_size個のデータをランダムで取得
+            sample = sample_eval_pairs(
+                pd.pp_eval_after_state,
+                pd.eval_file,
+                sample_size,
+                seed,
+                stratify_bin,
+                max_games=pd.max_games,
+            )
 
-        scatter_data = [
-            (ev, pr_eval.evals[pr_eval.idx[0]])
-            for ev, pr_eval in zip(pp_evals, pr_eval_and_hand_progress)
-        ]
-        # 1000個のデータをランダムで取得
-        scatter_data = random.sample(scatter_data, 1000)
-
-        # 散布図のdotの大きさを指定
-        plt.scatter(
-            [d[0] for d in scatter_data],
-            [d[1] for d in scatter_data],
-            s=5,
-        )
+            # 散布図のdotの大きさを指定
+            plt.scatter(
+                sample.pp_eval,
+                sample.player_eval,
+                s=5,
+            )
         # 直線を引く
         plt.plot(
             [0, 6000],
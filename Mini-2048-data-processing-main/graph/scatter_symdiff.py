@@ -1,73 +1,34 @@
-import random
-import re
 from pathlib import Path
 
 import matplotlib.pyplot as plt
 import numpy as np
 
-from .common import PlayerData, get_eval_and_hand_progress
+from .common import PlayerData
+from .density import EvalDensity, plot_density, plot_fit, player_eval_density
+from .paired import pair_info
+from .sampling import sample_eval_pairs
 
 
-def get_evals(eval_file: Path) -> list[float]:
-    eval_txt = eval_file.read_text("utf-8")
-    subed_eval_txt = re.sub(r"game.*\n?", "", eval_txt)
-    eval_lines = subed_eval_txt.splitlines()
-    return [float(line) for line in eval_lines]
+def _scatter_points(
+    pd: PlayerData,
+    sample_size: int,
+    seed: int | None = 0,
+    stratify_bin: int | None = None,
+) -> tuple[list[float], list[float]]:
+    sample = sample_eval_pairs(
+        pd.pp_eval_after_state,
+        pd.eval_file,
+        sample_size,
+        seed,
+        stratify_bin,
+        max_games=pd.max_games,
+    )
+    return sample.pp_eval.tolist(), sample.player_eval.tolist()
 
 
-def _extract_info(pd: PlayerData) -> tuple[str | None, int | None, str | None, int | None]:
-    meta = pd.meta or {}
-    tuple_v = meta.get("tuple")
-    sym = meta.get("sym")
-    seed = meta.get("seed")
-    stage = meta.get("stage")
-    run_name = None
-
-    parts = pd.rel_path.parts
-    if parts:
-        run_name = parts[0]
-
-    if tuple_v is None or sym is None or seed is None:
-        if len(parts) >= 3:
-            seed_dir = parts[1]
-            nt_dir = parts[2]
-            if seed is None and seed_dir.startswith("seed"):
-                seed = int(seed_dir.replace("seed", ""))
-            if nt_dir.startswith("NT") and "_" in nt_dir:
-                tuple_v = int(nt_dir[2])
-                sym = nt_dir.split("_", 1)[1]
-
-    return run_name, tuple_v, sym, seed, stage
-
-
-def _scatter_points(pd: PlayerData, sample_size: int) -> tuple[list[float], list[float]]:
-    pp_evals = get_evals(pd.pp_eval_after_state)
-    pr_eval_and_hand_progress = get_eval_and_hand_progress(pd.eval_file)
-
-    assert len(pp_evals) == len(
-        pr_eval_and_hand_progress
-    ), f"データ数が異なります。{len(pp_evals)=}, {len(pr_eval_and_hand_progress)=}"
-
-    scatter_data = [
-        (ev, pr_eval.evals[pr_eval.idx[0]])
-        for ev, pr_eval in zip(pp_evals, pr_eval_and_hand_progress)
-    ]
-    if len(scatter_data) > sample_size:
-        scatter_data = random.sample(scatter_data, sample_size)
-    xs = [d[0] for d in scatter_data]
-    ys = [d[1] for d in scatter_data]
-    return xs, ys
-
-
-def _plot_regression(xs: list[float], ys: list[float], color: str, label: str) -> None:
-    if len(xs) < 2:
-        return
-    coeffs = np.polyfit(xs, ys, 1)
-    x_min = min(xs)
-    x_max = max(xs)
-    x_line = np.array([x_min, x_max])
-    y_line = coeffs[0] * x_line + coeffs[1]
-    plt.plot(x_line, y_line, color=color, linestyle="solid", label=label)
+def _plot_regression(density: EvalDensity, color: str, label: str) -> None:
+    # 標本ではなく全ての手の Σx, Σy, Σxy, Σx² から回帰直線を求める
+    plot_fit(plt.gca(), density, color=color, label=label)
 
 
 def plot_scatter_symdiff(
@@ -75,21 +36,28 @@ def plot_scatter_symdiff(
     output: Path,
     is_show: bool = True,
     sample_size: int = 1500,
+    seed: int | None = 0,
+    stratify_bin: int | None = None,
+    density: bool = False,
 ):
     """
     同一seed・同一タプルのsym/notsymを同じ散布図に重ねて描画する。
+    density=True の場合は seed をまとめた全ての手の密度を sym / notsym / 差 の3枚で描く。
     """
     grouped: dict[tuple[str | None, int | None, int | None, int | None], dict[str, PlayerData]] = {}
     for pd in player_data_list:
-        run_name, tuple_v, sym, seed, stage = _extract_info(pd)
-        if tuple_v is None or sym is None or seed is None:
+        run_name, tuple_v, sym, player_seed, stage = pair_info(pd)
+        if tuple_v is None or sym is None or player_seed is None:
             continue
         if sym not in ("sym", "notsym"):
             continue
-        key = (run_name, tuple_v, seed, stage)
+        key = (run_name, tuple_v, player_seed, stage)
         grouped.setdefault(key, {})[sym] = pd
 
-    for (run_name, tuple_v, seed, stage), items in grouped.items():
+    if density:
+        return _plot_density_symdiff(grouped, output, is_show)
+
+    for (run_name, tuple_v, player_seed, stage), items in grouped.items():
         plt.figure()
         plt.plot([0, 6000], [0, 6000], color="gray", linestyle="dashed", label="y=x")
 
@@ -97,16 +65,20 @@ def plot_scatter_symdiff(
             pd = items.get(sym)
             if pd is None:
                 continue
-            xs, ys = _scatter_points(pd, sample_size)
+            xs, ys = _scatter_points(pd, sample_size, seed, stratify_bin)
             plt.scatter(xs, ys, s=5, label=sym, color=color, alpha=0.6)
-            _plot_regression(xs, ys, color=color, label=f"{sym} fit")
+            _plot_regression(
+                player_eval_density(pd),
+                color=color,
+                label=f"{sym} fit",
+            )
 
         plt.xlabel("perfect")
         plt.ylabel("player")
         plt.legend()
         plt.tight_layout()
 
-        suffix = f"seed{seed}_NT{tuple_v}"
+        suffix = f"seed{player_seed}_NT{tuple_v}"
         if stage is not None:
             suffix += f"_st{stage}"
         save_path = output.with_stem(f"{output.stem}_{suffix}")
@@ -116,3 +88,75 @@ def plot_scatter_symdiff(
             plt.show()
         plt.close()
     return None
+
+
+def _plot_density_symdiff(
+    grouped: dict[tuple[str | None, int | None, int | None, int | None], dict[str, PlayerData]],
+    output: Path,
+    is_show: bool = True,
+):
+    # seed をまたいで (run_name, tuple, stage) ごとに密度を足し合わせる
+    merged: dict[tuple[str | None, int | None, int | None], dict[str, EvalDensity]] = {}
+    seeds: dict[tuple[str | None, int | None, int | None], list[int]] = {}
+    for (run_name, tuple_v, player_seed, stage), items in grouped.items():
+        key = (run_name, tuple_v, stage)
+        seeds.setdefault(key, []).append(player_seed)
+        by_sym = merged.setdefault(key, {})
+        for sym, pd in items.items():
+            d = player_eval_density(pd)
+            by_sym[sym] = by_sym[sym] + d if sym in by_sym else d
+
+    for (run_name, tuple_v, stage), densities in merged.items():
+        vmax = max(int(d.counts.max()) for d in densities.values()) or 1
+        fig, axes = plt.subplots(
+            1, 3, figsize=(13, 4), sharex=True, sharey=True, layout="constrained"
+        )
+        image = None
+        for ax, (sym, color) in zip(axes, (("sym", "tab:blue"), ("notsym", "tab:orange"))):
+            d = densities.get(sym)
+            ax.plot([0, 6000], [0, 6000], color="gray", linestyle="dashed", label="y=x")
+            if d is not None:
+                image = plot_density(ax, d, vmax=vmax)
+                plot_fit(ax, d, color=color, label=f"{sym} fit")
+            ax.set_title(f"{sym} (n={d.n if d is not None else 0})")
+            ax.set_xlabel("perfect")
+            ax.legend(loc="upper left")
+        axes[0].set_ylabel("player")
+        if image is not None:
+            fig.colorbar(image, ax=axes[:2].tolist(), label="count")
+
+        # 点数の違いを除くため、それぞれ割合にしてから差を取る
+        ax = axes[2]
+        if "sym" in densities and "notsym" in densities:
+            sym_d, notsym_d = densities["sym"], densities["notsym"]
+            diff = sym_d.counts / max(sym_d.counts.sum(), 1) - notsym_d.counts / max(
+                notsym_d.counts.sum(), 1
+            )
+            limit = float(np.abs(diff).max()) or 1.0
+            lo, hi = sym_d.edges[0], sym_d.edges[-1]
+            diff_image = ax.imshow(
+                diff.T,
+                origin="lower",
+                extent=(lo, hi, lo, hi),
+                aspect="auto",
+                interpolation="nearest",
+                cmap="RdBu_r",
+                vmin=-limit,
+                vmax=limit,
+            )
+            fig.colorbar(diff_image, ax=ax, label="sym - notsym (ratio)")
+        ax.plot([0, 6000], [0, 6000], color="gray", linestyle="dashed")
+        ax.set_title("sym - notsym")
+        ax.set_xlabel("perfect")
+
+        seed_list = sorted(seeds[(run_name, tuple_v, stage)])
+        suffix = f"seed{seed_list[0]}-{seed_list[-1]}_NT{tuple_v}_density"
+        if stage is not None:
+            suffix += f"_st{stage}"
+        save_path = output.with_stem(f"{output.stem}_{suffix}")
+        fig.savefig(save_path)
+        print(f"{save_path} saved.")
+        if is_show:
+            plt.show()
+        plt.close(fig)
+    return None
@@ -1,47 +1,42 @@
-import random
-import re
 from pathlib import Path
 
 import matplotlib.pyplot as plt
 
-from .common import get_eval_and_hand_progress, PlayerData
-
-
-def get_evals(eval_file: Path):
-    eval_txt = eval_file.read_text("utf-8")
-    subed_eval_txt = re.sub(r"game.*\n?", "", eval_txt)
-    eval_lines = subed_eval_txt.splitlines()
-    return [float(line) for line in eval_lines]
+from .common import PlayerData
+from .density import plot_density, player_eval_density
+from .sampling import sample_eval_pairs
 
 
 def plot_scatter(
     player_data_list: list[PlayerData],
     output: Path,
     is_show: bool = True,
+    sample_size: int = 1500,
+    seed: int | None = 0,
+    stratify_bin: int | None = None,
+    density: bool = False,
 ):
     """
     パーフェクトプレイヤとプレイヤーの評価値の散布図をプロットする。
     """
+    if density:
+        return _plot_density_v2(player_data_list, output, is_show)
 
     for i, pd in enumerate(player_data_list):
-        pp_evals = get_evals(pd.pp_eval_after_state)
-        pr_eval_and_hand_progress = get_eval_and_hand_progress(pd.eval_file)
-
-        assert len(pp_evals) == len(
-            pr_eval_and_hand_progress
-        ), f"データ数が異なります。{len(pp_evals)=}, {len(pr_eval_and_hand_progress)=}"
-
-        scatter_data = [
-            (ev, pr_eval.evals[pr_eval.idx[0]])
-            for ev, pr_eval in zip(pp_evals, pr_eval_and_hand_progress)
-        ]
-        # 1000個のデータをランダムで取得
-        scatter_data = random.sample(scatter_data, 1500)
+        # sample_size個のデータをランダムで取得
+        sample = sample_eval_pairs(
+            pd.pp_eval_after_state,
+            pd.eval_file,
+            sample_size,
+            seed,
+            stratify_bin,
+            max_games=pd.max_games,
+        )
 
         # 散布図のdotの大きさを指定
         plt.scatter(
-            [d[0] for d in scatter_data],
-            [d[1] for d in scatter_data],
+            sample.pp_eval,
+            sample.player_eval,
             s=5,
             label=pd.config.get("label", pd.name),
             color=pd.config.get("color", None),
@@ -64,3 +59,40 @@ def plot_scatter(
         plt.show()
     plt.close()
     return None
+
+
+def _plot_density_v2(
+    player_data_list: list[PlayerData],
+    output: Path,
+    is_show: bool = True,
+):
+    """
+    密度は重ねると読めないため、プレイヤごとに横に並べて描く（色の範囲は共通）。
+    """
+    densities = [player_eval_density(pd) for pd in player_data_list]
+    vmax = max((int(d.counts.max()) for d in densities), default=1) or 1
+    fig, axes = plt.subplots(
+        1,
+        len(densities),
+        figsize=(4 * len(densities), 4),
+        sharex=True,
+        sharey=True,
+        squeeze=False,
+        layout="constrained",
+    )
+    image = None
+    for ax, pd, density in zip(axes[0], player_data_list, densities):
+        image = plot_density(ax, density, vmax=vmax)
+        ax.plot([0, 6000], [0, 6000], color="black", linestyle="dashed")
+        ax.set_title(pd.config.get("label", pd.name))
+        ax.set_xlabel("perfect")
+    axes[0][0].set_ylabel("player")
+    if image is not None:
+        fig.colorbar(image, ax=axes[0].tolist(), label="count")
+    save_path = output.with_stem(f"{output.stem}_v2")
+    fig.savefig(save_path)
+    print(f"{save_path} saved.")
+    if is_show:
+        plt.show()
+    plt.close(fig)
+    return None
@@ -0,0 +1,159 @@
+"""
+箱ひげ図の統計量を、値を全て保持せずに近似するための分位点スケッチ（KLL 方式）。
+
+レベル h の値は重み 2^h を持ち、各レベルが容量 k を超えたらソートして1つおきに
+上のレベルへ送る（圧縮）。保持する値の数は O(k log(n/k)) で、分位点の誤差はおおよそ
+順位で n / k 程度になる。件数・合計・二乗和・最小値・最大値は正確に保持する。
+スケッチ同士は merge で足し合わせられるので、seed やプロセスをまたいだ集計に使える。
+"""
+
+import numpy as np
+
+DEFAULT_K = 2048
+
+
+class QuantileSketch:
+    def __init__(self, k: int = DEFAULT_K):
+        self.k = k
+        self.levels: list[np.ndarray] = [np.empty(0)]
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        # 圧縮で残す側（偶数番目/奇数番目）をレベルごとに交互にする（偏りを打ち消す）
+        self._parity: list[int] = [0]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def update(self, values: np.ndarray) -> "QuantileSketch":
+        """
+        値の配列をまとめて追加する。
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return self
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.total_sq += float(values @ values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """
+        other の内容を足し合わせる（self を更新して返す）。
+        """
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+            self._parity.append(0)
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _compress(self) -> None:
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) > self.k:
+                items = np.sort(items)
+                # 奇数個のときは1つ残して、残りを半分にして上のレベルへ送る
+                carry = items[-1:] if len(items) % 2 else items[:0]
+                pairs = items[: len(items) - len(carry)]
+                promoted = pairs[self._parity[h] :: 2]
+                self._parity[h] ^= 1
+                self.levels[h] = carry
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                    self._parity.append(0)
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            h += 1
+
+    def _weighted_items(self) -> tuple[np.ndarray, np.ndarray]:
+        items = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [np.full(len(level), 2.0**h) for h, level in enumerate(self.levels)]
+        )
+        order = np.argsort(items, kind="stable")
+        return items[order], weights[order]
+
+    def quantile(self, q):
+        """
+        q（0〜1、配列も可）の分位点の近似値を返す。q=0 / 1 は正確な最小値・最大値。
+        """
+        q = np.asarray(q, dtype=np.float64)
+        if self.count == 0:
+            return np.full(q.shape, np.nan) if q.ndim else float("nan")
+        items, weights = self._weighted_items()
+        cum = np.cumsum(weights)
+        idx = np.searchsorted(cum, q * cum[-1], side="left")
+        result = items[np.clip(idx, 0, len(items) - 1)]
+        result = np.where(q <= 0, self.min, np.where(q >= 1, self.max, result))
+        return result if q.ndim else float(result)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else float("nan")
+
+    @property
+    def std(self) -> float:
+        """
+        母標準偏差（np.std と同じ ddof=0）。
+        """
+        if not self.count:
+            return float("nan")
+        var = self.total_sq / self.count - self.mean**2
+        return float(np.sqrt(max(var, 0.0)))
+
+    def box_stats(self, label: str = "", whis: float = 1.5) -> dict:
+        """
+        matplotlib の Axes.bxp に渡せる箱ひげ図の統計量を返す。
+        ひげは plt.boxplot と同じく [Q1 - whis*IQR, Q3 + whis*IQR] に入る最も外側の値
+        （スケッチが保持する値と最小値・最大値の中から選ぶ）。外れ値（fliers）は持たない。
+        """
+        q1, med, q3 = map(float, self.quantile([0.25, 0.5, 0.75]))
+        iqr = q3 - q1
+        items = np.concatenate([*self.levels, [self.min, self.max]])
+        lo = items[items >= q1 - whis * iqr]
+        hi = items[items <= q3 + whis * iqr]
+        return {
+            "label": label,
+            "med": med,
+            "q1": q1,
+            "q3": q3,
+            "whislo": float(lo.min()) if len(lo) else q1,
+            "whishi": float(hi.max()) if len(hi) else q3,
+            "mean": self.mean,
+            "fliers": np.empty(0),
+        }
+
+
+def sketches_by_bin(
+    x: np.ndarray,
+    values: np.ndarray,
+    edges,
+    k: int = DEFAULT_K,
+) -> list[QuantileSketch]:
+    """
+    x を edges で区切った区間ごとに values のスケッチを作る（len(edges) - 1 個、空の区間も含む）。
+    区間は np.histogram と同じく [edges[i], edges[i+1])（最後の区間のみ右端を含む）で、範囲外は捨てる。
+    """
+    edges = np.asarray(edges, dtype=np.float64)
+    n_bins = len(edges) - 1
+    idx = np.digitize(x, edges) - 1
+    idx[x == edges[-1]] = n_bins - 1
+    inside = (idx >= 0) & (idx < n_bins)
+    idx, values = idx[inside], np.asarray(values)[inside]
+    order = np.argsort(idx, kind="stable")
+    counts = np.bincount(idx, minlength=n_bins)
+    groups = np.split(values[order], np.cumsum(counts)[:-1])
+    return [QuantileSketch(k).update(g) for g in groups]
@@ -1,10 +1,27 @@
-import re
-from collections import Counter
+"""
+生存率（ゲームが progress まで続いた割合）の曲線を計算する。
+
+曲線は終了した progress ごとのゲーム数（np.bincount）の累積和から求める。
+PP（パーフェクトプレイヤ）の生存率は surv-diff 系で毎回使うため、プロセスごとに1回だけ計算する。
+"""
+
+from functools import cache
 from pathlib import Path
 
 import numpy as np
 
-from .common import GraphData, PlotData, PlayerData, tuple_sym_stage
+from . import curve_store
+from .common import (
+    GraphData,
+    PlotData,
+    PlayerData,
+    board_dir,
+    calc_mean_data,
+    gameover_source,
+    get_gameover_table,
+    tuple_sym_stage,
+)
+from .parallel import map_players
 
 
 def calc_survival_rate_data(
@@ -18,71 +35,69 @@ def calc_survival_rate_data(
         y_label="survival rate",
         data={pd.name: None for pd in player_data_list},
     )
-    for pd in player_data_list:
-        text = pd.state_file.read_text()
-        progress_text = re.findall(r"progress: (\d+)", text)
-        progresses = [int(progress) for progress in progress_text]
-
-        droped_counter = Counter(progresses)
-        max_value = len(progresses)
-        survival_rate = []
-
-        for i in range(max(progresses) + 10):
-            max_value -= droped_counter[i]
-            survival_rate.append(max_value / len(progresses))
-
-        result.data[pd.name] = GraphData(
-            x=list(range(len(survival_rate))),
-            y=survival_rate,
-        )
+    curves = map_players(_calc_survival_curve, player_data_list)
+    for pd, curve in zip(player_data_list, curves):
+        result.data[pd.name] = curve
     return result
 
 
-def _calc_survival_curve(pd: PlayerData) -> GraphData:
-    text = pd.state_file.read_text()
-    # progress_text = re.findall(r"progress: (\\d+)", text)
-    progress_text = re.findall(r"progress: (\d+)", text)
-    progresses = [int(progress) for progress in progress_text]
+pp_dir = board_dir / "PP"
+
+# 生存率の曲線は最大の progress からこの長さだけ余分に伸ばす（生存率0の部分）
+SURVIVAL_TAIL = 10
+
 
-    droped_counter = Counter(progresses)
-    max_value = len(progresses)
-    survival_rate = []
+def survival_rate(progresses, length: int | None = None) -> np.ndarray:
+    """
+    各ゲームの終了時の progress から、progress 0..length-1 の生存率を返す。
+    length を省略した場合は max(progresses) + SURVIVAL_TAIL。
+    """
+    progresses = np.asarray(progresses, dtype=np.int64)
+    if length is None:
+        length = int(progresses.max()) + SURVIVAL_TAIL
+    dropped = np.bincount(progresses, minlength=length)[:length]
+    return (len(progresses) - np.cumsum(dropped)) / len(progresses)
+
+
+@cache
+def pp_survival_rate(directory: Path = pp_dir) -> np.ndarray:
+    """
+    PP の生存率（プロセスごとに1回だけ読み込んで計算する）。
+    """
+    return survival_rate(get_gameover_table(directory).progress)
 
-    for i in range(max(progresses) + 10):
-        max_value -= droped_counter[i]
-        survival_rate.append(max_value / len(progresses))
 
+def calc_survival_curve(progresses) -> GraphData:
+    rate = survival_rate(progresses)
     return GraphData(
-        x=list(range(len(survival_rate))),
-        y=survival_rate,
+        x=list(range(len(rate))),
+        y=rate.tolist(),
+        count=[len(progresses)] * len(rate),
+    )
+
+
+def _calc_survival_curve(pd: PlayerData) -> GraphData:
+    return curve_store.load_or_compute(
+        pd,
+        "surv",
+        inputs=lambda: [gameover_source(pd.target_dir)],
+        compute=lambda: calc_survival_curve(pd.gameover_table().progress),
     )
 
 
 def calc_survival_mean_data(
     player_data_list: list[PlayerData],
+    n_boot: int = 0,
 ) -> PlotData:
     grouped: dict[tuple[int, str, int | None], list[GraphData]] = {}
+    targets = []
     for pd in player_data_list:
         info = tuple_sym_stage(pd)
         if info is None:
             continue
-        grouped.setdefault(info, []).append(_calc_survival_curve(pd))
+        targets.append((info, pd))
+    curves = map_players(_calc_survival_curve, [pd for _, pd in targets])
+    for (info, _), curve in zip(targets, curves):
+        grouped.setdefault(info, []).append(curve)
 
-    result = PlotData(
-        x_label="progress",
-        y_label="survival rate mean",
-        data={},
-    )
-    for (tuple_v, sym, stage), curves in grouped.items():
-        if not curves:
-            continue
-        min_len = min(len(c.x) for c in curves)
-        if min_len == 0:
-            continue
-        xs = [np.mean([c.x[i] for c in curves]) for i in range(min_len)]
-        ys = [np.mean([c.y[i] for c in curves]) for i in range(min_len)]
-        label = f"NT{tuple_v}_{sym}_mean"
-        if stage is not None:
-            label += f"_st{stage}"
-        result.data[label] = GraphData(x=xs, y=ys)
-    return result
+    return calc_mean_data(grouped, y_label="survival rate mean", n_boot=n_boot)
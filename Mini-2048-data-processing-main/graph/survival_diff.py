@@ -1,10 +1,18 @@
-import re
-from collections import Counter
 from pathlib import Path
 
 import numpy as np
 
-from .common import GraphData, PlotData, PlayerData, tuple_sym_stage
+from . import curve_store
+from .common import (
+    GraphData,
+    PlotData,
+    PlayerData,
+    calc_mean_data,
+    gameover_source,
+    tuple_sym_stage,
+)
+from .parallel import map_players
+from .survival import SURVIVAL_TAIL, pp_dir, pp_survival_rate, survival_rate
 
 
 def calc_survival_diff_rate_data(
@@ -13,132 +21,70 @@ def calc_survival_diff_rate_data(
     """
     パーフェクトプレイヤとの生存率の差をプロットする。
     """
-
-    pp_state_file = Path("board_data/PP/state.txt")
-    text = pp_state_file.read_text()
-    progress_text = re.findall(r"progress: (\d+)", text)
-    progresses = [int(progress) for progress in progress_text]
-
-    droped_counter = Counter(progresses)
-    max_value = len(progresses)
-    pp_survival_rate = []
-
-    result = PlotData(
+    # PP 自身は差が常に0なので除く
+    targets = [pd for pd in player_data_list if pd.target_dir.resolve() != pp_dir.resolve()]
+    curves = map_players(_calc_survival_diff_curve, targets)
+    return PlotData(
         x_label="progress",
         y_label="difference in survival rate for PP",
-        data={pd.name: None for pd in player_data_list},
+        data={pd.name: curve for pd, curve in zip(targets, curves)},
     )
 
-    for i in range(max(progresses) + 10):
-        max_value -= droped_counter[i]
-        pp_survival_rate.append(max_value / len(progresses))
-    # 上でパーフェクトプレイヤの生存率を計算したので、差を計算する
-
-    for pd in player_data_list:
-        state_file = pd.state_file
-        if state_file == pp_state_file:
-            continue
-        text = state_file.read_text()
-        progress_text = re.findall(r"progress: (\d+)", text)
-        progresses = [int(progress) for progress in progress_text]
-
-        if not progresses:
-            raise ValueError(f"{state_file} に progress がありません。state.txt を確認してください。")
-        if len(pp_survival_rate) < max(progresses) + 10:
-            raise ValueError(
-                f"PP生存率が短すぎます: pp_len={len(pp_survival_rate)}, "
-                f"needed={max(progresses) + 10}, state_file={state_file}"
-            )
-
-        droped_counter = Counter(progresses)
-        max_value = len(progresses)
-        diff_survival_rate = []
-
-        for i in range(max(progresses) + 10):
-            max_value -= droped_counter[i]
-            diff_survival_rate.append(
-                abs(max_value / len(progresses) - pp_survival_rate[i])
-            )
-
-        result.data[pd.name] = GraphData(
-            x=list(range(len(diff_survival_rate))),
-            y=diff_survival_rate,
-        )
-    return result
-
 
-def _calc_pp_survival_rate():
-    pp_state_file = Path("board_data/PP/state.txt")
-    text = pp_state_file.read_text()
-    # progress_text = re.findall(r"progress: (\\d+)", text)
-    progress_text = re.findall(r"progress: (\d+)", text)
-    progresses = [int(progress) for progress in progress_text]
-
-    droped_counter = Counter(progresses)
-    max_value = len(progresses)
-    pp_survival_rate = []
-    for i in range(max(progresses) + 10):
-        max_value -= droped_counter[i]
-        pp_survival_rate.append(max_value / len(progresses))
-    return pp_survival_rate
-
-
-def _calc_survival_diff_curve(pd: PlayerData, pp_survival_rate: list[float]) -> GraphData:
-    state_file = pd.state_file
-    text = state_file.read_text()
-    # progress_text = re.findall(r"progress: (\\d+)", text)
-    progress_text = re.findall(r"progress: (\d+)", text)
-    progresses = [int(progress) for progress in progress_text]
-
-    if not progresses:
+def calc_survival_diff_curve(
+    progresses,
+    pp_rate: np.ndarray,
+    state_file: Path,
+) -> GraphData:
+    progresses = np.asarray(progresses, dtype=np.int64)
+    if len(progresses) == 0:
         raise ValueError(f"{state_file} に progress がありません。state.txt を確認してください。")
-    if len(pp_survival_rate) < max(progresses) + 10:
-        raise ValueError(
-            f"PP生存率が短すぎます: pp_len={len(pp_survival_rate)}, "
-            f"needed={max(progresses) + 10}, state_file={state_file}"
-        )
+    length = int(progresses.max()) + SURVIVAL_TAIL
+    # PP の生存率は最後まで終わった後は0なので、足りない分は0で伸ばす
+    pp_rate = np.pad(pp_rate[:length], (0, max(0, length - len(pp_rate))))
+    diff = np.abs(survival_rate(progresses, length) - pp_rate)
+    return GraphData(
+        x=list(range(length)),
+        y=diff.tolist(),
+        count=[len(progresses)] * length,
+    )
 
-    droped_counter = Counter(progresses)
-    max_value = len(progresses)
-    diff_survival_rate = []
 
-    for i in range(max(progresses) + 10):
-        max_value -= droped_counter[i]
-        diff_survival_rate.append(
-            abs(max_value / len(progresses) - pp_survival_rate[i])
+def _calc_survival_diff_curve(pd: PlayerData) -> GraphData:
+    def compute() -> GraphData:
+        state_file = pd.state_file
+        return calc_survival_diff_curve(
+            pd.gameover_table().progress,
+            pp_survival_rate(),
+            state_file,
         )
-    return GraphData(
-        x=list(range(len(diff_survival_rate))),
-        y=diff_survival_rate,
+
+    return curve_store.load_or_compute(
+        pd,
+        "surv-diff",
+        inputs=lambda: [
+            gameover_source(pd.target_dir),
+            gameover_source(pp_dir),
+        ],
+        compute=compute,
     )
 
 
 def calc_survival_diff_mean_data(
     player_data_list: list[PlayerData],
+    n_boot: int = 0,
 ):
-    pp_survival_rate = _calc_pp_survival_rate()
     grouped: dict[tuple[int, str, int | None], list[GraphData]] = {}
+    targets = []
     for pd in player_data_list:
         info = tuple_sym_stage(pd)
         if info is None:
             continue
-        grouped.setdefault(info, []).append(_calc_survival_diff_curve(pd, pp_survival_rate))
+        targets.append((info, pd))
+    curves = map_players(_calc_survival_diff_curve, [pd for _, pd in targets])
+    for (info, _), curve in zip(targets, curves):
+        grouped.setdefault(info, []).append(curve)
 
-    result = PlotData(
-        x_label="progress",
-        y_label="difference in survival rate for PP mean",
-        data={},
+    return calc_mean_data(
+        grouped, y_label="difference in survival rate for PP mean", n_boot=n_boot
     )
-    for (tuple_v, sym, stage), curves in grouped.items():
-        if not curves:
-            continue
-        min_len = min(len(c.x) for c in curves)
-        if min_len == 0:
-            continue
-        xs = [np.mean([c.x[i] for c in curves]) for i in range(min_len)]
-        ys = [np.mean([c.y[i] for c in curves]) for i in range(min_len)]
-        label = f"NT{tuple_v}_{sym}_mean"
-        if stage is not None:
-            label += f"_st{stage}"
-        result.data[label] = GraphData(x=xs, y=ys)
-    return result
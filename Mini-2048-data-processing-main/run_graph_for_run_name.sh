@@ -32,7 +32,6 @@ STAGE=""
 TUPLES="4,6"
 SYM_LIST="sym,notsym"
 PARALLEL="$(nproc)"
-SPLIT_SYM=1
 
 while [[ $# -gt 0 ]]; do
   case "$1" in
@@ -56,13 +55,6 @@ if [[ -z "$RUN_NAME" || -z "$GRAPH" ]]; then
   echo "ERROR: --run-name and --graph are required." >&2
   exit 1
 fi
-if [[ "$GRAPH" == *"-mean" ]] || [[ "$GRAPH" == *"-mean-" ]] || [[ "$GRAPH" == "acc-mean-symdiff" ]]; then
-  COMBINE_SEEDS=1
-fi
-if [[ "$GRAPH" == "acc-mean-symdiff" || "$GRAPH" == "err-abs-mean-symdiff" || "$GRAPH" == "err-rel-mean-symdiff" || "$GRAPH" == "surv-mean-symdiff" || "$GRAPH" == "surv-symdiff" || "$GRAPH" == "evals-mean-symdiff" || "$GRAPH" == "scatter-symdiff" ]]; then
-  SPLIT_SYM=0
-fi
-
 if [[ -z "$OUTPUT_NAME" ]]; then
   OUTPUT_NAME="$GRAPH"
 fi
@@ -77,102 +69,18 @@ if [ ! -d "$RUN_DIR" ]; then
   exit 1
 fi
 
-EXT="${EXT#.}"
-IFS=',' read -r -a TUPLE_ARR <<< "$TUPLES"
-IFS=',' read -r -a SYM_ARR <<< "$SYM_LIST"
-
-JOBS=0
-
-run_graph() {
-  local tuple="$1"
-  local sym="$2"
-  local seed_tag="$3"
-  shift 3
-  local seed_args=("$@")
-
-  local out_dir="$OUT_BASE/$RUN_NAME/NT${tuple}/${GRAPH}"
-  if [ -n "$sym" ]; then
-    out_dir="$out_dir/${sym}"
-  fi
-  mkdir -p "$out_dir"
-
-  local output_file="${OUTPUT_NAME}.${EXT}"
-  if [ -n "$seed_tag" ]; then
-    output_file="${OUTPUT_NAME}_${seed_tag}.${EXT}"
-  fi
-  local run_name_regex
-  run_name_regex="$(python3 - <<'PY' "$RUN_NAME"
-import re
-import sys
-name = sys.argv[1]
-print("^" + re.escape(name) + "(/|$)")
-PY
-)"
-  local cmd=(uv run -m graph "$GRAPH" --recursive --intersection "$run_name_regex" \
-    --output "$output_file" --output-dir "$out_dir")
-  cmd+=(--tuple "$tuple")
-  if [ -n "$sym" ]; then
-    cmd+=(--sym "$sym")
-  fi
-  if [ -n "$STAGE" ]; then
-    cmd+=(--stage "$STAGE")
-  fi
-  if [ ${#seed_args[@]} -gt 0 ]; then
-    cmd+=("${seed_args[@]}")
-  fi
-
-  ( cd "$REPO" && "${cmd[@]}" )
-  echo "Saved: $out_dir (by --output-dir)"
-}
-
-spawn_job() {
-  run_graph "$@" &
-  JOBS=$((JOBS+1))
-  if [ "$JOBS" -ge "$PARALLEL" ]; then
-    wait -n
-    JOBS=$((JOBS-1))
-  fi
-}
-
+# seedのまとめ方（-mean 系）やsymの分け方（symdiff 系）は graph batch 側で判定する
+cmd=(uv run -m graph batch --run-name "$RUN_NAME" --graphs "$GRAPH" \
+  --output-name "$OUTPUT_NAME" --ext "$EXT" --output-base "$OUT_BASE" \
+  --tuples ${TUPLES//,/ } --syms ${SYM_LIST//,/ } --workers "$PARALLEL")
 if [ -n "$SEED_START" ] && [ -n "$SEED_END" ]; then
-  if [ "$COMBINE_SEEDS" -eq 1 ]; then
-    seed_args=(--seed)
-    for ((s=SEED_START; s<=SEED_END; s++)); do
-      seed_args+=("$s")
-    done
-    for tuple in "${TUPLE_ARR[@]}"; do
-      if [ "$SPLIT_SYM" -eq 1 ]; then
-        for sym in "${SYM_ARR[@]}"; do
-          spawn_job "$tuple" "$sym" "seed${SEED_START}-${SEED_END}" "${seed_args[@]}"
-        done
-      else
-        spawn_job "$tuple" "" "seed${SEED_START}-${SEED_END}" "${seed_args[@]}"
-      fi
-    done
-  else
-    for ((s=SEED_START; s<=SEED_END; s++)); do
-      seed_args=(--seed "$s")
-      for tuple in "${TUPLE_ARR[@]}"; do
-        if [ "$SPLIT_SYM" -eq 1 ]; then
-          for sym in "${SYM_ARR[@]}"; do
-            spawn_job "$tuple" "$sym" "seed${s}" "${seed_args[@]}"
-          done
-        else
-          spawn_job "$tuple" "" "seed${s}" "${seed_args[@]}"
-        fi
-      done
-    done
-  fi
-else
-  for tuple in "${TUPLE_ARR[@]}"; do
-    if [ "$SPLIT_SYM" -eq 1 ]; then
-      for sym in "${SYM_ARR[@]}"; do
-        spawn_job "$tuple" "$sym" ""
-      done
-    else
-      spawn_job "$tuple" "" ""
-    fi
-  done
+  cmd+=(--seed-ranges "${SEED_START}-${SEED_END}")
+fi
+if [ "$COMBINE_SEEDS" -eq 1 ]; then
+  cmd+=(--combine-seeds)
+fi
+if [ -n "$STAGE" ]; then
+  cmd+=(--stage "$STAGE")
 fi
 
-wait
+( cd "$REPO" && "${cmd[@]}" )
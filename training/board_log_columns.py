@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""Convert board_log.csv into packed NumPy columns.
+
+board_log.csv (written by logBoard in learning_ntuple_*.cpp) has one row per move:
+game_id,turn,score,tile0..tile8. This script splits the CSV into byte ranges at line
+boundaries and parses the ranges in a process pool. Each range is written as one
+partition of .npy columns:
+
+    board_log_npy/
+        meta.json            # source size / mtime, partitions and row counts
+        part-00000/game_id.npy  turn.npy  score.npy  code.npy
+        part-00001/...
+
+`code` packs the nine tiles into one uint64 in base 11, code = sum(tile_i * 11**i).
+This is the same as the identity term of to_index() in perfect_play.h, so one board
+compares as a single integer.
+
+canonical_codes() maps a board to the minimum code over its 8 rotations/reflections
+(sympos in 6tuples_sym.h), the same index as to_index() in perfect_play.h. The
+counting tools use it in --canonical mode to count boards up to symmetry.
+
+count_fixed_board.py, pattern_frequency.py and compare_tile_matches.py read these
+columns through load_partitions(). A CSV path given to them is converted on first use
+and reused while the CSV's size and mtime do not change.
+
+Usage:
+    python board_log_columns.py board_log.csv board_log_notsym.csv
+    python board_log_columns.py board_log.csv --output board_log_npy --jobs 8 --chunk-mib 128
+"""
+
+import argparse
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+N_TILES = 9
+N_FIELDS = 3 + N_TILES  # game_id, turn, score, tile0..tile8
+COLUMNS = ("game_id", "turn", "score", "code")
+COLUMN_DTYPES = {"game_id": np.int32, "turn": np.int32, "score": np.int32, "code": np.uint64}
+POW11 = np.uint64(11) ** np.arange(N_TILES, dtype=np.uint64)
+DEFAULT_CHUNK_BYTES = 64 << 20
+META_FILE = "meta.json"
+# Rows per block in canonical_codes (the (rows, 8, 9) gather is kept to a few tens of MiB)
+CANONICAL_BLOCK = 1 << 16
+
+# The 8 rotations/reflections of the 3x3 board (sympos in 6tuples_sym.h)
+SYMPOS = np.array([
+    [0, 1, 2, 3, 4, 5, 6, 7, 8],
+    [0, 3, 6, 1, 4, 7, 2, 5, 8],
+    [2, 1, 0, 5, 4, 3, 8, 7, 6],
+    [2, 5, 8, 1, 4, 7, 0, 3, 6],
+    [6, 7, 8, 3, 4, 5, 0, 1, 2],
+    [6, 3, 0, 7, 4, 1, 8, 5, 2],
+    [8, 7, 6, 5, 4, 3, 2, 1, 0],
+    [8, 5, 2, 7, 4, 1, 6, 3, 0],
+])
+
+# Row separators become field separators so a whole chunk parses in one np.fromstring call
+_TO_COMMA = bytes.maketrans(b"\r\n", b",,")
+
+
+def encode_tiles(tiles) -> np.ndarray:
+    """Pack (N, 9) tile exponents (0 = empty) into base-11 uint64 codes."""
+    tiles = np.asarray(tiles, dtype=np.uint64).reshape(-1, N_TILES)
+    return tiles @ POW11
+
+
+def encode_pattern(pattern) -> int:
+    """Pack a single 9-tile pattern (list of ints) into its base-11 code."""
+    return int(encode_tiles([pattern])[0])
+
+
+def decode_codes(codes) -> np.ndarray:
+    """Unpack base-11 codes into (N, 9) int8 tile exponents."""
+    codes = np.asarray(codes, dtype=np.uint64).reshape(-1, 1)
+    return ((codes // POW11) % np.uint64(11)).astype(np.int8)
+
+
+def symmetric_codes(codes) -> np.ndarray:
+    """(N, 8) codes of each board under the 8 symmetries in SYMPOS."""
+    tiles = decode_codes(codes)
+    return tiles[:, SYMPOS].astype(np.uint64) @ POW11
+
+
+def canonical_codes(codes, block: int = CANONICAL_BLOCK) -> np.ndarray:
+    """
+    Minimum code over the 8 symmetries of each board (to_index() in perfect_play.h).
+    Boards that differ only by rotation/reflection get the same code.
+    """
+    codes = np.asarray(codes, dtype=np.uint64).ravel()
+    out = np.empty(len(codes), dtype=np.uint64)
+    for start in range(0, len(codes), block):
+        out[start:start + block] = symmetric_codes(codes[start:start + block]).min(axis=1)
+    return out
+
+
+def packed_dir(csv_path: Path) -> Path:
+    """Default output directory for csv_path (board_log.csv -> board_log_npy)."""
+    return csv_path.with_name(csv_path.stem + "_npy")
+
+
+def _source_stamp(csv_path: Path) -> dict:
+    stat = csv_path.stat()
+    return {"source": csv_path.name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _chunk_ranges(csv_path: Path, chunk_bytes: int) -> list[tuple[int, int]]:
+    """Split the file after the header into byte ranges that end at a newline."""
+    size = csv_path.stat().st_size
+    ranges = []
+    with open(csv_path, "rb") as f:
+        f.readline()  # header
+        start = f.tell()
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parse_rows(buf: bytes, path: Path | str = "") -> np.ndarray:
+    """Parse complete CSV lines into an (N, 12) int64 array."""
+    text = buf.translate(_TO_COMMA).strip(b",")
+    while b",," in text:  # blank lines / CRLF
+        text = text.replace(b",,", b",")
+    if not text:
+        return np.empty((0, N_FIELDS), dtype=np.int64)
+    values = np.fromstring(text, dtype=np.int64, sep=",")
+    if len(values) % N_FIELDS:
+        raise ValueError(f"{path}: expected {N_FIELDS} fields per row")
+    return values.reshape(-1, N_FIELDS)
+
+
+def _convert_chunk(csv_path: Path, start: int, end: int, part_dir: Path) -> int:
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        rows = parse_rows(f.read(end - start), csv_path)
+    columns = {
+        "game_id": rows[:, 0],
+        "turn": rows[:, 1],
+        "score": rows[:, 2],
+        "code": encode_tiles(rows[:, 3:]),
+    }
+    part_dir.mkdir(parents=True, exist_ok=True)
+    for name, values in columns.items():
+        np.save(part_dir / f"{name}.npy", values.astype(COLUMN_DTYPES[name]))
+    return len(rows)
+
+
+def is_up_to_date(csv_path: Path, out_dir: Path) -> bool:
+    meta_path = out_dir / META_FILE
+    if not meta_path.exists():
+        return False
+    meta = json.loads(meta_path.read_text("utf-8"))
+    stamp = _source_stamp(csv_path)
+    return all(meta.get(key) == value for key, value in stamp.items())
+
+
+def convert(
+    csv_path: Path,
+    out_dir: Path | None = None,
+    jobs: int | None = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+) -> Path:
+    """Convert csv_path into partitioned .npy columns and return the output directory."""
+    csv_path = Path(csv_path)
+    out_dir = Path(out_dir) if out_dir else packed_dir(csv_path)
+    with open(csv_path, newline="") as f:
+        header = f.readline().strip().split(",")
+    expected = ["game_id", "turn", "score"] + [f"tile{i}" for i in range(N_TILES)]
+    if header != expected:
+        raise ValueError(f"{csv_path}: unexpected header {header}")
+
+    ranges = _chunk_ranges(csv_path, chunk_bytes)
+    # Write into a temporary directory and swap it in, so readers never see half a conversion
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    parts = [f"part-{i:05d}" for i in range(len(ranges))]
+    args = (
+        [csv_path] * len(ranges),
+        [start for start, _ in ranges],
+        [end for _, end in ranges],
+        [tmp_dir / part for part in parts],
+    )
+    n_workers = min(jobs or os.cpu_count() or 1, max(1, len(ranges)))
+    if n_workers <= 1:
+        rows = list(map(_convert_chunk, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            rows = list(executor.map(_convert_chunk, *args))
+
+    meta = {**_source_stamp(csv_path), "columns": list(COLUMNS), "parts": parts, "rows": rows}
+    (tmp_dir / META_FILE).write_text(json.dumps(meta, indent=2), "utf-8")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    tmp_dir.rename(out_dir)
+    return out_dir
+
+
+def ensure_packed(path: Path | str, jobs: int | None = None) -> Path:
+    """
+    Return the packed column directory for path.
+    path may be a packed directory or a CSV (converted unless an up-to-date copy exists).
+    """
+    path = Path(path)
+    if path.is_dir():
+        if not (path / META_FILE).exists():
+            raise FileNotFoundError(f"{path}: not a packed board log ({META_FILE} missing)")
+        return path
+    if not path.exists():
+        raise FileNotFoundError(f"File not found - {path}")
+    out_dir = packed_dir(path)
+    if not is_up_to_date(path, out_dir):
+        print(f"Converting {path} -> {out_dir}")
+        convert(path, out_dir, jobs)
+    return out_dir
+
+
+def load_partitions(
+    path: Path | str,
+    columns=COLUMNS,
+    jobs: int | None = None,
+) -> Iterator[dict[str, np.ndarray]]:
+    """Yield {column: array} per partition (memory-mapped), in file order."""
+    out_dir = ensure_packed(path, jobs)
+    meta = json.loads((out_dir / META_FILE).read_text("utf-8"))
+    for part in meta["parts"]:
+        yield {name: np.load(out_dir / part / f"{name}.npy", mmap_mode="r") for name in columns}
+
+
+def partition_files(path: Path | str, column: str, jobs: int | None = None) -> list[Path]:
+    """The .npy file of column in every partition, in file order (for worker processes)."""
+    out_dir = ensure_packed(path, jobs)
+    meta = json.loads((out_dir / META_FILE).read_text("utf-8"))
+    return [out_dir / part / f"{column}.npy" for part in meta["parts"]]
+
+
+def count_rows(path: Path | str, jobs: int | None = None) -> int:
+    out_dir = ensure_packed(path, jobs)
+    return sum(json.loads((out_dir / META_FILE).read_text("utf-8"))["rows"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Convert board_log.csv into partitioned .npy columns (game_id, turn, score, base-11 code)"
+    )
+    parser.add_argument("csv", nargs="+", type=Path, help="board_log CSV file(s)")
+    parser.add_argument("--output", "-o", type=Path,
+                        help="Output directory (default: <csv stem>_npy next to the CSV; only with one CSV)")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-mib", type=float, default=DEFAULT_CHUNK_BYTES / 2**20,
+                        help="CSV bytes per partition in MiB (default: 64)")
+    args = parser.parse_args()
+    if args.output and len(args.csv) > 1:
+        parser.error("--output can only be used with a single CSV")
+
+    chunk_bytes = max(1, int(args.chunk_mib * 2**20))
+    for csv_path in args.csv:
+        out_dir = convert(csv_path, args.output, args.jobs, chunk_bytes)
+        print(f"{csv_path} -> {out_dir} ({count_rows(out_dir):,} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,29 +4,48 @@
 The script reads two CSV files that contain columns named tile0..tile8.
 It counts how many times each complete tile pattern appears in both files
 and prints the top 10 patterns with the highest shared occurrence counts.
+Boards are read as base-11 codes from the packed columns (see
+board_log_columns.py); a CSV is converted on first use. With --canonical,
+boards that differ only by rotation/reflection are counted as one pattern
+(the minimum code over the 8 symmetries, as in perfect_play.h to_index).
+With --sketch-size, each log is summarized by a bounded-memory heavy-hitters
+sketch (topk_sketch.py) instead of exact counts, and every shared count is
+printed with its guaranteed range.
 
 Usage:
     # prev: python compare_tile_matches.py board_log.csv board_log_nosym.csv
     python compare_tile_matches.py board_log.csv board_log_notsym.csv
+    python compare_tile_matches.py board_log.csv board_log_notsym.csv --sketch-size 1000000 -j 8
 """
 
 import argparse
-import csv
-from collections import Counter
-from typing import Counter as CounterType, Iterable, Tuple
+from typing import Iterable, Tuple
+
+import numpy as np
+
+from board_log_columns import canonical_codes, decode_codes, load_partitions
+from topk_sketch import HeavyHitters, sketch_log
 
 TileState = Tuple[int, ...]
+PatternCounts = Tuple[np.ndarray, np.ndarray]  # (sorted unique codes, counts)
+
+
+def merge_counts(parts: Iterable[PatternCounts]) -> PatternCounts:
+    """Merge per-partition (codes, counts) into one sorted (codes, counts)."""
+    parts = list(parts)
+    if not parts:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+    codes, inverse = np.unique(np.concatenate([c for c, _ in parts]), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate([n for _, n in parts]), minlength=len(codes))
+    return codes, counts.astype(np.int64)
 
-def load_counts(path: str) -> CounterType[TileState]:
-    """Load tile counts from a CSV file."""
-    counter: CounterType[TileState] = Counter()
-    with open(path, newline="") as f:
-        reader = csv.DictReader(f)
-        tile_fields = [f"tile{i}" for i in range(9)]
-        for row in reader:
-            state = tuple(int(row[field]) for field in tile_fields)
-            counter[state] += 1
-    return counter
+
+def load_counts(path: str, jobs: int | None = None, canonical: bool = False) -> PatternCounts:
+    """Load tile pattern counts from a CSV file (or its packed column directory)."""
+    return merge_counts(
+        np.unique(canonical_codes(part["code"]) if canonical else part["code"], return_counts=True)
+        for part in load_partitions(path, columns=("code",), jobs=jobs)
+    )
 
 
 def format_state(state: TileState) -> str:
@@ -34,28 +53,85 @@ def format_state(state: TileState) -> str:
     return ",".join(str(v) for v in state)
 
 
-def find_matches(counts_a: CounterType[TileState], counts_b: CounterType[TileState], top_n: int = 10) -> Iterable[Tuple[TileState, int]]:
-    """Yield the top shared patterns sorted by shared count descending."""
-    shared_states = counts_a.keys() & counts_b.keys()
-    matches = []
-    for state in shared_states:
-        matches.append((state, min(counts_a[state], counts_b[state])))
-    matches.sort(key=lambda item: item[1], reverse=True)
-    return matches[:top_n]
+def find_matches(counts_a: PatternCounts, counts_b: PatternCounts, top_n: int = 10) -> Iterable[Tuple[TileState, int]]:
+    """Return the top shared patterns sorted by shared count descending."""
+    shared, idx_a, idx_b = np.intersect1d(counts_a[0], counts_b[0], assume_unique=True, return_indices=True)
+    shared_counts = np.minimum(counts_a[1][idx_a], counts_b[1][idx_b])
+    order = np.argsort(-shared_counts, kind="stable")[:top_n]
+    states = decode_codes(shared[order])
+    return [(tuple(int(v) for v in state), int(count)) for state, count in zip(states, shared_counts[order])]
+
+
+def _shared_bounds(sketch_a: HeavyHitters, sketch_b: HeavyHitters) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return (codes, lower, upper) of patterns kept by both sketches, sorted by the lower bound descending."""
+    shared = np.intersect1d(sketch_a.keys, sketch_b.keys, assume_unique=True)
+    lower = np.minimum(sketch_a.lower(shared), sketch_b.lower(shared))
+    upper = np.minimum(sketch_a.upper(shared), sketch_b.upper(shared))
+    order = np.argsort(-lower, kind="stable")
+    return shared[order], lower[order], upper[order]
+
+
+def find_sketch_matches(
+    sketch_a: HeavyHitters,
+    sketch_b: HeavyHitters,
+    top_n: int = 10,
+) -> Iterable[Tuple[TileState, int, int]]:
+    """
+    Return the top shared patterns as (state, lower, upper) sorted by the lower bound.
+    The true shared count lies in [lower, upper].
+    """
+    shared, lower, upper = (a[:top_n] for a in _shared_bounds(sketch_a, sketch_b))
+    states = decode_codes(shared)
+    return [
+        (tuple(int(v) for v in state), int(lo), int(hi))
+        for state, lo, hi in zip(states, lower, upper)
+    ]
+
+
+def unlisted_bound(sketch_a: HeavyHitters, sketch_b: HeavyHitters, top_n: int = 10) -> int:
+    """
+    Return an upper bound on the shared count of every pattern not in find_sketch_matches.
+    A pattern missing from a sketch occurs at most that sketch's error times in its log;
+    a pattern kept by both sketches but ranked below top_n is bounded by its own upper bound.
+    """
+    bound = max(sketch_a.error, sketch_b.error)
+    _, _, upper = _shared_bounds(sketch_a, sketch_b)
+    if len(upper) > top_n:
+        bound = max(bound, upper[top_n:].max())
+    return int(bound)
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Count matching tile patterns across two CSV logs")
-    parser.add_argument("csv_a", help="First CSV file (expects tile0..tile8 columns)")
-    parser.add_argument("csv_b", help="Second CSV file (expects tile0..tile8 columns)")
+    parser.add_argument("csv_a", help="First CSV file (expects tile0..tile8 columns) or its packed column directory")
+    parser.add_argument("csv_b", help="Second CSV file (expects tile0..tile8 columns) or its packed column directory")
     parser.add_argument("--top", type=int, default=10, help="Number of patterns to show (default: 10)")
+    parser.add_argument("--canonical", action="store_true", help="Count boards up to rotation/reflection")
+    parser.add_argument("--sketch-size", type=int, default=None,
+                        help="Use a heavy-hitters sketch with this many counters per log (fixed memory) instead of exact counts")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Worker processes for converting a CSV / sketching (default: CPU count)")
     args = parser.parse_args()
 
-    counts_a = load_counts(args.csv_a)
-    counts_b = load_counts(args.csv_b)
+    if args.sketch_size:
+        sketch_a = sketch_log(args.csv_a, args.sketch_size, args.jobs, args.canonical)
+        sketch_b = sketch_log(args.csv_b, args.sketch_size, args.jobs, args.canonical)
+        for path, sketch in ((args.csv_a, sketch_a), (args.csv_b, sketch_b)):
+            print(f"Sketched {sketch.n} rows from {path}: {len(sketch)} counters, error <= {sketch.error:.1f}")
+        matches = find_sketch_matches(sketch_a, sketch_b, args.top)
+        if not matches:
+            print("No matching patterns found.")
+            return
+        print("\nTop matching patterns (pattern -> shared count [lower, upper]):")
+        for idx, (state, lower, upper) in enumerate(matches, start=1):
+            print(f"{idx:2d}: [{format_state(state)}] -> [{lower}, {upper}]")
+        print(f"Unlisted patterns have a shared count <= {unlisted_bound(sketch_a, sketch_b, args.top)}")
+        return
+
+    counts_a = load_counts(args.csv_a, args.jobs, args.canonical)
+    counts_b = load_counts(args.csv_b, args.jobs, args.canonical)
 
-    print(f"Loaded {len(counts_a)} unique patterns from {args.csv_a}")
-    print(f"Loaded {len(counts_b)} unique patterns from {args.csv_b}")
+    print(f"Loaded {len(counts_a[0])} unique patterns from {args.csv_a}")
+    print(f"Loaded {len(counts_b[0])} unique patterns from {args.csv_b}")
 
     matches = find_matches(counts_a, counts_b, args.top)
     if not matches:
@@ -2,41 +2,53 @@
 """Count occurrences of FIXED_BOARD pattern in board log CSV files.
 
 FIXED_BOARD = {0, 1, 2, 0, 0, 1, 0, 0, 0}
+
+Other patterns (with "*" / ">=k" wildcard cells, see pattern_query.py) can be
+given with --pattern; all of them are counted in one pass per log. --canonical
+counts boards up to rotation/reflection. The logs are read as packed columns
+(see board_log_columns.py); a CSV is converted on first use.
 """
 
-import csv
 import argparse
 
+from pattern_query import count_patterns, parse_pattern
+
 
 # FIXED_BOARD pattern from the C++ code
 FIXED_BOARD = [0, 1, 2, 0, 0, 1, 0, 0, 0]
 
 
-def count_fixed_board_pattern(filepath):
-    """Count how many times FIXED_BOARD pattern appears in the CSV file."""
-    total_rows = 0
-    matching_rows = 0
-    
+def count_board_patterns(filepath, patterns, jobs=None, canonical=False):
+    """Count how many times each pattern appears in the CSV file (one pass)."""
     try:
-        with open(filepath, newline='') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                total_rows += 1
-                # Extract tile values
-                tiles = [int(row[f'tile{i}']) for i in range(9)]
-                
-                # Check if it matches FIXED_BOARD
-                if tiles == FIXED_BOARD:
-                    matching_rows += 1
-                    
+        result = count_patterns(filepath, patterns, by='all', jobs=jobs, canonical=canonical)
     except FileNotFoundError:
         print(f"Error: File not found - {filepath}")
         return None, None
     except Exception as e:
         print(f"Error reading {filepath}: {e}")
         return None, None
-    
-    return matching_rows, total_rows
+
+    return result.counts.sum(axis=1).tolist(), int(result.rows.sum())
+
+
+def count_fixed_board_pattern(filepath, jobs=None, canonical=False):
+    """Count how many times FIXED_BOARD pattern appears in the CSV file."""
+    pattern = parse_pattern(",".join(map(str, FIXED_BOARD)))
+    matches, total_rows = count_board_patterns(filepath, [pattern], jobs, canonical)
+    if matches is None:
+        return None, None
+    return matches[0], total_rows
+
+
+def print_matches(title, path, name, matches, total):
+    print(f"\n{title} ({path}):")
+    print(f"  Total rows: {total:,}")
+    print(f"  {name} matches: {matches:,}")
+    if total > 0:
+        rate = (matches / total) * 100
+        print(f"  Occurrence rate: {rate:.6f}%")
+        print(f"  Ratio: 1 in {total / matches:.2f}" if matches > 0 else "  Ratio: N/A (no matches)")
 
 
 def main():
@@ -44,49 +56,48 @@ def main():
         description='Count FIXED_BOARD pattern occurrences in board log CSV files'
     )
     parser.add_argument('--sym', default='board_log.csv',
-                        help='Path to symmetric board log CSV')
+                        help='Path to symmetric board log CSV (or its packed column directory)')
     # prev default: board_log_nosym.csv
     parser.add_argument('--nosym', default='board_log_notsym.csv',
-                        help='Path to non-symmetric board log CSV')
+                        help='Path to non-symmetric board log CSV (or its packed column directory)')
+    parser.add_argument('--pattern', '-p', action='append', type=parse_pattern, default=[],
+                        help='Pattern to count instead of FIXED_BOARD (repeatable), e.g. "0,1,>=2,*,0,1,0,0,0"')
+    parser.add_argument('--canonical', action='store_true',
+                        help='Count boards up to rotation/reflection (any of the 8 symmetric variants matches)')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Worker processes for converting a CSV (default: CPU count)')
     args = parser.parse_args()
-    
-    print("=" * 60)
-    print(f"FIXED_BOARD Pattern: {FIXED_BOARD}")
-    print("=" * 60)
-    
-    # Analyze symmetric version
-    sym_matches, sym_total = count_fixed_board_pattern(args.sym)
-    
-    # Analyze non-symmetric version
-    nosym_matches, nosym_total = count_fixed_board_pattern(args.nosym)
-    
-    # Display results
-    if sym_matches is not None:
-        print(f"\nSymmetric version ({args.sym}):")
-        print(f"  Total rows: {sym_total:,}")
-        print(f"  FIXED_BOARD matches: {sym_matches:,}")
-        if sym_total > 0:
-            rate = (sym_matches / sym_total) * 100
-            print(f"  Occurrence rate: {rate:.6f}%")
-            print(f"  Ratio: 1 in {sym_total / sym_matches:.2f}" if sym_matches > 0 else "  Ratio: N/A (no matches)")
-    
-    if nosym_matches is not None:
-        print(f"\nNon-symmetric version ({args.nosym}):")
-        print(f"  Total rows: {nosym_total:,}")
-        print(f"  FIXED_BOARD matches: {nosym_matches:,}")
-        if nosym_total > 0:
-            rate = (nosym_matches / nosym_total) * 100
-            print(f"  Occurrence rate: {rate:.6f}%")
-            print(f"  Ratio: 1 in {nosym_total / nosym_matches:.2f}" if nosym_matches > 0 else "  Ratio: N/A (no matches)")
-    
-    # Comparison
-    if sym_matches is not None and nosym_matches is not None:
-        print(f"\n{'─' * 60}")
-        print("Comparison:")
-        if sym_matches > 0 and nosym_matches > 0:
-            ratio = sym_matches / nosym_matches
-        print(f"  Matches ratio (sym/notsym): {ratio:.4f}")
+
+    patterns = args.pattern or [parse_pattern(",".join(map(str, FIXED_BOARD)))]
+    sym_matches, sym_total = count_board_patterns(args.sym, patterns, args.jobs, args.canonical)
+    nosym_matches, nosym_total = count_board_patterns(args.nosym, patterns, args.jobs, args.canonical)
+
+    for i, pattern in enumerate(patterns):
+        name = 'FIXED_BOARD' if not args.pattern else 'Pattern'
         print("=" * 60)
+        if args.pattern:
+            print(f"Pattern: [{pattern.text}]")
+        else:
+            print(f"FIXED_BOARD Pattern: {FIXED_BOARD}")
+        if args.canonical:
+            print("(counted up to rotation/reflection)")
+        print("=" * 60)
+
+        # Display results
+        if sym_matches is not None:
+            print_matches("Symmetric version", args.sym, name, sym_matches[i], sym_total)
+        if nosym_matches is not None:
+            print_matches("Non-symmetric version", args.nosym, name, nosym_matches[i], nosym_total)
+
+        # Comparison
+        if sym_matches is not None and nosym_matches is not None:
+            print(f"\n{'─' * 60}")
+            print("Comparison:")
+            if nosym_matches[i] > 0:
+                print(f"  Matches ratio (sym/notsym): {sym_matches[i] / nosym_matches[i]:.4f}")
+            else:
+                print("  Matches ratio (sym/notsym): N/A (no notsym matches)")
+            print("=" * 60)
 
 
 if __name__ == '__main__':
@@ -1,56 +1,41 @@
 import argparse
 import csv
-import re
 from pathlib import Path
 
+from score_series import BlockStats, ScoreSeries, block_stats, block_stats_multi, load_score_series
 
-def parse_scores(filepath: Path) -> dict[int, int]:
-    pattern = re.compile(r"game\s+(\d+)\s+finished\s+with\s+score\s+(\d+)")
-    scores = {}
-    with filepath.open("r", encoding="utf-8") as f:
-        for line in f:
-            match = pattern.search(line)
-            if match:
-                game_id = int(match.group(1))
-                score = int(match.group(2))
-                scores[game_id] = score
-    return scores
 
+def parse_scores(filepath: Path) -> ScoreSeries:
+    return load_score_series(filepath)
 
-def calculate_averages(scores: dict[int, int], avescope: int) -> list[tuple[int, int, float, int]]:
-    if not scores:
-        return []
 
-    max_game_id = max(scores.keys())
-    results = []
+def calculate_averages(scores: ScoreSeries, avescope: int) -> list[tuple[int, int, float, int]]:
+    stats = block_stats(scores, avescope)
+    return list(zip(stats.start.tolist(), stats.end.tolist(), stats.mean.tolist(), stats.count.tolist()))
 
-    current_sum = 0
-    current_count = 0
-    start_game = 1
 
-    for game_id in range(1, max_game_id + 1):
-        if game_id in scores:
-            current_sum += scores[game_id]
-            current_count += 1
-
-        if game_id % avescope == 0:
-            if current_count > 0:
-                avg = current_sum / current_count
-                results.append((start_game, game_id, avg, current_count))
-            start_game = game_id + 1
-            current_sum = 0
-            current_count = 0
-
-    return results
-
-
-def write_csv(rows: list[tuple[int, int, float, int]], output: Path) -> None:
+def write_csv(stats: BlockStats, output: Path) -> None:
     output.parent.mkdir(parents=True, exist_ok=True)
     with output.open("w", encoding="utf-8", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow(["start_game", "end_game", "avg_score", "count"])
-        for start, end, avg, count in rows:
-            writer.writerow([start, end, f"{avg:.6f}", count])
+        writer.writerow(["start_game", "end_game", "avg_score", "count", "sd_score", "min_score", "max_score"])
+        for start, end, avg, count, sd, lo, hi in zip(
+            stats.start.tolist(),
+            stats.end.tolist(),
+            stats.mean.tolist(),
+            stats.count.tolist(),
+            stats.sd.tolist(),
+            stats.min.tolist(),
+            stats.max.tolist(),
+        ):
+            writer.writerow([start, end, f"{avg:.6f}", count, f"{sd:.6f}", int(lo), int(hi)])
+
+
+def output_path_for(output: Path, avescope: int, n_avescopes: int) -> Path:
+    """With several avescopes, write one CSV per avescope (<stem>_a<avescope><suffix>)."""
+    if n_avescopes == 1:
+        return output
+    return output.with_name(f"{output.stem}_a{avescope}{output.suffix}")
 
 
 def main() -> None:
@@ -63,20 +48,23 @@ def main() -> None:
         "--avescope",
         "-a",
         type=int,
-        default=1000,
-        help="Averaging interval (default: 1000)",
+        nargs="+",
+        default=[1000],
+        help="Averaging interval(s) (default: 1000). Several values are computed from one read of the log, "
+        "one CSV each (<output stem>_a<avescope>.csv)",
     )
     args = parser.parse_args()
 
     input_path = Path(args.input)
     output_path = Path(args.output)
-    scores = parse_scores(input_path)
-    rows = calculate_averages(scores, args.avescope)
-    write_csv(rows, output_path)
-
-    print(f"wrote: {output_path}")
-    print(f"games: {len(scores)}")
-    print(f"rows: {len(rows)}")
+    series = parse_scores(input_path)
+    for avescope, stats in block_stats_multi(series, args.avescope).items():
+        out = output_path_for(output_path, avescope, len(args.avescope))
+        write_csv(stats, out)
+
+        print(f"wrote: {out}")
+        print(f"games: {len(series)}")
+        print(f"rows: {len(stats)}")
 
 
 if __name__ == "__main__":
@@ -1,85 +1,83 @@
-import csv
 import matplotlib.pyplot as plt
-from collections import defaultdict
 import argparse
 
+import pattern_query
+from pattern_query import count_patterns, tidy_rows, write_tidy
+
 # デフォルトのタイルパターン
 DEFAULT_PATTERN = [0, 1, 2, 0, 0, 1, 0, 0, 0]
 
+# 集計単位ごとのX軸ラベルと単位
+GROUP_LABELS = {'game': ('Game ID Range', 'Games'), 'turn': ('Turn Range', 'Turns'), 'score': ('Score Range', 'Score')}
+
 def parse_pattern(pattern_str):
-    """カンマ区切りの文字列をint配列に変換"""
+    """カンマ区切りの文字列をPatternに変換（"*" で任意、">=k" でk以上のタイル）"""
     try:
-        pattern = [int(x.strip()) for x in pattern_str.split(',')]
-        if len(pattern) != 9:
-            raise ValueError(f"Pattern must have exactly 9 elements, got {len(pattern)}")
-        return pattern
+        return pattern_query.parse_pattern(pattern_str)
     except ValueError as e:
         raise argparse.ArgumentTypeError(f"Invalid pattern format: {e}")
 
-def count_pattern_matches(filepath, pattern):
-    """CSVからパターン一致を1000ゲーム単位でカウント"""
-    counts = defaultdict(int)  # {グループ番号: 出現回数}
-    
-    with open(filepath, newline='') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            game_id = int(row['game_id'])
-            tiles = [int(row[f'tile{i}']) for i in range(9)]
-            
-            if tiles == pattern:
-                group = (game_id - 1) // 1000  # 1-1000 → 0, 1001-2000 → 1, ...
-                counts[group] += 1
-    
-    return counts
+def count_pattern_matches(filepath, pattern, group_size=1000, jobs=None, canonical=False):
+    """パック済みの列（CSVなら初回に変換）からパターン一致をgroup_sizeゲーム単位でカウント"""
+    if not isinstance(pattern, pattern_query.Pattern):
+        pattern = parse_pattern(",".join(map(str, pattern)))
+    result = count_patterns(filepath, [pattern], 'game', group_size, jobs, canonical)
+    return {g: int(c) for g, c in enumerate(result.counts[0]) if c}  # {グループ番号: 出現回数}
 
-def plot_frequency(sym_csv, nosym_csv, pattern, output, games_per_group):
-    """両CSVのパターン出現頻度を比較するグラフを作成"""
-    
-    print(f"Tracking pattern: {pattern}")
-    print(f"Games per group: {games_per_group}")
+def plot_frequency(sym_csv, nosym_csv, patterns, output, group_size, jobs=None, by='game', table=None,
+                   canonical=False):
+    """
+    両CSVのパターン出現頻度を比較するグラフを作成（全パターンを各CSVにつき1回の走査で数える）
+    canonical なら回転・反転で一致する盤面も数える
+    """
     
-    # カウント関数をグループサイズに対応させる
-    def count_with_group_size(filepath, pattern, group_size):
-        counts = defaultdict(int)
-        with open(filepath, newline='') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                game_id = int(row['game_id'])
-                tiles = [int(row[f'tile{i}']) for i in range(9)]
-                
-                if tiles == pattern:
-                    group = (game_id - 1) // group_size
-                    counts[group] += 1
-        return counts
+    for pattern in patterns:
+        print(f"Tracking pattern: [{pattern.text}]")
+    print(f"{GROUP_LABELS[by][1]} per group: {group_size}")
     
     # 各CSVからカウント
-    sym_counts = count_with_group_size(sym_csv, pattern, games_per_group)
-    nosym_counts = count_with_group_size(nosym_csv, pattern, games_per_group)
+    sym_result = count_patterns(sym_csv, patterns, by, group_size, jobs, canonical)
+    nosym_result = count_patterns(nosym_csv, patterns, by, group_size, jobs, canonical)
+    
+    if table:
+        with open(table, 'w', newline='') as f:
+            write_tidy([*tidy_rows(sym_csv, sym_result), *tidy_rows(nosym_csv, nosym_result)], f)
+        print(f"Table saved to: {table}")
     
     # グループ番号の範囲を取得
-    all_groups = set(sym_counts.keys()) | set(nosym_counts.keys())
-    if not all_groups:
+    if not sym_result.counts.any() and not nosym_result.counts.any():
         print("No matches found in either file.")
         return
     
-    max_group = max(all_groups)
-    groups = list(range(max_group + 1))
-    
-    # 各グループの値を取得（存在しない場合は0）
-    sym_values = [sym_counts.get(g, 0) for g in groups]
-    nosym_values = [nosym_counts.get(g, 0) for g in groups]
+    n_groups = max(sym_result.n_groups, nosym_result.n_groups)
+    groups = list(range(n_groups))
     
     # X軸ラベル
-    x_labels = [f"{g*games_per_group+1}-{(g+1)*games_per_group}" for g in groups]
+    x_labels = ["{}-{}".format(*sym_result.group_range(g)) for g in groups]
     
     # グラフ作成
     plt.figure(figsize=(14, 6))
-    plt.plot(groups, sym_values, 'b-o', label='Symmetric', markersize=4, alpha=0.7)
-    plt.plot(groups, nosym_values, 'r-s', label='Non-symmetric', markersize=4, alpha=0.7)
-    
-    plt.xlabel('Game ID Range')
+    for i, pattern in enumerate(patterns):
+        # 各グループの値を取得（存在しない場合は0）
+        sym_values = [int(sym_result.counts[i, g]) if g < sym_result.n_groups else 0 for g in groups]
+        nosym_values = [int(nosym_result.counts[i, g]) if g < nosym_result.n_groups else 0 for g in groups]
+        if len(patterns) == 1:
+            plt.plot(groups, sym_values, 'b-o', label='Symmetric', markersize=4, alpha=0.7)
+            plt.plot(groups, nosym_values, 'r-s', label='Non-symmetric', markersize=4, alpha=0.7)
+        else:
+            # パターンごとに色を変え、sym は実線、notsym は破線
+            (line,) = plt.plot(groups, sym_values, '-o', label=f'Symmetric [{pattern.text}]', markersize=4, alpha=0.7)
+            plt.plot(groups, nosym_values, '--s', color=line.get_color(),
+                     label=f'Non-symmetric [{pattern.text}]', markersize=4, alpha=0.7)
+        print(f"[{pattern.text}] Sym total matches: {sum(sym_values)}")
+        print(f"[{pattern.text}] Notsym total matches: {sum(nosym_values)}")
+    
+    plt.xlabel(GROUP_LABELS[by][0])
     plt.ylabel('Pattern Match Count')
-    plt.title(f'Pattern {pattern} Frequency per {games_per_group} Games')
+    if len(patterns) == 1:
+        plt.title(f'Pattern [{patterns[0].text}] Frequency per {group_size} {GROUP_LABELS[by][1]}')
+    else:
+        plt.title(f'Frequency of {len(patterns)} Patterns per {group_size} {GROUP_LABELS[by][1]}')
     plt.legend()
     plt.grid(True, alpha=0.3)
     
@@ -92,8 +90,6 @@ def plot_frequency(sym_csv, nosym_csv, pattern, output, games_per_group):
     plt.close()
     
     print(f"Graph saved to: {output}")
-    print(f"Sym total matches: {sum(sym_values)}")
-    print(f"Notsym total matches: {sum(nosym_values)}")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -111,6 +107,10 @@ Examples:
   # 500ゲーム単位で集計
   python pattern_frequency.py --group-size 500
 
+  # 複数のパターン（"*" は任意、">=k" はk以上のタイル）をスコア帯ごとに集計し、表も書き出す
+  python pattern_frequency.py -p "0,1,2,0,0,1,0,0,0" -p ">=5,*,*,*,*,*,*,*,*" \\
+      --by score --group-size 500 --table pattern_counts.csv
+
   # すべてのオプションを指定
   # prev: python pattern_frequency.py --sym board_log.csv --nosym board_log_nosym.csv \\
   python pattern_frequency.py --sym board_log.csv --nosym board_log_notsym.csv \\
@@ -119,23 +119,38 @@ Examples:
     )
     
     parser.add_argument('--sym', default='board_log.csv',
-                        help='Symmetric version CSV (default: board_log.csv)')
+                        help='Symmetric version CSV or packed column directory (default: board_log.csv)')
     # prev default: board_log_nosym.csv
     parser.add_argument('--nosym', default='board_log_notsym.csv',
-                        help='Non-symmetric version CSV (default: board_log_notsym.csv)')
-    parser.add_argument('--pattern', '-p', type=parse_pattern, default=None,
-                        help='Tile pattern to track as comma-separated values (e.g., "0,1,2,0,0,1,0,0,0")')
-    parser.add_argument('--group-size', '-g', type=int, default=1000,
-                        help='Number of games per group (default: 1000)')
+                        help='Non-symmetric version CSV or packed column directory (default: board_log_notsym.csv)')
+    parser.add_argument('--pattern', '-p', action='append', type=parse_pattern, default=[],
+                        help='Tile pattern to track as comma-separated values (e.g., "0,1,2,0,0,1,0,0,0"; '
+                             '"*" = any, ">=k" = tile k or more; repeatable)')
+    parser.add_argument('--patterns-file', help='File with one pattern per line')
+    parser.add_argument('--by', choices=('game', 'turn', 'score'), default='game',
+                        help='Group by game-id window, turn bin or score band (default: game)')
+    parser.add_argument('--group-size', '-g', type=int, default=None,
+                        help='Number of games / turns / score points per group (default: game 1000, turn 10, score 1000)')
+    parser.add_argument('--table', help='Also write the counts as a tidy CSV')
+    parser.add_argument('--canonical', action='store_true',
+                        help='Count boards up to rotation/reflection (any of the 8 symmetric variants matches)')
     parser.add_argument('--output', '-o', default='pattern_frequency.png',
                         help='Output PNG file (default: pattern_frequency.png)')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Worker processes for converting a CSV (default: CPU count)')
     
     args = parser.parse_args()
     
     # パターンが指定されていなければデフォルトを使用
-    pattern = args.pattern if args.pattern is not None else DEFAULT_PATTERN
-    
-    plot_frequency(args.sym, args.nosym, pattern, args.output, args.group_size)
+    patterns = list(args.pattern)
+    if args.patterns_file:
+        patterns += pattern_query.read_patterns_file(args.patterns_file)
+    if not patterns:
+        patterns = [parse_pattern(",".join(map(str, DEFAULT_PATTERN)))]
+    group_size = args.group_size or pattern_query.DEFAULT_GROUP_SIZES[args.by]
+    
+    plot_frequency(args.sym, args.nosym, patterns, args.output, group_size, args.jobs, args.by, args.table,
+                   args.canonical)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""Count many tile patterns in board logs in one pass over the packed columns.
+
+A pattern is nine comma-separated cells (tile0..tile8). Each cell is one of:
+
+    3        the tile exponent is exactly 3 (0 = empty)
+    >=3, 3+  the tile exponent is at least 3
+    *, any   any tile
+
+Patterns without wildcards are matched against the base-11 codes with np.isin.
+Patterns with wildcards are matched with masked comparisons on the decoded tiles.
+Every pattern is counted in the same scan over each partition (see
+board_log_columns.py). With --canonical, boards are counted up to symmetry: a
+pattern matches a board if it matches any of the board's 8 rotations/reflections
+(sympos). Counts are grouped by game-id window, turn bin or score band, and are
+written as a tidy table:
+
+    log,pattern,by,group,group_start,group_end,count,rows
+
+`rows` is the number of moves in the group, so count / rows is the occurrence rate.
+
+Usage:
+    python pattern_query.py board_log.csv board_log_notsym.csv \\
+        -p "0,1,2,0,0,1,0,0,0" -p ">=5,*,*,*,*,*,*,*,*" --by game --group-size 1000
+    python pattern_query.py board_log_npy --patterns-file patterns.txt --by score \\
+        --group-size 500 -o pattern_counts.csv
+"""
+
+import argparse
+import csv
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+from board_log_columns import (
+    N_TILES,
+    SYMPOS,
+    canonical_codes,
+    decode_codes,
+    encode_pattern,
+    load_partitions,
+)
+
+MAX_TILE = 10  # base 11
+GROUP_BY = ("game", "turn", "score", "all")
+DEFAULT_GROUP_SIZES = {"game": 1000, "turn": 10, "score": 1000, "all": 1}
+ANY_CELLS = ("*", "?", "any")
+
+
+@dataclass(frozen=True)
+class Pattern:
+    text: str
+    lo: tuple[int, ...]  # per-cell lower bound of the tile exponent
+    hi: tuple[int, ...]  # per-cell upper bound of the tile exponent
+
+    @property
+    def is_exact(self) -> bool:
+        return self.lo == self.hi
+
+    @property
+    def code(self) -> int:
+        return encode_pattern(self.lo)
+
+    def variants(self) -> list["Pattern"]:
+        """The distinct patterns obtained by the 8 symmetries in SYMPOS."""
+        found = {}
+        for perm in SYMPOS:
+            lo = tuple(self.lo[j] for j in perm)
+            hi = tuple(self.hi[j] for j in perm)
+            found.setdefault((lo, hi), Pattern(self.text, lo, hi))
+        return list(found.values())
+
+
+def parse_pattern(pattern_str: str) -> Pattern:
+    """Parse "0,1,>=2,*,..." into a Pattern."""
+    cells = [c.strip().lower() for c in pattern_str.split(",")]
+    if len(cells) != N_TILES:
+        raise ValueError(f"Pattern must have exactly {N_TILES} elements, got {len(cells)}")
+    lo, hi = [], []
+    for cell in cells:
+        if cell in ANY_CELLS:
+            lo.append(0)
+            hi.append(MAX_TILE)
+            continue
+        at_least = cell.startswith(">=") or cell.endswith("+")
+        value = int(cell.removeprefix(">=").removesuffix("+"))
+        if not 0 <= value <= MAX_TILE:
+            raise ValueError(f"Tile exponent must be in 0..{MAX_TILE}, got {value}")
+        lo.append(value)
+        hi.append(MAX_TILE if at_least else value)
+    return Pattern(",".join(cells), tuple(lo), tuple(hi))
+
+
+def read_patterns_file(path: Path | str) -> list[Pattern]:
+    """One pattern per line; blank lines and lines starting with # are skipped."""
+    lines = Path(path).read_text("utf-8").splitlines()
+    return [parse_pattern(line) for line in lines if line.strip() and not line.lstrip().startswith("#")]
+
+
+@dataclass
+class PatternCounts:
+    patterns: list[Pattern]
+    by: str
+    group_size: int
+    counts: np.ndarray | None = None  # (n_patterns, n_groups)
+    rows: np.ndarray | None = None  # (n_groups,) moves per group
+
+    def __post_init__(self):
+        if self.counts is None:
+            self.counts = np.zeros((len(self.patterns), 0), dtype=np.int64)
+        if self.rows is None:
+            self.rows = np.zeros(0, dtype=np.int64)
+
+    @property
+    def n_groups(self) -> int:
+        return len(self.rows)
+
+    def add(self, counts: np.ndarray, rows: np.ndarray) -> "PatternCounts":
+        """Add per-partition counts (groups beyond the current range are appended)."""
+        n = max(self.n_groups, len(rows))
+        self.counts = np.pad(self.counts, ((0, 0), (0, n - self.n_groups)))
+        self.rows = np.pad(self.rows, (0, n - self.n_groups))
+        self.counts[:, : counts.shape[1]] += counts
+        self.rows[: len(rows)] += rows
+        return self
+
+    def group_range(self, group: int) -> tuple[int, int]:
+        """Inclusive (start, end) of group's game ids / turns / scores."""
+        if self.by == "game":  # game ids start at 1: 1-1000 -> 0, 1001-2000 -> 1, ...
+            return group * self.group_size + 1, (group + 1) * self.group_size
+        if self.by == "all":
+            return 0, 0
+        return group * self.group_size, (group + 1) * self.group_size - 1
+
+
+def group_keys(part: dict[str, np.ndarray], by: str, group_size: int) -> np.ndarray:
+    if by == "all":
+        return np.zeros(len(part["code"]), dtype=np.int64)
+    values = part["game_id" if by == "game" else by].astype(np.int64)
+    if by == "game":
+        values = values - 1
+    return np.maximum(values, 0) // group_size
+
+
+def _wildcard_mask(tiles: np.ndarray, pattern: Pattern) -> np.ndarray:
+    lo = np.array(pattern.lo, dtype=np.int8)
+    hi = np.array(pattern.hi, dtype=np.int8)
+    cells = (lo > 0) | (hi < MAX_TILE)  # "any" cells are skipped
+    sub = tiles[:, cells]
+    return ((sub >= lo[cells]) & (sub <= hi[cells])).all(axis=1)
+
+
+def count_partition(
+    codes: np.ndarray,
+    keys: np.ndarray,
+    patterns: list[Pattern],
+    canonical: bool = False,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (n_patterns, n_groups) match counts and (n_groups,) rows for one partition.
+    With canonical, a board matches if any of its 8 symmetric variants matches.
+    """
+    n_groups = int(keys.max()) + 1 if len(keys) else 0
+    counts = np.zeros((len(patterns), n_groups), dtype=np.int64)
+    rows = np.bincount(keys, minlength=n_groups)
+
+    exact = [i for i, p in enumerate(patterns) if p.is_exact]
+    if exact:
+        exact_codes = np.array([patterns[i].code for i in exact], dtype=np.uint64)
+        if canonical:
+            # Look up every symmetric variant, then canonicalize only the matching boards
+            lookup = np.unique([v.code for i in exact for v in patterns[i].variants()]).astype(np.uint64)
+            hit = np.isin(codes, lookup)
+            hit_codes = canonical_codes(codes[hit])
+            exact_codes = canonical_codes(exact_codes)
+        else:
+            hit = np.isin(codes, exact_codes)
+            hit_codes = codes[hit]
+        unique_codes, which = np.unique(exact_codes, return_inverse=True)
+        code_idx = np.searchsorted(unique_codes, hit_codes)
+        flat = np.bincount(code_idx * n_groups + keys[hit], minlength=len(unique_codes) * n_groups)
+        counts[exact] = flat.reshape(len(unique_codes), n_groups)[which]
+
+    wildcard = [i for i, p in enumerate(patterns) if not p.is_exact]
+    if wildcard:
+        tiles = decode_codes(codes)
+        for i in wildcard:
+            variants = patterns[i].variants() if canonical else [patterns[i]]
+            hit = np.logical_or.reduce([_wildcard_mask(tiles, v) for v in variants])
+            counts[i] = np.bincount(keys[hit], minlength=n_groups)
+    return counts, rows
+
+
+def count_patterns(
+    path: Path | str,
+    patterns: list[Pattern],
+    by: str = "game",
+    group_size: int | None = None,
+    jobs: int | None = None,
+    canonical: bool = False,
+) -> PatternCounts:
+    """
+    Count every pattern in one pass over the log at path (CSV or packed directory).
+    With canonical, boards are counted up to rotation/reflection.
+    """
+    if by not in GROUP_BY:
+        raise ValueError(f"by must be one of {GROUP_BY}, got {by!r}")
+    group_size = group_size or DEFAULT_GROUP_SIZES[by]
+    columns = ("code",) if by == "all" else ("code", "game_id" if by == "game" else by)
+    result = PatternCounts(patterns, by, group_size)
+    for part in load_partitions(path, columns=columns, jobs=jobs):
+        codes = np.asarray(part["code"])
+        result.add(*count_partition(codes, group_keys(part, by, group_size), patterns, canonical))
+    return result
+
+
+TIDY_FIELDS = ("log", "pattern", "by", "group", "group_start", "group_end", "count", "rows")
+
+
+def tidy_rows(log: str, result: PatternCounts) -> Iterable[dict]:
+    """Yield one row per (pattern, group); groups without any move are skipped."""
+    for group in np.flatnonzero(result.rows):
+        start, end = result.group_range(int(group))
+        for pattern, counts in zip(result.patterns, result.counts):
+            yield {
+                "log": log,
+                "pattern": pattern.text,
+                "by": result.by,
+                "group": int(group),
+                "group_start": start,
+                "group_end": end,
+                "count": int(counts[group]),
+                "rows": int(result.rows[group]),
+            }
+
+
+def write_tidy(rows: Iterable[dict], output) -> None:
+    writer = csv.DictWriter(output, fieldnames=TIDY_FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Count tile patterns (with wildcards) in board logs in one pass and write a tidy table",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='Cells: exact exponent ("3"), at least (">=3" or "3+"), any ("*").',
+    )
+    parser.add_argument("logs", nargs="+", help="board_log CSV files or packed column directories")
+    parser.add_argument("--pattern", "-p", action="append", type=parse_pattern, default=[],
+                        help='Pattern of 9 comma-separated cells (repeatable), e.g. "0,1,>=2,*,0,1,0,0,0"')
+    parser.add_argument("--patterns-file", type=Path,
+                        help="File with one pattern per line")
+    parser.add_argument("--by", choices=GROUP_BY, default="game",
+                        help="Group counts by game-id window, turn bin, score band or not at all (default: game)")
+    parser.add_argument("--group-size", "-g", type=int, default=None,
+                        help="Games per window / turns per bin / score band width "
+                             "(default: game 1000, turn 10, score 1000)")
+    parser.add_argument("--canonical", action="store_true",
+                        help="Count boards up to rotation/reflection (a pattern matches any of the 8 symmetric variants)")
+    parser.add_argument("--output", "-o", help="Output CSV (default: stdout)")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="Worker processes for converting a CSV (default: CPU count)")
+    args = parser.parse_args()
+
+    patterns = list(args.pattern)
+    if args.patterns_file:
+        patterns += read_patterns_file(args.patterns_file)
+    if not patterns:
+        parser.error("specify at least one --pattern or --patterns-file")
+
+    rows = []
+    for log in args.logs:
+        result = count_patterns(log, patterns, args.by, args.group_size, args.jobs, args.canonical)
+        rows.extend(tidy_rows(log, result))
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            write_tidy(rows, f)
+        print(f"Saved {len(rows)} rows to: {args.output}")
+    else:
+        write_tidy(rows, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
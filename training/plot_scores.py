@@ -1,25 +1,16 @@
-import re
 import matplotlib.pyplot as plt
 import argparse
 import os
 
+from score_series import block_stats, block_stats_multi, load_score_series
+
 def parse_scores(filepath):
     """
-    .txtファイルからgame_idとscoreを抽出
+    .txtファイルからgame_idとscoreを抽出（ScoreSeries: game_id昇順の配列）
     形式: "game <gameid> finished with score <score>"
     """
-    pattern = re.compile(r'game\s+(\d+)\s+finished\s+with\s+score\s+(\d+)')
-    scores = {}  # {game_id: score}
-    
     print(f"Reading {filepath}...")
-    with open(filepath, 'r') as f:
-        for line in f:  # 1行ずつ読み込み（メモリ効率）
-            match = pattern.search(line)
-            if match:
-                game_id = int(match.group(1))
-                score = int(match.group(2))
-                scores[game_id] = score
-    
+    scores = load_score_series(filepath)  # mmapしてバイト列のまま走査（メモリ効率）
     print(f"  Found {len(scores)} games")
     return scores
 
@@ -27,35 +18,25 @@ def calculate_averages(scores, avescope):
     """
     avescope間隔でスコアの平均を計算
     """
-    if not scores:
-        return [], []
-    
-    max_game_id = max(scores.keys())
-    x_values = []  # グループ終端のgame_id
-    y_values = []  # 平均スコア
-    
-    current_sum = 0
-    current_count = 0
-    
-    for game_id in range(1, max_game_id + 1):
-        if game_id in scores:
-            current_sum += scores[game_id]
-            current_count += 1
-        
-        if game_id % avescope == 0:
-            if current_count > 0:
-                avg = current_sum / current_count
-                x_values.append(game_id)
-                y_values.append(avg)
-            current_sum = 0
-            current_count = 0
-    
+    stats = block_stats(scores, avescope)
+    x_values = stats.end.tolist()  # グループ終端のgame_id
+    y_values = stats.mean.tolist()  # 平均スコア
     return x_values, y_values
 
-def plot_scores(file1, file2, avescope, output):
+def output_path_for(output, avescope, n_avescopes):
+    """avescopeが複数ならavescopeごとに別ファイル（<stem>_a<avescope><ext>）"""
+    if n_avescopes == 1:
+        return output
+    stem, ext = os.path.splitext(output)
+    return f"{stem}_a{avescope}{ext}"
+
+def plot_scores(file1, file2, avescopes, output):
     """
     2つのファイルのスコア推移を比較するグラフを作成
+    avescopesを複数指定した場合も、各ファイルは1回だけ読む
     """
+    if isinstance(avescopes, int):
+        avescopes = [avescopes]
     # ファイル名から凡例名を生成
     label1 = os.path.splitext(os.path.basename(file1))[0]
     label2 = os.path.splitext(os.path.basename(file2))[0]
@@ -64,35 +45,40 @@ def plot_scores(file1, file2, avescope, output):
     scores1 = parse_scores(file1)
     scores2 = parse_scores(file2)
     
-    # 平均計算
-    x1, y1 = calculate_averages(scores1, avescope)
-    x2, y2 = calculate_averages(scores2, avescope)
-    
-    print(f"Plotting {len(x1)} points for {label1}")
-    print(f"Plotting {len(x2)} points for {label2}")
-    
-    # グラフ作成
-    plt.figure(figsize=(14, 6))
-    plt.plot(x1, y1, 'b-', label=label1, linewidth=1.5, alpha=0.8)
-    plt.plot(x2, y2, 'r-', label=label2, linewidth=1.5, alpha=0.8)
+    # 平均計算（全てのavescopeをまとめて）
+    stats1 = block_stats_multi(scores1, avescopes)
+    stats2 = block_stats_multi(scores2, avescopes)
     
-    plt.xlabel('Game ID')
-    plt.ylabel(f'Average Score (per {avescope} games)')
-    plt.title(f'Score Progression (averaged every {avescope} games)')
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-    
-    plt.tight_layout()
-    plt.savefig(output, dpi=150)
-    plt.close()
-    
-    print(f"Graph saved to: {output}")
-    
-    # 統計情報
-    if y1:
-        print(f"{label1}: min={min(y1):.1f}, max={max(y1):.1f}, final={y1[-1]:.1f}")
-    if y2:
-        print(f"{label2}: min={min(y2):.1f}, max={max(y2):.1f}, final={y2[-1]:.1f}")
+    for avescope in stats1:
+        x1, y1 = stats1[avescope].end.tolist(), stats1[avescope].mean.tolist()
+        x2, y2 = stats2[avescope].end.tolist(), stats2[avescope].mean.tolist()
+        avescope_output = output_path_for(output, avescope, len(stats1))
+        
+        print(f"Plotting {len(x1)} points for {label1}")
+        print(f"Plotting {len(x2)} points for {label2}")
+        
+        # グラフ作成
+        plt.figure(figsize=(14, 6))
+        plt.plot(x1, y1, 'b-', label=label1, linewidth=1.5, alpha=0.8)
+        plt.plot(x2, y2, 'r-', label=label2, linewidth=1.5, alpha=0.8)
+        
+        plt.xlabel('Game ID')
+        plt.ylabel(f'Average Score (per {avescope} games)')
+        plt.title(f'Score Progression (averaged every {avescope} games)')
+        plt.legend()
+        plt.grid(True, alpha=0.3)
+        
+        plt.tight_layout()
+        plt.savefig(avescope_output, dpi=150)
+        plt.close()
+        
+        print(f"Graph saved to: {avescope_output}")
+        
+        # 統計情報
+        if y1:
+            print(f"{label1}: min={min(y1):.1f}, max={max(y1):.1f}, final={y1[-1]:.1f}")
+        if y2:
+            print(f"{label2}: min={min(y2):.1f}, max={max(y2):.1f}, final={y2[-1]:.1f}")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -106,6 +92,9 @@ Examples:
 
   # 5000ゲーム単位で平均、出力ファイル名指定
   python plot_scores.py --file1 log1.txt --file2 log2.txt --avescope 5000 --output result.png
+
+  # 1000・10000ゲーム単位をまとめて（result_a1000.png, result_a10000.png）
+  python plot_scores.py --file1 log1.txt --file2 log2.txt --avescope 1000 10000 --output result.png
         '''
     )
     
@@ -113,8 +102,9 @@ Examples:
                         help='First log file (.txt)')
     parser.add_argument('--file2', '-f2', required=True,
                         help='Second log file (.txt)')
-    parser.add_argument('--avescope', '-a', type=int, default=10000,
-                        help='Averaging interval (default: 10000)')
+    parser.add_argument('--avescope', '-a', type=int, nargs='+', default=[10000],
+                        help='Averaging interval(s) (default: 10000). With several values, one PNG each '
+                             '(<output stem>_a<avescope>.png) from one read of the logs')
     parser.add_argument('--output', '-o', default='score_progression.png',
                         help='Output PNG file (default: score_progression.png)')
     
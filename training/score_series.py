@@ -0,0 +1,224 @@
+"""Load per-game scores from training logs and compute block statistics with NumPy.
+
+The learners print one line per game (STDOUT_LOG in learning_ntuple_*.cpp):
+
+    game <game_id> finished with score <score>
+
+load_score_series() memory-maps the log and reads it in line-aligned chunks. It finds
+`finished` by comparing byte arrays, checks `with` and `score` after it and parses the
+numbers on either side with a few vectorized passes. It does not run a regex on every
+line. The accepted lines are those of the regex the scripts used before,
+`game\s+(\d+)\s+finished\s+with\s+score\s+(\d+)`, with \s and \d taken as ASCII
+(any run of spaces / tabs / other ASCII whitespace separates the words). The scripts
+read the log in text mode, where \r also ends a line, so \r is not whitespace here.
+If a game id appears more than once, the last line wins (as with the dict the scripts
+used before).
+
+block_stats() splits game ids 1..max_game_id into blocks of `avescope` games and
+returns mean / SD / min / max / count per block with np.add.reduceat and friends.
+Like the loops it replaces, it only reports complete blocks (the trailing partial
+block is dropped) that contain at least one game. block_stats_multi() computes
+several avescopes from one parse.
+"""
+
+import mmap
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+MARKER = b"finished"
+CHUNK_BYTES = 64 << 20
+MAX_DIGITS = 19  # int64
+_GAME = np.frombuffer(b"game", dtype=np.uint8)
+_MARKER = np.frombuffer(MARKER, dtype=np.uint8)
+_AFTER_MARKER = tuple(np.frombuffer(w, dtype=np.uint8) for w in (b"with", b"score"))
+# ASCII characters matched by \s within a line (\n and \r end the line in text mode)
+_BLANKS = (ord(" "), ord("\t"), ord("\v"), ord("\f"), 0x1C, 0x1D, 0x1E, 0x1F)
+
+
+@dataclass
+class ScoreSeries:
+    game_id: np.ndarray  # int64, ascending and unique
+    score: np.ndarray  # int64
+
+    def __len__(self) -> int:
+        return len(self.game_id)
+
+
+@dataclass
+class BlockStats:
+    start: np.ndarray  # first game id of the block
+    end: np.ndarray  # last game id of the block (the x value of the plots)
+    mean: np.ndarray
+    sd: np.ndarray  # sample SD (ddof=1), nan for blocks with one game
+    min: np.ndarray
+    max: np.ndarray
+    count: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.end)
+
+
+def _is_blank(values: np.ndarray) -> np.ndarray:
+    return np.isin(values, _BLANKS)
+
+
+def _skip_blanks(buf: np.ndarray, pos: np.ndarray, step: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Move pos over the run of blanks in direction step (+1 / -1).
+    Returns (new position, number of blanks skipped). Newlines stop every run, and the
+    buffer is padded with them.
+    """
+    pos = pos.copy()
+    n_blanks = np.zeros(len(pos), dtype=np.int64)
+    while True:
+        blank = _is_blank(buf[pos])
+        if not blank.any():
+            return pos, n_blanks
+        n_blanks += blank
+        pos += step * blank
+
+
+def _match_words(buf: np.ndarray, pos: np.ndarray, words) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Match "\s+word" for each word in turn, starting at pos.
+    Returns (matched, position after the last word).
+    """
+    ok = np.ones(len(pos), dtype=bool)
+    for word in words:
+        pos, n_blanks = _skip_blanks(buf, pos, 1)
+        ok &= n_blanks > 0
+        for k in range(len(word)):
+            ok &= buf[pos + k] == word[k]
+        pos = pos + len(word)
+    return ok, pos
+
+
+def _parse_forward(buf: np.ndarray, pos: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Parse "\s+(\d+)" starting at pos. Returns (value, matched)."""
+    pos, n_blanks = _skip_blanks(buf, pos, 1)
+    value = np.zeros(len(pos), dtype=np.int64)
+    n_digits = np.zeros(len(pos), dtype=np.int64)
+    active = n_blanks > 0
+    for _ in range(MAX_DIGITS):
+        digit = buf[pos].astype(np.int64) - ord("0")
+        active &= (digit >= 0) & (digit <= 9)
+        if not active.any():
+            break
+        value = np.where(active, value * 10 + digit, value)
+        n_digits += active
+        pos += active
+    return value, n_digits > 0
+
+
+def _parse_backward(buf: np.ndarray, pos: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Parse "(\d+)\s+" ending just before pos.
+    Returns (value, matched, position just before the number).
+    """
+    pos, n_blanks = _skip_blanks(buf, pos - 1, -1)
+    value = np.zeros(len(pos), dtype=np.int64)
+    scale = np.ones(len(pos), dtype=np.int64)
+    n_digits = np.zeros(len(pos), dtype=np.int64)
+    active = n_blanks > 0
+    for _ in range(MAX_DIGITS):
+        digit = buf[pos].astype(np.int64) - ord("0")
+        active &= (digit >= 0) & (digit <= 9)
+        if not active.any():
+            break
+        value = np.where(active, value + digit * scale, value)
+        scale = np.where(active, scale * 10, scale)
+        n_digits += active
+        pos -= active
+    return value, n_digits > 0, pos
+
+
+def _preceded_by_game(buf: np.ndarray, pos: np.ndarray) -> np.ndarray:
+    """True where "game\s+" ends at pos (the byte before the game id)."""
+    pos, n_blanks = _skip_blanks(buf, pos, -1)
+    ok = n_blanks > 0
+    for k in range(len(_GAME)):
+        ok &= buf[pos - (len(_GAME) - 1 - k)] == _GAME[k]
+    return ok
+
+
+def parse_score_lines(chunk: bytes) -> tuple[np.ndarray, np.ndarray]:
+    """(game_id, score) of every "game N finished with score S" in chunk, in file order."""
+    # Pad with newlines so every look-behind / look-ahead stays inside the buffer
+    pad = len(_GAME) + 2 * MAX_DIGITS + 2
+    buf = np.frombuffer(b"\n" * pad + chunk + b"\n" * pad, dtype=np.uint8)
+    hits = np.flatnonzero(buf[: len(buf) - len(_MARKER) + 1] == _MARKER[0])
+    for k in range(1, len(_MARKER)):
+        hits = hits[buf[hits + k] == _MARKER[k]]
+    if not len(hits):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    has_words, after = _match_words(buf, hits + len(_MARKER), _AFTER_MARKER)
+    score, has_score = _parse_forward(buf, after)
+    game_id, has_game, before = _parse_backward(buf, hits)
+    ok = has_words & has_score & has_game & _preceded_by_game(buf, before)
+    return game_id[ok], score[ok]
+
+
+def _line_chunks(mm: mmap.mmap, chunk_bytes: int):
+    start = 0
+    size = len(mm)
+    while start < size:
+        end = min(start + chunk_bytes, size)
+        if end < size:
+            newline = mm.find(b"\n", end)
+            end = size if newline < 0 else newline + 1
+        yield mm[start:end]
+        start = end
+
+
+def load_score_series(path: Path | str, chunk_bytes: int = CHUNK_BYTES) -> ScoreSeries:
+    """Read every per-game score of the log at path (sorted by game id, last line wins)."""
+    path = Path(path)
+    game_ids, scores = [], []
+    with path.open("rb") as f:
+        if path.stat().st_size == 0:
+            return ScoreSeries(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for chunk in _line_chunks(mm, chunk_bytes):
+                g, s = parse_score_lines(chunk)
+                game_ids.append(g)
+                scores.append(s)
+    game_id = np.concatenate(game_ids)
+    score = np.concatenate(scores)
+    # keep the last occurrence of every game id
+    unique, last = np.unique(game_id[::-1], return_index=True)
+    return ScoreSeries(unique, score[::-1][last])
+
+
+def block_stats(series: ScoreSeries, avescope: int) -> BlockStats:
+    """Statistics of every complete, non-empty block of avescope games (game ids start at 1)."""
+    valid = series.game_id >= 1
+    game_id, score = series.game_id[valid], series.score[valid]
+    n_blocks = int(game_id[-1]) // avescope if len(game_id) else 0
+    block = (game_id - 1) // avescope
+    in_range = block < n_blocks
+    block, score = block[in_range], score[in_range].astype(np.float64)
+    # game ids are sorted, so each block is a contiguous run
+    starts = np.flatnonzero(np.r_[True, block[1:] != block[:-1]]) if len(block) else np.empty(0, dtype=np.int64)
+    ids = block[starts]
+    count = np.diff(np.r_[starts, len(block)])
+    mean = np.add.reduceat(score, starts) / count
+    sq = np.add.reduceat((score - np.repeat(mean, count)) ** 2, starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sd = np.where(count > 1, np.sqrt(sq / (count - 1)), np.nan)
+    return BlockStats(
+        start=ids * avescope + 1,
+        end=(ids + 1) * avescope,
+        mean=mean,
+        sd=sd,
+        min=np.minimum.reduceat(score, starts),
+        max=np.maximum.reduceat(score, starts),
+        count=count,
+    )
+
+
+def block_stats_multi(series: ScoreSeries, avescopes) -> dict[int, BlockStats]:
+    """block_stats for several avescopes from one parsed series."""
+    return {int(a): block_stats(series, int(a)) for a in avescopes}
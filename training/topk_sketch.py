@@ -0,0 +1,122 @@
+"""Bounded-memory heavy hitters (top-k) over packed board codes.
+
+HeavyHitters is a Misra-Gries / Space-Saving summary with at most `capacity`
+counters. Each update takes a chunk of codes and counts it exactly with np.unique.
+It adds those counts to the counters and, if more than `capacity` keys remain,
+subtracts the (capacity + 1)-th largest count from every counter and drops the ones
+that reach zero. Summaries built in different workers merge with the same rule
+(Agarwal et al., "Mergeable Summaries", 2012). The guarantee survives any
+sequence of updates and merges:
+
+    lower(x) <= f(x) <= lower(x) + error,   error = (n - sum(counters)) / (capacity + 1)
+
+where f(x) is the true count and n is the number of codes seen. Any code with
+f(x) > error is guaranteed to be kept. Memory is O(capacity + chunk_rows) no matter
+how long the log is.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from board_log_columns import canonical_codes, partition_files
+
+DEFAULT_CAPACITY = 1 << 20
+DEFAULT_CHUNK_ROWS = 1 << 22
+
+
+class HeavyHitters:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.keys = np.empty(0, dtype=np.uint64)  # sorted
+        self.counts = np.empty(0, dtype=np.int64)
+        self.n = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def error(self) -> float:
+        """Maximum undercount of lower() for any code (tracked or not)."""
+        return (self.n - int(self.counts.sum())) / (self.capacity + 1)
+
+    def _add(self, keys: np.ndarray, counts: np.ndarray) -> None:
+        keys, inverse = np.unique(np.concatenate([self.keys, keys]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([self.counts, counts])).astype(np.int64)
+        if len(keys) > self.capacity:
+            threshold = np.partition(counts, len(counts) - self.capacity - 1)[len(counts) - self.capacity - 1]
+            counts = counts - threshold
+            keep = counts > 0
+            keys, counts = keys[keep], counts[keep]
+        self.keys, self.counts = keys, counts
+
+    def update(self, codes) -> "HeavyHitters":
+        """Add a chunk of codes."""
+        codes = np.asarray(codes, dtype=np.uint64).ravel()
+        if len(codes):
+            keys, counts = np.unique(codes, return_counts=True)
+            self._add(keys, counts)
+            self.n += len(codes)
+        return self
+
+    def merge(self, other: "HeavyHitters") -> "HeavyHitters":
+        """Add other's counters (self is updated and returned)."""
+        self._add(other.keys, other.counts)
+        self.n += other.n
+        return self
+
+    def lower(self, keys) -> np.ndarray:
+        """Lower bounds of the counts of keys (0 for untracked keys)."""
+        keys = np.asarray(keys, dtype=np.uint64)
+        if not len(self.keys):
+            return np.zeros(keys.shape, dtype=np.int64)
+        idx = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[idx] == keys, self.counts[idx], 0)
+
+    def upper(self, keys) -> np.ndarray:
+        """Upper bounds of the counts of keys."""
+        return self.lower(keys) + self.error
+
+    def top(self, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """(codes, lower bounds) of the k largest counters, largest first."""
+        order = np.argsort(-self.counts, kind="stable")[:k]
+        return self.keys[order], self.counts[order]
+
+
+def _partition_sketch(
+    code_file: Path,
+    capacity: int,
+    canonical: bool,
+    chunk_rows: int,
+) -> HeavyHitters:
+    codes = np.load(code_file, mmap_mode="r")
+    sketch = HeavyHitters(capacity)
+    for start in range(0, len(codes), chunk_rows):
+        chunk = np.asarray(codes[start:start + chunk_rows])
+        sketch.update(canonical_codes(chunk) if canonical else chunk)
+    return sketch
+
+
+def sketch_log(
+    path: Path | str,
+    capacity: int = DEFAULT_CAPACITY,
+    jobs: int | None = None,
+    canonical: bool = False,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> HeavyHitters:
+    """Sketch every partition of the log at path in a process pool and merge the results."""
+    files = partition_files(path, "code", jobs)
+    func = partial(_partition_sketch, capacity=capacity, canonical=canonical, chunk_rows=chunk_rows)
+    n_workers = min(jobs or os.cpu_count() or 1, max(1, len(files)))
+    result = HeavyHitters(capacity)
+    if n_workers <= 1:
+        for sketch in map(func, files):
+            result.merge(sketch)
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            for sketch in executor.map(func, files):
+                result.merge(sketch)
+    return result